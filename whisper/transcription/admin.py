@@ -1,6 +1,6 @@
 # Register your models here.
 from django.contrib import admin
-from .models import MediaFile
+from .models import MediaFile, TranscriptCache
 
 
 @admin.register(MediaFile)
@@ -9,19 +9,20 @@ class MediaFileAdmin(admin.ModelAdmin):
         'original_filename', 'user', 'file_type', 'status', 
         'upload_date', 'is_shared', 'shared_url'
     ]
-    list_filter = ['file_type', 'status', 'is_shared', 'upload_date']
+    list_filter = ['file_type', 'status', 'queue', 'is_shared', 'upload_date']
     search_fields = ['original_filename', 'user__username', 'shared_url']
     readonly_fields = ['hash_id', 'upload_date']
     
     fieldsets = (
         ('Основна інформація', {
-            'fields': ('user', 'original_filename', 'file', 'file_type')
+            'fields': ('user', 'original_filename', 'file', 'file_type', 'has_video', 'audio_stream_index',
+                       'audio_codec', 'channel_layout')
         }),
         ('Статус обробки', {
-            'fields': ('status', 'recognized_text')
+            'fields': ('status', 'queue', 'duration', 'heartbeat_at', 'processing_attempts', 'recognized_text')
         }),
         ('Налаштування обробки', {
-            'fields': ('noise_cancellation', 'language', 'diarisation')
+            'fields': ('noise_cancellation', 'language', 'diarisation', 'whisper_model', 'inference_backend')
         }),
         ('Спільний доступ', {
             'fields': ('is_shared', 'shared_url')
@@ -33,4 +34,10 @@ class MediaFileAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user')
\ No newline at end of file
+        return super().get_queryset(request).select_related('user')
+
+@admin.register(TranscriptCache)
+class TranscriptCacheAdmin(admin.ModelAdmin):
+    list_display = ['key', 'pcm_hash', 'size_bytes', 'hit_count', 'created_at', 'last_used_at']
+    search_fields = ['key', 'pcm_hash']
+    readonly_fields = ['key', 'pcm_hash', 'options', 'size_bytes', 'hit_count', 'created_at', 'last_used_at']
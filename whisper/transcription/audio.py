@@ -0,0 +1,496 @@
+import json
+import logging
+import subprocess
+import tempfile
+import threading
+import wave
+import numpy as np
+from .vad import gate_ranges
+
+
+SAMPLE_RATE = 16000
+
+
+def load_wav_pcm(path_to_wav):
+    """
+    Читає WAV (pcm_s16le) у масив int16 без проміжних копій через pydub.
+    Returns:
+        tuple: (samples: np.ndarray[int16], sample_rate: int)
+    """
+    with wave.open(path_to_wav, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Очікується 16-бітний PCM, отримано {wav.getsampwidth() * 8} біт")
+        sample_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def pcm_to_float32(samples):
+    """
+    Перетворює int16 PCM у float32 [-1, 1] — формат, який приймає model.transcribe.
+    """
+    # Одна float32-алокація замість astype + ділення (дві повні копії на довгих файлах)
+    return np.multiply(samples, np.float32(1 / 32768.0), dtype=np.float32)
+
+
+def float32_to_pcm(audio):
+    """
+    Зворотне перетворення float32 [-1, 1] у int16 PCM.
+    """
+    return (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+def frame_energy(samples, frame_len, block_frames=1 << 16):
+    """
+    Сума квадратів семплів у кожному кадрі довжини frame_len.
+    Рахується блоками через reshape-view буфера, тож на весь файл не створюється
+    float64-копія; результат — один float64 на кадр.
+    Неповний хвіст буфера утворює останній (коротший) кадр.
+    """
+    n_frames = -(-len(samples) // frame_len)
+    energy = np.empty(n_frames, dtype=np.float64)
+    full_frames = len(samples) // frame_len
+    for first in range(0, full_frames, block_frames):
+        last = min(first + block_frames, full_frames)
+        block = samples[first * frame_len:last * frame_len].reshape(-1, frame_len)
+        energy[first:last] = np.einsum('ij,ij->i', block, block, dtype=np.float64)
+    if full_frames < n_frames:
+        tail = samples[full_frames * frame_len:].astype(np.float64)
+        energy[-1] = np.dot(tail, tail)
+    return energy
+
+
+def detect_nonsilent_ranges(samples, sample_rate, min_silence_len, silence_thresh, keep_silence, energy=None):
+    """
+    Знаходить мовні (не тихі) ділянки та повертає їх як діапазони семплів.
+    Векторизований аналог pydub.silence.split_on_silence (крок 1 мс): RMS вікна
+    min_silence_len рахується для кожної мілісекунди через кумулятивну суму енергій кадрів,
+    без Python-циклу по аудіо і без копій AudioSegment.
+    Args:
+        samples: int16 PCM (або float32 у масштабі int16).
+        min_silence_len (int): Мінімальна тривалість тиші, мс.
+        silence_thresh (float): Поріг тиші, dBFS.
+        keep_silence (int): Скільки тиші залишати з кожного боку, мс.
+        energy: Вже пораховані frame_energy(samples, sample_rate // 1000), якщо є.
+    """
+    samples_per_ms = sample_rate // 1000
+    if energy is None:
+        energy = frame_energy(samples, samples_per_ms)
+    length_ms = len(energy)
+    if length_ms < min_silence_len:
+        return [(0, len(samples))] if len(samples) else []
+
+    # RMS кожного вікна [i, i + min_silence_len) мс, як audio_segment[i:i + min_silence_len].rms
+    cumulative = np.concatenate(([0.0], np.cumsum(energy)))
+    window_energy = cumulative[min_silence_len:] - cumulative[:-min_silence_len]
+    window_samples = min_silence_len * samples_per_ms
+    rms = np.sqrt(np.maximum(window_energy, 0) / window_samples)
+    thresh = (10 ** (silence_thresh / 20)) * 32768
+    silence_starts = np.flatnonzero(rms <= thresh)
+
+    if silence_starts.size == 0:
+        silent_ranges = []
+    else:
+        # Вікна тиші, що перекриваються, зливаються в один діапазон
+        breaks = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+        range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+        range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+        silent_ranges = list(zip(range_starts.tolist(), range_ends.tolist()))
+
+    ranges_ms = []
+    prev_end = 0
+    for start_ms, end_ms in silent_ranges:
+        if start_ms > prev_end:
+            ranges_ms.append([prev_end, start_ms])
+        prev_end = end_ms
+    if prev_end < length_ms:
+        ranges_ms.append([prev_end, length_ms])
+
+    # keep_silence з обох боків, як у split_on_silence: сусідні діапазони ділять тишу навпіл
+    padded = [[start_ms - keep_silence, end_ms + keep_silence] for start_ms, end_ms in ranges_ms]
+    for current, following in zip(padded, padded[1:]):
+        if following[0] < current[1]:
+            current[1] = (current[1] + following[0]) // 2
+            following[0] = current[1]
+
+    return [(max(start_ms, 0) * samples_per_ms, min(end_ms * samples_per_ms, len(samples)))
+            for start_ms, end_ms in padded]
+
+
+def plan_chunks(samples, sample_rate, target_length_sec, min_silence_len=1250, silence_offset_db=16,
+                keep_silence=500, silence_thresh=None, scale=1.0, split_long=False, search_sec=5.0,
+                speech_ranges=None, max_gap=0):
+    """
+    План частин для інференсу по тиші, об'єднаних до target_length_sec. Частина — список діапазонів
+    (start_sample, end_sample) файлу (див. gather_chunk). Саме аудіо не копіюється — частини вирізаються
+    з буфера лише в момент інференсу.
+    Поріг тиші за замовчуванням — рівень усього файлу мінус silence_offset_db.
+    scale переводить семпли у масштаб int16 (32768 для float32 [-1, 1]).
+    З split_long мовні ділянки, довші за target_length_sec, ріжуться в найтихішому місці
+    останніх search_sec перед межею, тож жодна частина не перевищує target_length_sec
+    (з target_length_sec = 30 кожна частина займає рівно одне вікно енкодера Whisper).
+    З speech_ranges (vad.detect_speech) немовні відрізки вирізаються до пакування (vad.gate_ranges
+    з max_gap семплів), а мовні ділянки пакуються склеєними (pack_ranges): у модель іде лише мовлення,
+    без відрізків між ділянками. Без speech_ranges частина — один суцільний діапазон (combine_chunks).
+    """
+    energy = frame_energy(samples, sample_rate // 1000)
+    if scale != 1.0:
+        energy *= scale ** 2
+    if silence_thresh is None:
+        silence_thresh = energy_to_dbfs(energy, len(samples)) - silence_offset_db
+    nonsilent_ranges = detect_nonsilent_ranges(
+        samples, sample_rate, min_silence_len, silence_thresh, keep_silence, energy=energy,
+    )
+    if speech_ranges is not None:
+        nonsilent_ranges = gate_ranges(nonsilent_ranges, speech_ranges, max_gap)
+    if split_long:
+        nonsilent_ranges = split_long_ranges(nonsilent_ranges, energy, sample_rate, target_length_sec, search_sec)
+    if speech_ranges is not None:
+        return pack_ranges(nonsilent_ranges, target_length_sec, sample_rate)
+    return [[chunk] for chunk in combine_chunks(nonsilent_ranges, target_length_sec, sample_rate)]
+
+
+def split_long_ranges(ranges, energy, sample_rate, max_length_sec, search_sec=5.0, smooth_ms=20):
+    """
+    Ділить діапазони, довші за max_length_sec, на шматки не довші за max_length_sec.
+    Розріз ставиться у найтихіші smooth_ms мс (за frame_energy з кроком 1 мс) серед останніх
+    search_sec перед межею — між словами, а не посеред слова.
+    """
+    samples_per_ms = sample_rate // 1000
+    max_length = int(max_length_sec * sample_rate)
+    search_ms = max(1, min(int(search_sec * 1000), max_length // samples_per_ms - 1))
+    cumulative = np.concatenate(([0.0], np.cumsum(energy)))
+    split = []
+    for start, end in ranges:
+        while end - start > max_length:
+            # Кандидати: початки вікон smooth_ms у [межа - search_ms, межа - smooth_ms]
+            edge_ms = (start + max_length) // samples_per_ms
+            first = max(start // samples_per_ms + 1, edge_ms - search_ms)
+            last = max(first + 1, edge_ms - smooth_ms + 1)
+            window_energy = cumulative[first + smooth_ms:last + smooth_ms] - cumulative[first:last]
+            cut = (first + int(np.argmin(window_energy)) + smooth_ms // 2) * samples_per_ms
+            cut = min(max(cut, start + samples_per_ms), start + max_length)
+            split.append((start, cut))
+            start = cut
+        split.append((start, end))
+    return split
+
+
+def window_padding(chunks, sample_rate, window_sec=30, speech_samples=None):
+    """
+    Скільки вікон енкодера (window_sec) займають частини (списки діапазонів) і скільки в них марної роботи:
+    доповнення нулями, а якщо задано speech_samples (сумарна тривалість мовлення після VAD) —
+    ще й надіслане в модель немовне аудіо.
+    Returns:
+        dict: windows, sent_sec (аудіо, надіслане в модель), padded_sec (марні семпли),
+              padding_ratio (частка марних кадрів серед усіх).
+    """
+    window = int(window_sec * sample_rate)
+    sent = [chunk_samples(chunk) for chunk in chunks]
+    windows = sum(-(-length // window) for length in sent)
+    useful = sum(sent) if speech_samples is None else min(speech_samples, sum(sent))
+    padded = windows * window - useful
+    return {
+        'windows': windows,
+        'sent_sec': sum(sent) / sample_rate,
+        'padded_sec': padded / sample_rate,
+        'padding_ratio': padded / (windows * window) if windows else 0.0,
+    }
+
+
+def pack_ranges(ranges, target_length_sec, sample_rate=SAMPLE_RATE):
+    """
+    Пакує діапазони (по порядку) у частини із сумарною тривалістю не більше target_length_sec.
+    На відміну від combine_chunks, частина — список діапазонів: відрізки між ними в модель не йдуть,
+    аудіо частини склеюється з діапазонів (gather_chunk). Діапазон, довший за target_length_sec,
+    стає окремою частиною.
+    """
+    target_length = int(target_length_sec * sample_rate)
+    chunks = []
+    current, length = [], 0
+    for start, end in ranges:
+        if current and length + (end - start) > target_length:
+            chunks.append(current)
+            current, length = [], 0
+        current.append((start, end))
+        length += end - start
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_span(chunk):
+    """
+    Межі частини у файлі: (початок першого діапазону, кінець останнього).
+    """
+    return chunk[0][0], chunk[-1][1]
+
+
+def chunk_samples(chunk):
+    """
+    Кількість семплів, що йдуть у модель (без відрізків між діапазонами).
+    """
+    return sum(end - start for start, end in chunk)
+
+
+def gather_chunk(audio, chunk):
+    """
+    Аудіо частини: view буфера для суцільної частини, склеєні діапазони — для кількох.
+    """
+    if len(chunk) == 1:
+        start, end = chunk[0]
+        return audio[start:end]
+    return np.concatenate([audio[start:end] for start, end in chunk])
+
+
+def slice_chunk(chunk, first, last):
+    """
+    Діапазони файлу, що відповідають семплам [first, last) склеєного аудіо частини.
+    """
+    sliced = []
+    position = 0
+    for start, end in chunk:
+        low = max(first - position, 0)
+        high = min(last - position, end - start)
+        if low < high:
+            sliced.append((start + low, start + high))
+        position += end - start
+        if position >= last:
+            break
+    return sliced
+
+
+def source_time(seconds, chunk, sample_rate=SAMPLE_RATE, is_end=False):
+    """
+    Час у склеєному аудіо частини (с) -> час у файлі (с). Момент на стику двох діапазонів
+    відповідає кінцю попереднього (is_end) або початку наступного.
+    """
+    sample = seconds * sample_rate
+    position = 0
+    for start, end in chunk:
+        length = end - start
+        if sample < position + length or (is_end and sample <= position + length):
+            return (start + max(sample - position, 0)) / sample_rate
+        position += length
+    return chunk[-1][1] / sample_rate
+
+
+def combine_chunks(ranges, target_length_sec, sample_rate=SAMPLE_RATE):
+    """
+    Об'єднує дрібні діапазони у більші суцільні частини, не довші за target_length_sec.
+    Тиша між діапазонами всередині частини зберігається, тому зсуви у часі
+    відповідають оригінальному файлу.
+    """
+    target_length = int(target_length_sec * sample_rate)
+    combined_chunks = []
+    current_start, current_end = None, None
+
+    for start, end in ranges:
+        if current_start is None:
+            current_start, current_end = start, end
+        elif end - current_start <= target_length:
+            current_end = end
+        else:
+            combined_chunks.append((current_start, current_end))
+            current_start, current_end = start, end
+
+    if current_start is not None and current_end > current_start:
+        combined_chunks.append((current_start, current_end))
+
+    return combined_chunks
+
+
+def energy_to_dbfs(energy, num_samples):
+    """
+    Рівень сигналу у dBFS за сумою енергій кадрів (див. frame_energy).
+    """
+    if num_samples == 0:
+        return -float('inf')
+    rms = np.sqrt(np.sum(energy) / num_samples)
+    if rms == 0:
+        return -float('inf')
+    return 20 * np.log10(rms / 32768.0)
+
+
+def dbfs(samples):
+    """
+    Рівень сигналу у dBFS (як AudioSegment.dBFS).
+    """
+    return energy_to_dbfs(frame_energy(samples, SAMPLE_RATE), len(samples))
+
+
+def _grow_buffer(buffer, capacity, mmap_file):
+    """
+    Збільшує буфер PCM до capacity семплів, зберігаючи вже декодовані дані.
+    Для memmap-буфера розширюється тимчасовий файл і створюється нове відображення.
+    """
+    if mmap_file is not None:
+        buffer.flush()
+        mmap_file.truncate(capacity * 2)
+        return np.memmap(mmap_file, dtype=np.int16, mode='r+', shape=(capacity,))
+    grown = np.empty(capacity, dtype=np.int16)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+def _to_mmap(buffer, filled, capacity):
+    """
+    Переносить вже декодовані семпли з пам'яті у memmap на анонімному тимчасовому файлі.
+    Файл не має імені у файловій системі, тому зникає разом із процесом навіть після падіння.
+    """
+    mmap_file = tempfile.TemporaryFile(prefix='transcribe_pcm_')
+    mmap_file.truncate(capacity * 2)
+    mapped = np.memmap(mmap_file, dtype=np.int16, mode='r+', shape=(capacity,))
+    mapped[:filled] = buffer[:filled]
+    return mapped, mmap_file
+
+
+def _feed_stdin(stdin, input_chunks, errors):
+    try:
+        for chunk in input_chunks:
+            stdin.write(chunk)
+    except BrokenPipeError:
+        # ffmpeg завершився раніше (помилка формату) — код повернення перевіряється окремо
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def probe_media(filepath, timeout=60):
+    """
+    Один виклик ffprobe: тривалість і параметри аудіопотоку, який буде розпізнаватися.
+    Обирається аудіопотік з disposition default, інакше — перший.
+    Returns:
+        dict: duration (с або None), audio_stream_index (глобальний індекс потоку або None, якщо аудіо немає),
+              audio_codec, channels, channel_layout, sample_rate, has_video.
+    """
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        filepath,
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=timeout)
+    info = json.loads(result.stdout or '{}')
+    streams = info.get('streams', [])
+    audio_streams = [stream for stream in streams if stream.get('codec_type') == 'audio']
+    audio = next((stream for stream in audio_streams if stream.get('disposition', {}).get('default')),
+                 audio_streams[0] if audio_streams else None)
+    # Обкладинка в mp3/m4a — це «відеопотік» attached_pic, а не відео
+    has_video = any(stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic')
+                    for stream in streams)
+
+    duration = info.get('format', {}).get('duration') or (audio or {}).get('duration')
+    return {
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+        'audio_stream_index': audio['index'] if audio else None,
+        'audio_codec': (audio or {}).get('codec_name', ''),
+        'channels': (audio or {}).get('channels'),
+        'channel_layout': (audio or {}).get('channel_layout', ''),
+        'sample_rate': int(audio['sample_rate']) if audio and audio.get('sample_rate') else None,
+        'has_video': has_video,
+    }
+
+
+def decode_to_pcm(filepath, expected_samples=None, mmap_threshold_sec=None, read_size=1 << 20,
+                  input_chunks=None, stream_index=None):
+    """
+    Декодує будь-який аудіо/відео файл одним проходом ffmpeg у 16 кГц моно int16.
+    Сирий s16le зі stdout ffmpeg читається прямо у заздалегідь виділений NumPy-буфер,
+    без проміжного WAV на диску.
+
+    Args:
+        filepath (str): Шлях до вхідного файлу.
+        expected_samples (int): Очікувана кількість семплів (якщо тривалість відома).
+        mmap_threshold_sec (float): Якщо аудіо довше — буфер переноситься у memmap.
+        read_size (int): Розмір одного читання зі stdout, байт.
+        input_chunks (iterable[bytes]): Замість файлу — потік байтів, що подається у stdin ffmpeg
+            з окремого потоку (декодування файлу, який ще завантажується).
+        stream_index (int): Глобальний індекс аудіопотоку (з probe_media); без нього ffmpeg бере
+            аудіопотік за замовчуванням. Відео, субтитри і дані не демультиплексуються в будь-якому разі.
+    Returns:
+        np.ndarray[int16] (або np.memmap) з рівно декодованою кількістю семплів.
+    """
+    command = [
+        "ffmpeg",
+        "-loglevel", "error",
+        "-i", "pipe:0" if input_chunks is not None else filepath,
+        *(["-map", f"0:{stream_index}"] if stream_index is not None else []),
+        "-vn", "-sn", "-dn",
+        "-f", "s16le",
+        "-ar", str(SAMPLE_RATE),
+        "-ac", "1",
+        "-c:a", "pcm_s16le",
+        "pipe:1",
+    ]
+    mmap_threshold = int(mmap_threshold_sec * SAMPLE_RATE) if mmap_threshold_sec else None
+
+    capacity = int(expected_samples or 60 * SAMPLE_RATE)
+    buffer = np.empty(capacity, dtype=np.int16)
+    mmap_file = None
+    if mmap_threshold is not None and capacity > mmap_threshold:
+        buffer, mmap_file = _to_mmap(buffer, 0, capacity)
+
+    filled_bytes = 0
+    with tempfile.TemporaryFile() as stderr_file:
+        if input_chunks is None:
+            command.insert(1, "-nostdin")
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if input_chunks is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        feeder = None
+        feed_errors = []
+        if input_chunks is not None:
+            feeder = threading.Thread(target=_feed_stdin, args=(process.stdin, input_chunks, feed_errors), daemon=True)
+            feeder.start()
+        try:
+            while True:
+                # Буфер росте лише коли заповнений повністю: читання обмежене залишком місця,
+                # тож точна expected_samples не спричиняє зайвого збільшення біля кінця файлу
+                if filled_bytes >= capacity * 2:
+                    capacity = capacity * 3 // 2 + 1
+                    if mmap_file is None and mmap_threshold is not None and capacity > mmap_threshold:
+                        buffer, mmap_file = _to_mmap(buffer, filled_bytes // 2, capacity)
+                    else:
+                        buffer = _grow_buffer(buffer, capacity, mmap_file)
+                view = memoryview(buffer.view(np.uint8))[filled_bytes:min(filled_bytes + read_size, capacity * 2)]
+                read = process.stdout.readinto(view)
+                if not read:
+                    break
+                filled_bytes += read
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+            if feeder is not None:
+                feeder.join()
+
+        if feed_errors:
+            raise feed_errors[0]
+        if returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(
+                returncode, command, stderr=stderr_file.read().decode(errors='replace'))
+
+    logging.info(f"Декодовано {filled_bytes // 2 / SAMPLE_RATE:.1f} с аудіо"
+                 f"{' у memmap' if mmap_file is not None else ''}.")
+    samples = filled_bytes // 2
+    if mmap_file is None and samples < capacity * 3 // 4:
+        # Зріз тримав би весь буфер (запас 60 с за замовчуванням або завищена тривалість) —
+        # копія звільняє невикористаний хвіст. memmap не копіюється: інакше він опинився б у пам'яті,
+        # а незаписані сторінки файлу й так не займають RAM.
+        return buffer[:samples].copy()
+    return buffer[:samples]
@@ -0,0 +1,194 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .audio import chunk_samples, gather_chunk, slice_chunk
+from .decoding import NO_SPEECH_THRESHOLD, TEMPERATURES, is_silence, needs_fallback, split_segments
+
+
+WINDOW_SECONDS = 30
+
+
+def split_windows(start, end, sample_rate, window_sec=WINDOW_SECONDS):
+    """
+    Ділить діапазон семплів на вікна енкодера Whisper (по 30 с).
+    """
+    window = int(window_sec * sample_rate)
+    return [(s, min(s + window, end)) for s in range(start, end, window)]
+
+
+class _BatchItem:
+    __slots__ = ('key', 'mel', 'future')
+
+    def __init__(self, key, mel):
+        self.key = key
+        self.mel = mel
+        self.future = Future()
+
+
+class BatchingEngine:
+    """
+    Пакетний інференс Whisper у межах процесу воркера.
+    Лог-мел сегменти (30 с) від різних частин і різних задач (при пулі threads/gevent)
+    збираються у пакет до max_batch_size або до спливу max_wait_ms, після чого
+    енкодер і жадібний декодер проганяються один раз на весь пакет.
+    Вікна, що не пройшли перевірки whisper.transcribe (компресія, avg_logprob), декодуються ще раз
+    пакетом з вищою температурою; вікна без мовлення (no_speech) відкидаються в transcribe_chunks.
+    Пакет формується лише з сегментів з однаковою моделлю і мовою.
+    """
+
+    def __init__(self, get_model, max_batch_size=8, max_wait_ms=50):
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._deferred = deque()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='whisper-batching', daemon=True)
+                self._thread.start()
+
+    def submit(self, model_name, audio, language=None, mel=None):
+        """
+        Ставить у чергу один сегмент аудіо (float32, не довше 30 с).
+        mel — вже готове вікно (n_mels, 3000), напр. з features.LogMel файлу; тоді audio не потрібне.
+        Returns:
+            Future з whisper.DecodingResult.
+        """
+        import whisper
+        if mel is None:
+            model = self.get_model(model_name)
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+        item = _BatchItem((model_name, language), mel)
+        self._ensure_thread()
+        self._queue.put(item)
+        return item.future
+
+    def _next_item(self, timeout=None):
+        if self._deferred:
+            return self._deferred.popleft()
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self):
+        first = self._next_item()
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        skipped = []
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._deferred:
+                break
+            try:
+                item = self._next_item(timeout=max(remaining, 0))
+            except queue.Empty:
+                break
+            if item.key == first.key:
+                batch.append(item)
+            else:
+                skipped.append(item)
+        self._deferred.extend(skipped)
+        return batch
+
+    def _run_batch(self, batch):
+        import torch
+        model_name, language = batch[0].key
+        try:
+            model = self.get_model(model_name)
+            mel = torch.stack([item.mel for item in batch]).to(model.device)
+            results = self._decode(model, mel, language)
+        except Exception as e:
+            logging.error(f"Помилка пакетного інференсу: {e}")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+    @staticmethod
+    def _decode(model, mel, language):
+        """
+        Декодує пакет вікон з часовими мітками; вікна, яким потрібен fallback, декодуються
+        ще раз разом (окремим меншим пакетом) з наступною температурою.
+        """
+        import whisper
+        results = [None] * len(mel)
+        pending = list(range(len(mel)))
+        for temperature in TEMPERATURES:
+            options = whisper.DecodingOptions(
+                language=language, temperature=temperature, without_timestamps=False, fp16=False,
+            )
+            retry = []
+            for i, result in zip(pending, whisper.decode(model, mel[pending], options)):
+                results[i] = result
+                # Ймовірна тиша — повторне декодування з вищою температурою не допоможе
+                if needs_fallback(result) and result.no_speech_prob <= NO_SPEECH_THRESHOLD:
+                    retry.append(i)
+            pending = retry
+            if not pending:
+                break
+        return results
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            logging.debug(f"Пакет з {len(batch)} сегментів")
+            self._run_batch(batch)
+
+    def _tokenizer(self, model_name, language):
+        from whisper.tokenizer import get_tokenizer
+        model = self.get_model(model_name)
+        return get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language=language, task='transcribe',
+        )
+
+    def transcribe_chunks(self, model_name, audio, chunk_ranges, sample_rate, language=None, mel=None):
+        """
+        Генератор: для кожної частини повертає (індекс, результат) у порядку chunk_ranges.
+        Частина — список діапазонів семплів; вікна нарізаються зі склеєного аудіо частини.
+        З mel (features.LogMel файлу) вікна беруться з готової спектрограми.
+        Результат має вигляд результату model.transcribe: text і segments (за часовими мітками,
+        час відносно початку склеєного аудіо частини); вікна без мовлення пропускаються.
+        Сегменти наступних частин ставляться в чергу наперед (до 2 пакетів),
+        щоб engine мав з чого формувати пакет.
+        """
+        tokenizer = self._tokenizer(model_name, language)
+        windows = [(i, s, e) for i, chunk in enumerate(chunk_ranges)
+                   for s, e in split_windows(0, chunk_samples(chunk), sample_rate)]
+        lookahead = 2 * self.max_batch_size
+        pending = deque()
+        segments = [[] for _ in chunk_ranges]
+        done_windows = [0] * len(chunk_ranges)
+        total_windows = [0] * len(chunk_ranges)
+        for i, _, _ in windows:
+            total_windows[i] += 1
+
+        next_window = 0
+        next_chunk = 0
+        while next_chunk < len(chunk_ranges):
+            while next_window < len(windows) and len(pending) < lookahead:
+                i, s, e = windows[next_window]
+                parts = slice_chunk(chunk_ranges[i], s, e)
+                window_mel = mel.window(parts) if mel is not None else None
+                window_audio = gather_chunk(audio, parts) if mel is None else None
+                pending.append((i, s, e, self.submit(model_name, window_audio, language, mel=window_mel)))
+                next_window += 1
+            i, s, e, future = pending.popleft()
+            decoded = future.result()
+            if not is_silence(decoded):
+                segments[i].extend(split_segments(decoded, tokenizer, (e - s) / sample_rate, offset=s / sample_rate))
+            done_windows[i] += 1
+            while next_chunk < len(chunk_ranges) and done_windows[next_chunk] == total_windows[next_chunk]:
+                chunk_segments = segments[next_chunk]
+                yield next_chunk, {
+                    'text': "".join(seg['text'] for seg in chunk_segments),
+                    'segments': chunk_segments,
+                }
+                segments[next_chunk] = None
+                next_chunk += 1
@@ -0,0 +1,436 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils import timezone
+from . import audio as audio_module
+from . import tasks
+from .audio import (
+    SAMPLE_RATE, chunk_samples, gather_chunk, load_wav_pcm, pcm_to_float32, probe_media, window_padding,
+)
+from .batching import WINDOW_SECONDS
+from .decoding import DecodingSession
+from .features import LogMel
+from .model_registry import model_size_bytes
+from .models import MediaFile, TranscriptCheckpoint
+from .progress import ProgressWriter
+from .vad import detect_speech
+
+
+BENCHMARK_USERNAME = 'pipeline-benchmark'
+
+# Варіанти синтетичного аудіо: (шум, паузи тиші)
+SYNTHETIC_VARIANTS = {
+    'clean': (False, False),
+    'noisy': (True, False),
+    'silence': (False, True),
+    'noisy-silence': (True, True),
+}
+
+STAGES = ('probe', 'process_input_file', 'decode', 'noise_reduction', 'split', 'combine_chunks', 'pack_ranges', 'vad',
+          'log_mel', 'inference', 'db_writes')
+
+
+def peak_rss_mb():
+    """
+    Пікова резидентна пам'ять процесу (ru_maxrss: КБ на Linux, байти на macOS), МБ.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """
+    Поточна резидентна пам'ять процесу, МБ (None, якщо /proc недоступний).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def synthesize_speech_like(duration_sec, noise=False, silence=False, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Детерміноване «мовоподібне» int16 аудіо: гармоніки з плаваючою основною частотою
+    і складовою обвідною ~4 Гц (проходить VAD і детектор тиші як мовлення).
+    - noise: білий шум приблизно 10 дБ SNR;
+    - silence: паузи тиші 3–8 с між фразами 5–20 с.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration_sec * sample_rate)
+    t = np.arange(n, dtype=np.float64) / sample_rate
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t) + 15 * np.sin(2 * np.pi * 2.1 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    signal = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, np.pi)), 0, None) ** 0.5
+    signal *= syllables * 0.3 / np.max(np.abs(signal) + 1e-9)
+
+    if silence:
+        position = 0
+        while position < n:
+            position += int(rng.uniform(5, 20) * sample_rate)
+            gap = int(rng.uniform(3, 8) * sample_rate)
+            signal[position:position + gap] = 0
+            position += gap
+    if noise:
+        signal += rng.normal(0, 0.3 * np.sqrt(np.mean(signal ** 2)), n)
+    return (np.clip(signal, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def synthetic_cases(durations, variants=None):
+    """
+    Опис синтетичних випадків: назва, тривалість і варіант (див. SYNTHETIC_VARIANTS).
+    """
+    return [
+        {'name': f"synthetic-{variant}-{int(duration)}s", 'duration': duration, 'variant': variant}
+        for duration in durations
+        for variant in (variants or SYNTHETIC_VARIANTS)
+    ]
+
+
+def file_cases(paths):
+    return [{'name': os.path.basename(path), 'path': path} for path in paths]
+
+
+def example_cases():
+    """
+    Приклади, що вже лежать у медіа-сховищі (MediaFile.is_example).
+    """
+    return [
+        {'name': f"example-{media_file.id}-{media_file.original_filename}", 'path': media_file.file.path}
+        for media_file in MediaFile.objects.filter(is_example=True).only('id', 'original_filename', 'file')
+        if media_file.file and os.path.exists(media_file.file.path)
+    ]
+
+
+class StageTimer:
+    """
+    Час кожного етапу (сумується при повторних викликах) і пікова RSS після нього.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.peak_rss_mb = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+            self.peak_rss_mb[name] = peak_rss_mb()
+
+    @contextmanager
+    def wrap(self, module, attribute, name):
+        """
+        Тимчасово обгортає module.attribute, щоб виміряти етап усередині реального виклику
+        (наприклад, combine_chunks всередині plan_chunks).
+        """
+        original = getattr(module, attribute)
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        setattr(module, attribute, timed)
+        try:
+            yield
+        finally:
+            setattr(module, attribute, original)
+
+
+def _db_writes(timer, chunks):
+    """
+    Ті самі записи у БД, що й process_media_file_task: контрольна точка на частину, проміжний текст,
+    сегменти одним bulk_create і фінальний запис тексту зі статусом.
+    Усе виконується в транзакції, яка відкочується: у робочій БД не лишається ні файлу, ні його рядків
+    (час етапу — без фіксації транзакції).
+    """
+    with transaction.atomic():
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        media_file = MediaFile.objects.create(
+            user=user, original_filename='benchmark.wav', original_filesize=0, file_type='audio',
+            status='processing',
+        )
+        with timer.stage('db_writes'):
+            progress = ProgressWriter(media_file)
+            segments = []
+            for chunk in chunks:
+                tasks.save_checkpoint(media_file.id, chunk)
+                if chunk['text']:
+                    progress.append(chunk['text'] + " ")
+                segments.extend(chunk['segments'])
+            tasks.save_segments(media_file, segments)
+            TranscriptCheckpoint.objects.filter(media_file=media_file).delete()
+            media_file.status = 'completed'
+            media_file.file_deletion_date = timezone.now() + timezone.timedelta(days=30)
+            progress.flush(extra_fields=['status', 'file_deletion_date'])
+        transaction.set_rollback(True)
+
+
+def _edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(reference_chunks, hypothesis_chunks):
+    """
+    WER гіпотези відносно еталона, порахований по частинах (частини мають ті самі межі),
+    тож відстань редагування не квадратична від довжини всього запису.
+    """
+    edits = words = 0
+    for reference, hypothesis in zip(reference_chunks, hypothesis_chunks):
+        reference_words = reference['text'].lower().split()
+        edits += _edit_distance(reference_words, hypothesis['text'].lower().split())
+        words += len(reference_words)
+    return edits / words if words else 0.0
+
+
+def _placeholder_result(chunk, sample_rate=SAMPLE_RATE):
+    """
+    Результат частини без інференсу (--skip-inference): текст і сегменти типового обсягу,
+    щоб етап записів у БД мав реалістичне навантаження.
+    """
+    duration = chunk_samples(chunk) / sample_rate
+    num_segments = max(1, int(duration // 5))
+    return {
+        'text': " ".join(["слово"] * int(duration * 2.5)),
+        'segments': [
+            {'start': i * duration / num_segments, 'end': (i + 1) * duration / num_segments,
+             'text': " ".join(["слово"] * 12), 'tokens': list(range(20)), 'avg_logprob': -0.3}
+            for i in range(num_segments)
+        ],
+    }
+
+
+def run_case(case, options):
+    """
+    Проганяє один випадок через усі етапи конвеєра і повертає словник результатів.
+    Етапи виконуються послідовно (без накладання шумозаглушення з інференсом), щоб час кожного
+    вимірювався окремо.
+    """
+    connections.close_all()
+    rss_start = current_rss_mb()
+    timer = StageTimer()
+    temp_dir = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        path = case.get('path')
+        if path is None:
+            path = os.path.join(temp_dir, f"{case['name']}.wav")
+            noise, silence = SYNTHETIC_VARIANTS[case['variant']]
+            write_wav(path, synthesize_speech_like(case['duration'], noise=noise, silence=silence,
+                                                   seed=options['seed']))
+
+        with timer.stage('probe'):
+            stream_index = probe_media(path)['audio_stream_index']
+
+        with timer.stage('process_input_file'):
+            wav_path, wav_dir = tasks.process_input_file(path, stream_index=stream_index)
+            samples, _ = load_wav_pcm(wav_path)
+            shutil.rmtree(wav_dir, ignore_errors=True)
+        del samples
+
+        with timer.stage('decode'):
+            samples = tasks.decode_input_file(path, stream_index=stream_index)
+        duration = len(samples) / SAMPLE_RATE
+        audio = pcm_to_float32(samples)
+
+        if options['reduce_noise']:
+            with timer.stage('noise_reduction'):
+                tasks.start_denoiser(audio, SAMPLE_RATE).join()
+
+        # Кількість частин без VAD — для порівняння (поза етапами)
+        num_chunks_split = len(tasks.plan_chunk_ranges(samples, SAMPLE_RATE, options['split_audio'], use_vad=False))
+        speech_ranges = None
+        if options['vad']:
+            # Мовні ділянки окремим етапом; як і в конвеєрі, вирізання немови йде до пакування у вікна
+            with timer.stage('vad'):
+                speech_ranges = detect_speech(samples, SAMPLE_RATE)
+        # Пакування (combine_chunks, з VAD — pack_ranges) вимірюється всередині реального виклику plan_chunks
+        # (входить і в split)
+        with timer.wrap(audio_module, 'combine_chunks', 'combine_chunks'), \
+                timer.wrap(audio_module, 'pack_ranges', 'pack_ranges'), timer.stage('split'):
+            chunk_ranges = tasks.plan_chunk_ranges(
+                samples, SAMPLE_RATE, options['split_audio'], use_vad=options['vad'], speech_ranges=speech_ranges,
+            )
+        speech_sec = sum(chunk_samples(chunk) for chunk in chunk_ranges) / SAMPLE_RATE
+        padding = window_padding(chunk_ranges, SAMPLE_RATE, WINDOW_SECONDS)
+
+        # Перший бекенд — основний (етап inference і записи у БД), решта — для порівняння з ним
+        backends = {}
+        chunks = None
+        # Спектрограма одна на всі бекенди (з однаковою кількістю мел-смуг)
+        mels = {}
+        for backend in options['backends']:
+            model = session = None
+            if not options['skip_inference'] and chunk_ranges:
+                with timer.stage(f"model_load@{backend}"):
+                    model = tasks.get_whisper_model(options['model'], backend)
+                mel = mels.get(model.dims.n_mels)
+                if mel is None:
+                    with timer.stage('log_mel'):
+                        mel = mels[model.dims.n_mels] = LogMel(audio, model.dims.n_mels)
+                        mel.ensure(mel.num_frames)
+                # Та сама сесія декодування, що й у конвеєрі: мова один раз, підказка з попередньої частини
+                session = DecodingSession(model, options['language'], mel=mel)
+            stage = 'inference' if chunks is None else f"inference@{backend}"
+            chunk_seconds = []
+            backend_chunks = []
+            for i, chunk in enumerate(chunk_ranges):
+                if model is None:
+                    result = _placeholder_result(chunk)
+                else:
+                    started = time.perf_counter()
+                    with timer.stage(stage):
+                        result = session.transcribe(gather_chunk(audio, chunk), chunk)
+                    chunk_seconds.append(time.perf_counter() - started)
+                backend_chunks.append(tasks._chunk_result(i, chunk, result))
+            if chunks is None:
+                chunks = backend_chunks
+            backends[backend] = {
+                'inference_sec': round(sum(chunk_seconds), 4),
+                'inference_rtf': round(sum(chunk_seconds) / duration, 4) if duration and chunk_seconds else None,
+                'chunk_sec': {
+                    'mean': round(statistics.mean(chunk_seconds), 4),
+                    'p50': round(statistics.median(chunk_seconds), 4),
+                    'max': round(max(chunk_seconds), 4),
+                } if chunk_seconds else None,
+                'model_mb': round(model_size_bytes(model) / (1024 * 1024), 1) if model is not None else None,
+                # Еталона для синтетичного аудіо немає — точність порівнюється з основним бекендом
+                'wer_vs_primary': round(word_error_rate(chunks, backend_chunks), 4),
+            }
+            if model is not None and len(options['backends']) > 1:
+                # Моделі різних бекендів не тримаються в пам'яті одночасно
+                del model, session
+                tasks.model_registry.clear()
+
+        if options['db_writes']:
+            _db_writes(timer, chunks)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        connections.close_all()
+
+    # Повний час обробки воркера: process_input_file і decode — альтернативні шляхи, рахується лише decode;
+    # probe виконується при завантаженні, combine_chunks і pack_ranges уже входять у split;
+    # завантаження моделей і порівняльні бекенди не рахуються
+    total = sum(seconds for stage, seconds in timer.seconds.items()
+                if stage not in ('probe', 'process_input_file', 'combine_chunks', 'pack_ranges') and '@' not in stage)
+    return {
+        'name': case['name'],
+        'source': case.get('path') or f"synthetic:{case['variant']}",
+        'audio_sec': round(duration, 3),
+        'speech_sec': round(speech_sec, 3),
+        'num_chunks_split': num_chunks_split,
+        'num_chunks': len(chunk_ranges),
+        'sent_sec': round(padding['sent_sec'], 3),
+        'encoder_windows': padding['windows'],
+        'padding_sec': round(padding['padded_sec'], 3),
+        'padding_ratio': round(padding['padding_ratio'], 4),
+        'stages_sec': {stage: round(seconds, 4) for stage, seconds in timer.seconds.items()},
+        'stage_peak_rss_mb': {stage: round(rss, 1) for stage, rss in timer.peak_rss_mb.items()},
+        'backends': backends,
+        'total_sec': round(total, 4),
+        'rtf': round(total / duration, 4) if duration else None,
+        'inference_rtf': round(timer.seconds['inference'] / duration, 4)
+        if duration and 'inference' in timer.seconds else None,
+        'rss_start_mb': round(rss_start, 1) if rss_start is not None else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_case_isolated(case, options):
+    """
+    Запускає випадок в окремому fork-процесі (як дочірній процес prefork-воркера Celery),
+    тож peak_rss_mb не накопичується між випадками.
+    """
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        return pool.submit(run_case, case, options).result()
+
+
+def environment_info(options):
+    import django
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'db_vendor': connections['default'].vendor,
+        'settings': {
+            name: getattr(settings, name, None)
+            for name in ('WHISPER_DEFAULT_MODEL', 'WHISPER_DEFAULT_BACKEND', 'TRANSCRIPTION_CHUNK_TARGET_SEC',
+                         'TRANSCRIPTION_SHARED_MEL', 'TRANSCRIPTION_VAD_ENABLED', 'TRANSCRIPTION_DENOISE_BLOCK_SEC',
+                         'TRANSCRIPTION_DENOISE_JOBS', 'TRANSCRIPTION_PROGRESS_SAVE_INTERVAL_SEC')
+        },
+        'options': options,
+    }
+
+
+def compare_to_baseline(results, baseline, max_regression):
+    """
+    Порівнює час етапів і пікову пам'ять з попереднім запуском (той самий формат JSON).
+    Returns:
+        list[str]: Опис регресій, більших за max_regression (частка, напр. 0.2 — на 20%).
+    """
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results:
+        before = previous.get(case['name'])
+        if before is None:
+            continue
+        metrics = [(stage, seconds, before.get('stages_sec', {}).get(stage))
+                   for stage, seconds in case['stages_sec'].items()]
+        metrics.append(('peak_rss_mb', case['peak_rss_mb'], before.get('peak_rss_mb')))
+        for metric, value, old in metrics:
+            # Дуже короткі етапи шумні — їх не порівнюємо
+            if not old or (metric != 'peak_rss_mb' and old < 0.05):
+                continue
+            if value > old * (1 + max_regression):
+                regressions.append(f"{case['name']}: {metric} {old} -> {value} (+{(value / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, report):
+    if path == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(path, 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logging.info(f"Результати бенчмарку збережено у {path}")
@@ -0,0 +1,55 @@
+import os
+import shutil
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class LocalChunkStore:
+    """
+    Сховище частин аудіо (int16 PCM) для розподіленої обробки.
+    Кожна частина — окремий .npy файл у <root>/<job_key>/.
+    Для кількох вузлів root має бути спільним томом (NFS тощо); для тестів вистачає локального диска.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def _job_dir(self, job_key):
+        return os.path.join(self.root, str(job_key))
+
+    def _path(self, job_key, index):
+        return os.path.join(self._job_dir(job_key), f"chunk_{index:04}.npy")
+
+    def put(self, job_key, index, samples):
+        os.makedirs(self._job_dir(job_key), exist_ok=True)
+        path = self._path(job_key, index)
+        # Запис у тимчасовий файл і rename, щоб читач не побачив недописану частину
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(samples, dtype=np.int16))
+        os.replace(tmp_path, path)
+        return path
+
+    def get(self, job_key, index):
+        return np.load(self._path(job_key, index), mmap_mode='r')
+
+    def exists(self, job_key):
+        """
+        Чи є частини задачі у сховищі (розподілена обробка ще не зібрана).
+        """
+        return os.path.isdir(self._job_dir(job_key))
+
+    def delete(self, job_key):
+        shutil.rmtree(self._job_dir(job_key), ignore_errors=True)
+
+
+def get_chunk_store():
+    """
+    Створює сховище частин згідно TRANSCRIPTION_CHUNK_STORE / TRANSCRIPTION_CHUNK_STORE_OPTIONS.
+    """
+    backend = getattr(settings, 'TRANSCRIPTION_CHUNK_STORE', 'transcription.chunk_store.LocalChunkStore')
+    options = getattr(settings, 'TRANSCRIPTION_CHUNK_STORE_OPTIONS', {})
+    if 'root' not in options and backend.endswith('LocalChunkStore'):
+        options = dict(options, root=os.path.join(settings.MEDIA_ROOT, 'chunks'))
+    return import_string(backend)(**options)
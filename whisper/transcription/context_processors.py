@@ -0,0 +1,8 @@
+from .events import events_available
+
+
+def transcription_events(request):
+    """
+    Чи підключатися сторінці до SSE-потоку подій (інакше — опитування статусу).
+    """
+    return {'transcription_events_enabled': events_available(request)}
@@ -0,0 +1,182 @@
+import logging
+from .audio import SAMPLE_RATE
+
+
+# Пороги whisper.transcribe: fallback по температурах і пропуск вікон без мовлення
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class DecodingSession:
+    """
+    Стан декодування одного файлу, спільний для всіх його частин.
+    - Мова визначається один раз (за першою мовною частиною) або береться з параметрів файлу,
+      тож model.transcribe не запускає визначення мови (зайвий прохід енкодера) на кожній частині.
+    - Хвіст токенів попередньої частини подається як підказка (prompt) наступної: на межах частин
+      зберігається контекст (імена, терміни, пунктуація) і менше повторних декодувань з fallback.
+    - З mel (features.LogMel файлу) частини до 30 с декодуються одним вікном прямо з готової
+      спектрограми, без STFT і мел-фільтрів на кожну частину; довші частини йдуть через model.transcribe.
+    """
+
+    def __init__(self, model, language=None, prompt_tokens=64, min_prompt_logprob=-1.0, mel=None):
+        self.model = model
+        self.language = None if language in (None, '', 'auto') else language
+        self.prompt_tokens = prompt_tokens
+        self.min_prompt_logprob = min_prompt_logprob
+        self.mel = mel
+        self._tokenizer = None
+        self._prompt = []
+
+    def ensure_language(self, audio, mel=None):
+        """
+        Визначає мову за першими 30 с audio (float32, 16 кГц) або готовим вікном mel, якщо її ще не задано.
+        """
+        if self.language is not None:
+            return self.language
+        import whisper
+        if not self.model.is_multilingual:
+            self.language = 'en'
+            return self.language
+        if mel is None:
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+        _, probs = self.model.detect_language(mel.to(self.model.device))
+        self.language = max(probs, key=probs.get)
+        logging.info(f"Визначено мову: {self.language} ({probs[self.language]:.2f}).")
+        return self.language
+
+    def _get_tokenizer(self):
+        if self._tokenizer is None:
+            from whisper.tokenizer import get_tokenizer
+            self._tokenizer = get_tokenizer(
+                self.model.is_multilingual, num_languages=self.model.num_languages,
+                language=self.language, task='transcribe',
+            )
+        return self._tokenizer
+
+    def remember(self, result):
+        """
+        Запам'ятовує хвіст тексту частини (результат model.transcribe або контрольна точка)
+        як підказку для наступної. Частина без тексту або з низькою впевненістю скидає підказку,
+        щоб помилка (галюцинація) не тягнулась далі.
+        """
+        segments = [seg for seg in result.get('segments') or [] if seg.get('tokens')]
+        if not segments or (segments[-1].get('avg_logprob') is not None
+                            and segments[-1]['avg_logprob'] < self.min_prompt_logprob):
+            self._prompt = []
+            return
+        tokenizer = self._get_tokenizer()
+        tokens = []
+        for seg in reversed(segments):
+            # Лише текстові токени: спецтокени і часові мітки не декодуються в підказку
+            tokens[:0] = [token for token in seg['tokens'] if token < tokenizer.eot]
+            if len(tokens) >= self.prompt_tokens:
+                break
+        self._prompt = tokens[-self.prompt_tokens:]
+
+    def transcribe(self, audio, chunk=None, **kwargs):
+        """
+        Транскрибує одну частину з мовою сесії та підказкою з попередньої частини.
+        audio — аудіо частини (audio.gather_chunk); chunk — її діапазони семплів у файлі (для вікна з self.mel).
+        Час сегментів — відносно початку audio.
+        """
+        from .features import N_FRAMES, LogMel
+        mel = None
+        if self.mel is not None and chunk is not None and LogMel.chunk_frames(chunk) <= N_FRAMES:
+            mel = self.mel.window(chunk)
+        self.ensure_language(audio, mel)
+        if mel is not None:
+            result = self.decode_window(mel, len(audio) / SAMPLE_RATE)
+        else:
+            prompt = self._get_tokenizer().decode(self._prompt).strip() if self._prompt else None
+            result = self.model.transcribe(
+                audio, fp16=False, verbose=False, language=self.language, initial_prompt=prompt, **kwargs,
+            )
+        self.remember(result)
+        return result
+
+    def decode_window(self, mel, duration, temperatures=TEMPERATURES,
+                      compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD, logprob_threshold=LOGPROB_THRESHOLD,
+                      no_speech_threshold=NO_SPEECH_THRESHOLD):
+        """
+        Декодує одне 30-секундне вікно з готового мелу — та сама логіка, що й у whisper.transcribe
+        для одного вікна: fallback по температурах, пропуск тиші (no_speech), сегменти за часовими мітками.
+        Returns:
+            dict: text, segments (час відносно початку частини), language — як результат model.transcribe.
+        """
+        import whisper
+        mel = mel.to(self.model.device)
+        result = None
+        for temperature in temperatures:
+            options = whisper.DecodingOptions(
+                task='transcribe', language=self.language, temperature=temperature, prompt=list(self._prompt),
+                without_timestamps=False, fp16=False,
+            )
+            result = whisper.decode(self.model, mel, options)
+            # Ймовірна тиша — повторне декодування з вищою температурою не допоможе
+            if (not needs_fallback(result, compression_ratio_threshold, logprob_threshold)
+                    or result.no_speech_prob > no_speech_threshold):
+                break
+        if is_silence(result, no_speech_threshold, logprob_threshold):
+            return {'text': '', 'segments': [], 'language': self.language}
+        segments = split_segments(result, self._get_tokenizer(), duration)
+        return {
+            'text': "".join(seg['text'] for seg in segments),
+            'segments': segments,
+            'language': self.language,
+        }
+
+
+def needs_fallback(result, compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+                   logprob_threshold=LOGPROB_THRESHOLD):
+    """
+    Чи треба декодувати вікно ще раз з вищою температурою: текст повторюється (висока компресія)
+    або модель невпевнена.
+    """
+    return result.compression_ratio > compression_ratio_threshold or result.avg_logprob < logprob_threshold
+
+
+def is_silence(result, no_speech_threshold=NO_SPEECH_THRESHOLD, logprob_threshold=LOGPROB_THRESHOLD):
+    """
+    Вікно без мовлення (як у whisper.transcribe): висока ймовірність тиші і невпевнений текст.
+    """
+    return result.no_speech_prob > no_speech_threshold and result.avg_logprob < logprob_threshold
+
+
+def split_segments(result, tokenizer, duration, offset=0.0):
+    """
+    Сегменти вікна між парами сусідніх часових міток (<|t1|> текст <|t2|><|t2|> ...).
+    duration — тривалість аудіо у вікні (с), offset — початок вікна відносно початку частини.
+    """
+    segments = []
+    tokens = list(result.tokens)
+    timestamp_begin = tokenizer.timestamp_begin
+
+    def add_segment(segment_tokens, start, end):
+        text_tokens = [token for token in segment_tokens if token < tokenizer.eot]
+        text = tokenizer.decode(text_tokens)
+        if text.strip():
+            segments.append({
+                'start': round(offset + start, 3), 'end': round(offset + min(end, duration), 3), 'text': text,
+                'tokens': segment_tokens, 'avg_logprob': result.avg_logprob,
+            })
+
+    boundaries = [i + 1 for i in range(len(tokens) - 1)
+                  if tokens[i] >= timestamp_begin and tokens[i + 1] >= timestamp_begin]
+    if tokens[-1:] and tokens[-1] >= timestamp_begin:
+        boundaries.append(len(tokens))
+    last = 0
+    precision = 0.02
+    for boundary in boundaries:
+        piece = tokens[last:boundary]
+        if piece and piece[0] >= timestamp_begin:
+            add_segment(piece, (piece[0] - timestamp_begin) * precision, (piece[-1] - timestamp_begin) * precision)
+        last = boundary
+    if last < len(tokens):
+        # Хвіст без закривної мітки: у whisper.transcribe його б дочитало наступне вікно,
+        # тут вікно останнє — тож він триває до кінця вікна
+        piece = tokens[last:]
+        start = (piece[0] - timestamp_begin) * precision if piece[0] >= timestamp_begin else 0.0
+        add_segment(piece, start, duration)
+    return segments
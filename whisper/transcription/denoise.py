@@ -0,0 +1,135 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import noisereduce as nr
+from .audio import frame_energy
+
+
+def estimate_noise_clip(audio, sample_rate, noise_sec=5.0, frame_sec=0.1):
+    """
+    Оцінює профіль шуму один раз на весь файл: збирає найтихіші кадри (сумарно до noise_sec)
+    у короткий кліп, який потім використовується для всіх блоків.
+    """
+    frame_len = int(frame_sec * sample_rate)
+    full_frames = len(audio) // frame_len
+    if full_frames == 0:
+        return np.array(audio, dtype=np.float32)
+    energy = frame_energy(audio[:full_frames * frame_len], frame_len)
+    num_frames = max(1, min(full_frames, int(noise_sec / frame_sec)))
+    quietest = np.sort(np.argpartition(energy, num_frames - 1)[:num_frames])
+    frames = audio[:full_frames * frame_len].reshape(full_frames, frame_len)
+    return np.ascontiguousarray(frames[quietest].reshape(-1), dtype=np.float32)
+
+
+def _reduce_block(block, sample_rate, noise_clip):
+    return nr.reduce_noise(y=block, sr=sample_rate, stationary=True, y_noise=noise_clip).astype(np.float32, copy=False)
+
+
+def denoise_blocks(audio, sample_rate, block_sec=60.0, context_sec=1.0, crossfade_sec=0.05, n_jobs=1,
+                   noise_clip=None):
+    """
+    Зменшує шум у float32-буфері audio на місці, блок за блоком.
+    - Профіль шуму (кліп найтихіших кадрів) оцінюється один раз.
+    - Кожен блок обробляється з context_sec контексту з обох боків, тож шви не потрапляють у результат;
+      на межі блоків виходи змішуються лінійним crossfade.
+    - Пікова пам'ять обмежена розміром n_jobs блоків, незалежно від тривалості запису.
+    - n_jobs > 1 обробляє кілька блоків паралельно (потоки; FFT у NumPy/SciPy відпускає GIL).
+
+    Yields:
+        int: Кількість семплів від початку буфера, які вже оброблені (для накладання з інференсом).
+    """
+    length = len(audio)
+    if length == 0:
+        return
+    if noise_clip is None:
+        noise_clip = estimate_noise_clip(audio, sample_rate)
+
+    block = max(1, int(block_sec * sample_rate))
+    context = int(context_sec * sample_rate)
+    crossfade = min(int(crossfade_sec * sample_rate), context)
+    starts = list(range(0, length, block))
+
+    # Оригінальні семпли лівого контексту наступного блоку (їх буде перезаписано на місці)
+    left_original = np.empty(0, dtype=np.float32)
+    # Вихід попереднього блоку для перших crossfade семплів поточного — для змішування
+    carry = None
+    fade_in = np.linspace(0.0, 1.0, crossfade, dtype=np.float32) if crossfade else None
+
+    executor = ThreadPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        for group_start in range(0, len(starts), max(1, n_jobs)):
+            group = starts[group_start:group_start + max(1, n_jobs)]
+            # Входи всієї групи копіюються до будь-якого запису, тож читаємо лише оригінальні семпли
+            inputs = []
+            for start in group:
+                end = min(start + block, length)
+                right = min(end + context, length)
+                if start == group[0]:
+                    left_part = left_original
+                else:
+                    left_part = audio[max(start - context, 0):start]
+                inputs.append((start, end, len(left_part), np.concatenate((left_part, audio[start:right]))))
+
+            if executor is not None:
+                outputs = list(executor.map(lambda item: _reduce_block(item[3], sample_rate, noise_clip), inputs))
+            else:
+                outputs = [_reduce_block(item[3], sample_rate, noise_clip) for item in inputs]
+
+            last_end = inputs[-1][1]
+            left_original = audio[max(last_end - context, 0):last_end].copy()
+
+            for (start, end, offset, _), output in zip(inputs, outputs):
+                core = output[offset:offset + (end - start)]
+                if carry is not None and crossfade:
+                    n = min(crossfade, len(core), len(carry))
+                    core[:n] = carry[:n] * (1.0 - fade_in[:n]) + core[:n] * fade_in[:n]
+                carry = output[offset + (end - start):offset + (end - start) + crossfade].copy()
+                audio[start:end] = core
+                yield end
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class BackgroundDenoiser:
+    """
+    Запускає denoise_blocks у фоновому потоці, щоб інференс частини N ішов одночасно
+    зі зменшенням шуму наступних блоків. wait_until(sample) блокує, доки буфер
+    не оброблено до потрібного семпла.
+    """
+
+    def __init__(self, audio, sample_rate, **kwargs):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.kwargs = kwargs
+        self.ready_until = 0
+        self.error = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='denoise', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for ready in denoise_blocks(self.audio, self.sample_rate, **self.kwargs):
+                with self._condition:
+                    self.ready_until = ready
+                    self._condition.notify_all()
+            logging.info("Зменшення шуму завершено.")
+        except Exception as e:
+            logging.error(f"Помилка зменшення шуму: {e}")
+            with self._condition:
+                self.error = e
+                self._condition.notify_all()
+
+    def wait_until(self, sample):
+        with self._condition:
+            self._condition.wait_for(lambda: self.error is not None or self.ready_until >= sample)
+            if self.error is not None:
+                raise RuntimeError(f"Помилка зменшення шуму: {self.error}")
+
+    def join(self):
+        self.wait_until(len(self.audio))
@@ -0,0 +1,92 @@
+import json
+import logging
+from django.conf import settings
+
+
+# Синхронний клієнт Redis для публікації з воркерів (по одному на процес)
+_client = None
+
+
+def events_enabled():
+    return getattr(settings, 'TRANSCRIPTION_EVENTS_ENABLED', False)
+
+
+def events_available(request):
+    """
+    Чи може цей запит отримати SSE-потік: канал увімкнено і сервер ASGI.
+    Під WSGI відкритий потік тримав би воркер на весь час життя вкладки.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    return events_enabled() and isinstance(request, ASGIRequest)
+
+
+def _redis_url():
+    return getattr(settings, 'TRANSCRIPTION_EVENTS_REDIS_URL', 'redis://localhost:6379')
+
+
+def user_channel(user_id):
+    """
+    Канал Redis pub/sub з подіями всіх файлів користувача: одна SSE-підписка на вкладку.
+    """
+    return f"transcription-events:{user_id}"
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(_redis_url())
+    return _client
+
+
+def publish_event(user_id, event, **data):
+    """
+    Публікує подію (status або chunk) для користувача. Помилки Redis не зупиняють обробку файлу:
+    без push-каналу браузер отримає статус звичайним запитом.
+    """
+    if not events_enabled() or user_id is None:
+        return
+    try:
+        _get_client().publish(user_channel(user_id), json.dumps({'event': event, **data}))
+    except Exception as e:
+        logging.warning(f"Не вдалося опублікувати подію {event}: {e}")
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def event_stream(user_id, snapshot=None, keepalive_sec=None, max_duration_sec=None):
+    """
+    Асинхронний генератор SSE: спершу події з snapshot() (знімок стану, зроблений після підписки,
+    тож переходи між рендером сторінки і підпискою не губляться), далі — події з Redis.
+    Поки подій немає, раз на keepalive_sec надсилається коментар, щоб проксі не закривали з'єднання.
+    Через max_duration_sec потік завершується; EventSource перепідключається сам і отримує свіжий знімок.
+    """
+    import asyncio
+    import redis.asyncio as aioredis
+    if keepalive_sec is None:
+        keepalive_sec = getattr(settings, 'TRANSCRIPTION_EVENTS_KEEPALIVE_SEC', 15)
+    if max_duration_sec is None:
+        max_duration_sec = getattr(settings, 'TRANSCRIPTION_EVENTS_MAX_STREAM_SEC', 300)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration_sec
+    client = aioredis.Redis.from_url(_redis_url())
+    pubsub = client.pubsub()
+    await pubsub.subscribe(user_channel(user_id))
+    try:
+        if snapshot is not None:
+            for event, data in await snapshot():
+                yield format_sse(event, data)
+        while loop.time() < deadline:
+            timeout = min(keepalive_sec, max(deadline - loop.time(), 0))
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.loads(message['data'])
+            yield format_sse(payload.pop('event'), payload)
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
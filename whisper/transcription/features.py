@@ -0,0 +1,110 @@
+import numpy as np
+
+
+# Параметри ознак Whisper (whisper.audio): 16 кГц, вікно STFT 400, крок 160 (100 кадрів/с), вікно енкодера 3000 кадрів
+N_FFT = 400
+HOP_LENGTH = 160
+N_FRAMES = 3000
+LOG_FLOOR = -10.0  # log10(1e-10) — рівень тиші/доповнення нулями
+
+
+class LogMel:
+    """
+    Лог-мел спектрограма всього файлу, порахована один раз і поблочно.
+    - Кадри рахуються ліниво, лише до потрібного кадру (тож працює разом із фоновим зменшенням шуму:
+      кадр рахується, коли відповідні семпли вже оброблені) і блоками по block_frames — без STFT
+      усього файлу в пам'яті одночасно.
+    - Зберігається «сирий» log10 мел; нормалізація whisper (поріг max - 8 дБ, (x + 4) / 4) робиться
+      для кожного вікна окремо, як у whisper.log_mel_spectrogram для вирізаної частини.
+    - Частини — діапазони кадрів цього масиву: повторні проходи (retry, порівняння моделей)
+      не рахують ознаки знову.
+    Пам'ять: n_mels * 100 кадрів/с * 4 Б (80 мел — ~115 МБ на годину аудіо).
+    """
+
+    def __init__(self, audio, n_mels=80, block_frames=6000):
+        self.audio = audio
+        self.n_mels = n_mels
+        self.block_frames = block_frames
+        self.num_frames = len(audio) // HOP_LENGTH
+        self.raw = np.empty((n_mels, self.num_frames), dtype=np.float32)
+        self.ready_frames = 0
+        self._filters = None
+        self._window = None
+
+    def _compute(self, first, last):
+        import torch
+        from whisper.audio import mel_filters
+        if self._filters is None:
+            self._filters = mel_filters('cpu', self.n_mels)
+            self._window = torch.hann_window(N_FFT)
+        # Кадр k центрований на семплі k * HOP_LENGTH (як torch.stft(center=True) з reflect-доповненням)
+        left = first * HOP_LENGTH - N_FFT // 2
+        right = (last - 1) * HOP_LENGTH + N_FFT // 2
+        segment = torch.from_numpy(np.ascontiguousarray(self.audio[max(left, 0):min(right, len(self.audio))],
+                                                        dtype=np.float32))
+        pad_left, pad_right = max(-left, 0), max(right - len(self.audio), 0)
+        if pad_left or pad_right:
+            # reflect потребує доповнення коротшого за сигнал; для крихітних файлів — нулі
+            mode = 'reflect' if max(pad_left, pad_right) < len(segment) else 'constant'
+            segment = torch.nn.functional.pad(segment[None], (pad_left, pad_right), mode=mode)[0]
+        stft = torch.stft(segment, N_FFT, HOP_LENGTH, window=self._window, center=False, return_complex=True)
+        mel = self._filters @ (stft.abs() ** 2)
+        self.raw[:, first:last] = torch.clamp(mel, min=1e-10).log10().numpy()
+
+    def ensure(self, frame):
+        """
+        Рахує кадри до frame (не включно), якщо їх ще немає.
+        """
+        frame = min(frame, self.num_frames)
+        while self.ready_frames < frame:
+            last = min(self.ready_frames + self.block_frames, frame)
+            self._compute(self.ready_frames, last)
+            self.ready_frames = last
+
+    @staticmethod
+    def frame_range(start, end):
+        """
+        Діапазон кадрів для діапазону семплів (як у whisper: кадрів вмісту — len // HOP_LENGTH).
+        """
+        first = start // HOP_LENGTH
+        return first, first + (end - start) // HOP_LENGTH
+
+    @classmethod
+    def chunk_frames(cls, chunk):
+        """
+        Кількість кадрів склеєної частини (список діапазонів семплів).
+        """
+        return sum(last - first for first, last in (cls.frame_range(start, end) for start, end in chunk))
+
+    def window(self, chunk):
+        """
+        Нормалізований мел (n_mels, 3000) для частини — списку діапазонів семплів сумарно не довших за 30 с;
+        кадри діапазонів склеюються, хвіст доповнюється тишею до повного вікна енкодера —
+        як log_mel_spectrogram(pad_or_trim(склеєне аудіо)).
+        Returns:
+            torch.Tensor
+        """
+        import torch
+        window = np.full((self.n_mels, N_FRAMES), LOG_FLOOR, dtype=np.float32)
+        filled = 0
+        for start, end in chunk:
+            first, last = self.frame_range(start, end)
+            last = min(last, first + N_FRAMES - filled, self.num_frames)
+            if last <= first:
+                continue
+            self.ensure(last)
+            window[:, filled:filled + last - first] = self.raw[:, first:last]
+            filled += last - first
+            if filled >= N_FRAMES:
+                break
+        np.maximum(window, window.max() - 8.0, out=window)
+        window += 4.0
+        window /= 4.0
+        return torch.from_numpy(window)
+
+    def samples_needed(self, end):
+        """
+        Останній семпл, який потрібен для кадрів частини, що закінчується на end
+        (кадр біля межі захоплює пів вікна STFT праворуч).
+        """
+        return min(end + N_FFT // 2, len(self.audio))
@@ -1,11 +1,15 @@
 from django import forms
 from .models import MediaFile
+from .utils import is_allowed_file_type
+
+
+MAX_UPLOAD_SIZE = 524288000  # 500 MB
 
 
 class MediaFileUploadForm(forms.ModelForm):
     class Meta:
         model = MediaFile
-        fields = ['file', 'noise_cancellation', 'language', 'diarisation','need_split_audio']
+        fields = ['file', 'noise_cancellation', 'language', 'diarisation','need_split_audio', 'whisper_model']
         widgets = {
             'file': forms.FileInput(attrs={
                 'accept': '.mp3,.wav,.ogg,.aac,.flac,.m4a,.mp4,.avi,.mov,.wmv,.flv,.webm',
@@ -24,6 +28,9 @@ class MediaFileUploadForm(forms.ModelForm):
             'need_split_audio': forms.CheckboxInput(attrs={
                 'class': 'form-check-input'
             }),
+            'whisper_model': forms.Select(attrs={
+                'class': 'form-select'
+            }),
         }
         labels = {
             'file': 'Оберіть файл',
@@ -31,6 +38,7 @@ class MediaFileUploadForm(forms.ModelForm):
             'language': 'Мова',
             'diarisation': 'Розділення мовців',
             'need_split_audio': 'Розпізнавання частинами',
+            'whisper_model': 'Модель',
         }
     
     language = forms.ChoiceField(
@@ -40,6 +48,7 @@ class MediaFileUploadForm(forms.ModelForm):
             ('ru', 'Русский'),
             ('de', 'Deutsch'),
             ('fr', 'Français'),
+            ('auto', 'Автовизначення'),
         ],
         initial='uk',
         widget=forms.Select(attrs={'class': 'form-select'})
@@ -49,7 +58,7 @@ class MediaFileUploadForm(forms.ModelForm):
         file = self.cleaned_data.get('file')
         if file:
             # Перевірка розміру файлу (500 MB)
-            if file.size > 524288000:
+            if file.size > MAX_UPLOAD_SIZE:
                 raise forms.ValidationError('Розмір файлу не повинен перевищувати 500 МБ.')
             
             # Перевірка типу файлу
@@ -60,3 +69,26 @@ class MediaFileUploadForm(forms.ModelForm):
                 raise forms.ValidationError('Непідтримуваний формат файлу.')
         
         return file
+
+
+class ChunkedUploadStartForm(MediaFileUploadForm):
+    """
+    Початок завантаження частинами: ті самі опції обробки, але замість файлу — його ім'я та розмір.
+    """
+    filename = forms.CharField(max_length=255)
+    size = forms.IntegerField(min_value=1)
+
+    class Meta(MediaFileUploadForm.Meta):
+        fields = ['noise_cancellation', 'language', 'diarisation', 'need_split_audio', 'whisper_model']
+
+    def clean_filename(self):
+        filename = self.cleaned_data['filename']
+        if not is_allowed_file_type(filename):
+            raise forms.ValidationError('Непідтримуваний формат файлу.')
+        return filename
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size > MAX_UPLOAD_SIZE:
+            raise forms.ValidationError('Розмір файлу не повинен перевищувати 500 МБ.')
+        return size
@@ -0,0 +1,59 @@
+import logging
+import threading
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+def heartbeat_interval():
+    return getattr(settings, 'TRANSCRIPTION_HEARTBEAT_SEC', 60)
+
+
+def is_alive(heartbeat_at):
+    """
+    Чи оновлювався heartbeat недавно (кілька інтервалів) — файл обробляє живий воркер.
+    """
+    if heartbeat_at is None:
+        return False
+    return heartbeat_at > timezone.now() - timezone.timedelta(seconds=3 * heartbeat_interval())
+
+
+class Heartbeat:
+    """
+    Фоновий потік, що раз на interval_sec оновлює heartbeat_at файлу в статусі processing.
+    Файл лишається живим для reaper навіть тоді, коли одна частина транскрибується довше
+    за TRANSCRIPTION_STUCK_AFTER_SEC. Потік має власне з'єднання з БД і закриває його після зупинки.
+    """
+
+    def __init__(self, media_file_id, interval_sec=None):
+        self.media_file_id = media_file_id
+        self.interval_sec = interval_sec if interval_sec is not None else heartbeat_interval()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        from .models import MediaFile
+        try:
+            while not self._stop.wait(self.interval_sec):
+                try:
+                    MediaFile.objects.filter(id=self.media_file_id, status='processing').update(
+                        heartbeat_at=timezone.now())
+                except Exception as e:
+                    logging.warning(f"Не вдалося оновити heartbeat файлу {self.media_file_id}: {e}")
+        finally:
+            connection.close()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from transcription import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк конвеєра транскрипції на синтетичному та наявному аудіо різної тривалості: "
+        "час кожного етапу, real-time factor, пікова RSS і кількість частин. "
+        "Результати зберігаються у JSON для відстеження регресій."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--durations', type=float, nargs='*', default=[30, 300, 1800],
+                            help="Тривалості синтетичного аудіо, с")
+        parser.add_argument('--variants', nargs='*', choices=list(benchmark.SYNTHETIC_VARIANTS),
+                            default=list(benchmark.SYNTHETIC_VARIANTS), help="Варіанти синтетичного аудіо")
+        parser.add_argument('--file', dest='files', action='append', default=[],
+                            help="Додатковий аудіо/відео файл (можна вказати кілька разів)")
+        parser.add_argument('--examples', action='store_true', help="Додати файли-приклади (MediaFile.is_example)")
+        parser.add_argument('--model', default=getattr(settings, 'WHISPER_DEFAULT_MODEL', 'base'),
+                            help="Модель Whisper для інференсу")
+        parser.add_argument('--backends', nargs='*',
+                            default=[getattr(settings, 'WHISPER_DEFAULT_BACKEND', 'fp32')],
+                            help="Бекенди інференсу; перший — основний, решта порівнюються з ним за часом і WER")
+        parser.add_argument('--language', default="auto", help="Мова розпізнавання (auto — автовизначення)")
+        parser.add_argument('--skip-inference', action='store_true',
+                            help="Не запускати модель (частини отримують текст-заглушку)")
+        parser.add_argument('--no-noise-reduction', action='store_true', help="Пропустити зменшення шуму")
+        parser.add_argument('--no-split', action='store_true', help="Не ділити аудіо по тиші")
+        parser.add_argument('--no-vad', action='store_true', help="Не відкидати немовні ділянки")
+        parser.add_argument('--no-db', action='store_true', help="Пропустити записи у БД")
+        parser.add_argument('--no-isolate', action='store_true',
+                            help="Усі випадки в поточному процесі (peak RSS тоді накопичується)")
+        parser.add_argument('--seed', type=int, default=0, help="Seed синтетичного аудіо")
+        parser.add_argument('--output', help="Файл для результатів у JSON ('-' — stdout)")
+        parser.add_argument('--baseline', help="JSON попереднього запуску для порівняння")
+        parser.add_argument('--max-regression', type=float, default=0.2,
+                            help="Допустиме погіршення відносно --baseline (частка, 0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        cases = benchmark.synthetic_cases(options['durations'], options['variants'])
+        cases += benchmark.file_cases(options['files'])
+        if options['examples']:
+            cases += benchmark.example_cases()
+        if not cases:
+            raise CommandError("Немає жодного випадку для бенчмарку")
+
+        run_options = {
+            'model': options['model'],
+            'backends': options['backends'],
+            'language': options['language'],
+            'skip_inference': options['skip_inference'],
+            'reduce_noise': not options['no_noise_reduction'],
+            'split_audio': not options['no_split'],
+            'vad': not options['no_vad'],
+            'db_writes': not options['no_db'],
+            'seed': options['seed'],
+        }
+        run = benchmark.run_case if options['no_isolate'] else benchmark.run_case_isolated
+        # JSON у stdout не змішується з таблицею
+        out = self.stderr if options['output'] == '-' else self.stdout
+
+        results = []
+        for case in cases:
+            out.write(f"{case['name']}...")
+            result = run(case, run_options)
+            results.append(result)
+            stages = ", ".join(
+                f"{stage} {result['stages_sec'][stage]:.2f}"
+                for stage in benchmark.STAGES if stage in result['stages_sec']
+            )
+            out.write(
+                f"  {result['audio_sec']:.0f} с аудіо, частин {result['num_chunks_split']} -> {result['num_chunks']}, "
+                f"вікон {result['encoder_windows']} (доповнення {result['padding_ratio']:.0%}), "
+                f"RTF {result['rtf']}, peak RSS {result['peak_rss_mb']} МБ\n  {stages}"
+            )
+            for backend, stats in result['backends'].items():
+                out.write(
+                    f"  {backend}: інференс {stats['inference_sec']:.2f} с (RTF {stats['inference_rtf']}), "
+                    f"модель {stats['model_mb']} МБ, WER відносно {options['backends'][0]} {stats['wer_vs_primary']}"
+                )
+
+        report = {'environment': benchmark.environment_info(run_options), 'cases': results}
+        if options['output']:
+            benchmark.save_results(options['output'], report)
+
+        if options['baseline']:
+            regressions = benchmark.compare_to_baseline(
+                results, benchmark.load_results(options['baseline']), options['max_regression'],
+            )
+            if regressions:
+                for regression in regressions:
+                    out.write(self.style.ERROR(regression))
+                raise CommandError(f"Регресій відносно {options['baseline']}: {len(regressions)}")
+            out.write(self.style.SUCCESS("Регресій відносно базового запуску немає"))
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+from transcription.models import MediaFile
+from transcription.tasks import save_checkpoint
+
+
+LOAD_TEST_USERNAME = 'db-load-test'
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Навантажувальний тест БД: паралельні 'воркери' зберігають частини (контрольна точка, heartbeat, "
+        "проміжний текст), паралельні 'браузери' опитують статус. Показує, чи блокують записи один одного."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Кількість паралельних письменників")
+        parser.add_argument('--readers', type=int, default=4, help="Кількість паралельних читачів статусу")
+        parser.add_argument('--seconds', type=float, default=10, help="Тривалість тесту")
+        parser.add_argument('--text-size', type=int, default=2000, help="Розмір тексту однієї частини (символів)")
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=LOAD_TEST_USERNAME)
+        MediaFile.objects.filter(user=user).delete()
+        media_files = [
+            MediaFile.objects.create(
+                user=user, original_filename=f"load-test-{i}.wav", original_filesize=0,
+                file_type='audio', status='processing',
+            )
+            for i in range(options['writers'])
+        ]
+        self.stdout.write(
+            f"{connection.vendor}: {options['writers']} письменників, {options['readers']} читачів, "
+            f"{options['seconds']} с"
+        )
+
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        write_latencies, read_latencies, errors = [], [], []
+        chunk_text = 'а' * options['text_size']
+
+        def writer(media_file):
+            latencies, parts, index = [], [], 0
+            try:
+                while time.monotonic() < deadline:
+                    started = time.monotonic()
+                    try:
+                        save_checkpoint(media_file.id, {
+                            'index': index, 'start': index * 30.0, 'end': (index + 1) * 30.0,
+                            'text': chunk_text, 'segments': [],
+                        })
+                        parts.append(chunk_text)
+                        MediaFile.objects.filter(id=media_file.id).update(recognized_text="".join(parts))
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    latencies.append(time.monotonic() - started)
+                    index += 1
+            finally:
+                connections.close_all()
+            with lock:
+                write_latencies.extend(latencies)
+
+        def reader():
+            latencies = []
+            try:
+                while time.monotonic() < deadline:
+                    for media_file in media_files:
+                        started = time.monotonic()
+                        try:
+                            MediaFile.objects.filter(id=media_file.id).values_list('status', flat=True).first()
+                        except OperationalError as e:
+                            with lock:
+                                errors.append(str(e))
+                            continue
+                        latencies.append(time.monotonic() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                read_latencies.extend(latencies)
+
+        threads = [threading.Thread(target=writer, args=(media_file,)) for media_file in media_files]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = timezone.now()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = (timezone.now() - started).total_seconds()
+
+        MediaFile.objects.filter(user=user).delete()
+        user.delete()
+
+        for name, latencies in (('Запис частини', write_latencies), ('Читання статусу', read_latencies)):
+            self.stdout.write(
+                f"{name}: {len(latencies)} ({len(latencies) / elapsed:.1f}/с), "
+                f"p50 {_percentile(latencies, 0.5) * 1000:.1f} мс, "
+                f"p99 {_percentile(latencies, 0.99) * 1000:.1f} мс, "
+                f"макс {max(latencies, default=0) * 1000:.1f} мс"
+            )
+        if write_latencies:
+            # Якщо письменники серіалізуються, середня затримка росте пропорційно їх кількості
+            self.stdout.write(
+                f"Середня затримка запису: {statistics.mean(write_latencies) * 1000:.1f} мс"
+            )
+        if errors:
+            self.stdout.write(self.style.ERROR(
+                f"Помилки БД: {len(errors)} (перша: {errors[0]})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Помилок блокування немає"))
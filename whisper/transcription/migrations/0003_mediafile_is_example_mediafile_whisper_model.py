@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0002_mediafile_need_split_audio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='is_example',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='whisper_model',
+            field=models.CharField(choices=[('tiny', 'Tiny'), ('base', 'Base'), ('small', 'Small'), ('medium', 'Medium')], default='base', max_length=10),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0003_mediafile_is_example_mediafile_whisper_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('text', models.TextField()),
+                ('tokens', models.JSONField(blank=True, default=list)),
+                ('avg_logprob', models.FloatField(blank=True, null=True)),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='transcription.mediafile')),
+            ],
+            options={
+                'verbose_name': 'Сегмент транскрипції',
+                'verbose_name_plural': 'Сегменти транскрипції',
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['media_file', 'start'], name='transcripti_media_f_7ab903_idx')],
+            },
+        ),
+    ]
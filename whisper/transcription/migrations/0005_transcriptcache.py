@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0004_transcriptsegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('pcm_hash', models.CharField(db_index=True, max_length=32)),
+                ('options', models.JSONField(default=dict)),
+                ('recognized_text', models.TextField(blank=True, default='')),
+                ('segments', models.JSONField(blank=True, default=list)),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Кеш транскрипції',
+                'verbose_name_plural': 'Кеш транскрипцій',
+            },
+        ),
+    ]
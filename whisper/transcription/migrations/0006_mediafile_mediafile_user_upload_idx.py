@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0005_transcriptcache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['user', '-upload_date', '-id'], name='mediafile_user_upload_idx'),
+        ),
+    ]
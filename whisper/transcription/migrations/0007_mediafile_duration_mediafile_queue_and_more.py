@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0006_mediafile_mediafile_user_upload_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='queue',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['status', 'queue'], name='mediafile_status_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0007_mediafile_duration_mediafile_queue_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='processing_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TranscriptCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('text', models.TextField(blank=True, default='')),
+                ('segments', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='transcription.mediafile')),
+            ],
+            options={
+                'verbose_name': 'Контрольна точка',
+                'verbose_name_plural': 'Контрольні точки',
+                'ordering': ['media_file', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('media_file', 'index'), name='checkpoint_unique_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0008_mediafile_heartbeat_at_mediafile_processing_attempts_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.CharField(max_length=32, unique=True)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('uploading', 'Завантажується'), ('complete', 'Завантажено')], default='uploading', max_length=20)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=32)),
+                ('decode_status', models.CharField(blank=True, choices=[('', 'Не запускалось'), ('running', 'Декодується'), ('done', 'Декодовано'), ('failed', 'Помилка')], default='', max_length=10)),
+                ('decoded_samples', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('media_file', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chunked_upload', to='transcription.mediafile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Завантаження частинами',
+                'verbose_name_plural': 'Завантаження частинами',
+            },
+        ),
+    ]
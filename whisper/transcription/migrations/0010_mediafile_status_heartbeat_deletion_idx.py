@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0009_chunkedupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='mediafile_status_heartbeat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(condition=models.Q(('file_deletion_date__isnull', False)), fields=['file_deletion_date'], name='mediafile_deletion_date_idx'),
+        ),
+    ]
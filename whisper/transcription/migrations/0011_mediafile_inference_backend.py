@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0010_mediafile_status_heartbeat_deletion_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='inference_backend',
+            field=models.CharField(blank=True, choices=[('fp32', 'FP32'), ('int8', 'INT8')], default='', max_length=10),
+        ),
+    ]
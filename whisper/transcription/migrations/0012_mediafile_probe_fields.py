@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0011_mediafile_inference_backend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='has_video',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='audio_stream_index',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='audio_codec',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='channel_layout',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
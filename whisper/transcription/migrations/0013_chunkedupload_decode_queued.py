@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcription', '0012_mediafile_probe_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='decode_status',
+            field=models.CharField(blank=True, choices=[('', 'Не запускалось'), ('queued', 'У черзі'), ('running', 'Декодується'), ('done', 'Декодовано'), ('failed', 'Помилка')], default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,166 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from django.utils.module_loading import import_string
+
+
+WHISPER_MODEL_CHOICES = [
+    ('tiny', 'Tiny'),
+    ('base', 'Base'),
+    ('small', 'Small'),
+    ('medium', 'Medium'),
+]
+
+# Бекенди інференсу на CPU: fp32 — ваги як є; int8 — динамічна квантизація лінійних шарів
+# (ваги int8, активації квантизуються на льоту), ~2x швидше і ~вдвічі менше пам'яті під ваги
+INFERENCE_BACKEND_CHOICES = [
+    ('fp32', 'FP32'),
+    ('int8', 'INT8'),
+]
+DEFAULT_BACKEND = 'fp32'
+
+
+def model_key(name, backend=None):
+    """
+    Ключ моделі в реєстрі та пулах: 'base' для fp32, 'base@int8' для інших бекендів.
+    """
+    if not backend or backend == DEFAULT_BACKEND:
+        return name
+    return f"{name}@{backend}"
+
+
+def parse_model_key(key):
+    name, _, backend = key.partition('@')
+    return name, backend or DEFAULT_BACKEND
+
+
+def load_fp32(name, device="cpu"):
+    import whisper
+    return whisper.load_model(name, device=device)
+
+
+def load_int8(name, device="cpu"):
+    """
+    Whisper з динамічною int8-квантизацією всіх лінійних шарів (torch.ao.quantization, лише CPU).
+    Згортки енкодера й ембединги лишаються fp32.
+    """
+    import torch
+    import whisper
+    model = whisper.load_model(name, device="cpu")
+    # whisper.model.Linear лише приводить ваги до dtype входу; у fp32 він тотожний nn.Linear,
+    # а quantize_dynamic замінює тільки точні типи nn.Linear
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+INFERENCE_BACKENDS = {
+    'fp32': load_fp32,
+    'int8': load_int8,
+}
+
+
+def get_backend_loader(backend):
+    """
+    Завантажувач бекенду: вбудовані fp32/int8 або додаткові з WHISPER_INFERENCE_BACKENDS
+    ({назва: 'dotted.path.loader'}, loader(name, device) повертає модель з API whisper).
+    """
+    from django.conf import settings
+    extra = getattr(settings, 'WHISPER_INFERENCE_BACKENDS', {})
+    if backend in extra:
+        return import_string(extra[backend])
+    try:
+        return INFERENCE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Невідомий бекенд інференсу: {backend}")
+
+
+def load_model(key, device="cpu"):
+    """
+    Завантажує модель за ключем реєстру (див. model_key).
+    """
+    name, backend = parse_model_key(key)
+    model = get_backend_loader(backend)(name, device=device)
+    model.eval()
+    return model
+
+
+def model_size_bytes(model):
+    """
+    Оцінка пам'яті, яку займають ваги моделі (параметри + буфери).
+    Квантизовані шари тримають ваги поза parameters(), тому рахується state_dict.
+    """
+    import torch
+    tensors = []
+    for value in model.state_dict().values():
+        # Запаковані параметри квантизованого Linear зберігаються кортежем (вага, зсув)
+        tensors.extend(v for v in (value if isinstance(value, tuple) else (value,)) if isinstance(v, torch.Tensor))
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Реєстр завантажених моделей Whisper у межах процесу воркера.
+    - Моделі завантажуються один раз і перевикористовуються між задачами.
+    - Якщо сумарний розмір перевищує memory_budget_mb, витісняються найдавніше використані (LRU).
+    - preload() у батьківському процесі Celery до fork дає дочірнім процесам спільні (copy-on-write) ваги.
+    """
+
+    def __init__(self, memory_budget_mb=None, device="cpu"):
+        self.memory_budget_mb = memory_budget_mb
+        self.device = device
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+    def _load(self, name):
+        logging.info(f"Завантаження моделі Whisper: {name}...")
+        model = load_model(name, device=self.device)
+        logging.info(f"Модель {name} успішно завантажена.")
+        return model
+
+    def _evict(self, keep):
+        if not self.memory_budget_mb:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        while sum(self._sizes.values()) > budget and len(self._models) > 1:
+            name = next(iter(self._models))
+            if name == keep:
+                break
+            self._models.pop(name)
+            self._sizes.pop(name)
+            logging.info(f"Модель {name} витіснена з пам'яті (бюджет {self.memory_budget_mb} МБ).")
+        gc.collect()
+
+    def get(self, name):
+        """
+        Повертає модель name (ключ із model_key, напр. 'base@int8'), завантажуючи її за потреби.
+        """
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            model = self._load(name)
+            self._models[name] = model
+            self._sizes[name] = model_size_bytes(model)
+            self._evict(keep=name)
+            return model
+
+    def preload(self, names):
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Не вдалося попередньо завантажити модель Whisper {name}: {e}")
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+        gc.collect()
@@ -5,6 +5,7 @@ import base64
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .model_registry import INFERENCE_BACKEND_CHOICES, WHISPER_MODEL_CHOICES
 
 class MediaFile(models.Model):
     STATUS_CHOICES = [
@@ -37,6 +38,24 @@ class MediaFile(models.Model):
     noise_cancellation = models.BooleanField(default=False)
     language = models.CharField(max_length=10, default='uk')
     diarisation = models.BooleanField(default=False)
+    whisper_model = models.CharField(max_length=10, choices=WHISPER_MODEL_CHOICES, default='base')
+    # Бекенд інференсу; порожнє значення — WHISPER_DEFAULT_BACKEND з налаштувань
+    inference_backend = models.CharField(max_length=10, choices=INFERENCE_BACKEND_CHOICES, blank=True, default='')
+    
+    # Планування: тривалість (оцінка при завантаженні, точна після декодування) і черга Celery
+    duration = models.FloatField(null=True, blank=True)
+    queue = models.CharField(max_length=50, blank=True, default='')
+    
+    # Результат ffprobe при завантаженні (has_video = None — файл ще не перевірено):
+    # декодування бере лише потрібний аудіопотік і не чіпає відео
+    has_video = models.BooleanField(null=True, blank=True)
+    audio_stream_index = models.PositiveSmallIntegerField(null=True, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True, default='')
+    channel_layout = models.CharField(max_length=32, blank=True, default='')
+    
+    # Відновлення після падіння воркера: час останнього прогресу і кількість запусків обробки
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
     
     # Для автоматичного видалення файлів
     file_deletion_date = models.DateTimeField(null=True, blank=True)
@@ -51,8 +70,8 @@ class MediaFile(models.Model):
             # Генеруємо короткий Base62 URL
             hash_int = int(self.hash_id[:8], 16)
             self.shared_url = self.hash_id
-        if self.original_filesize is None:
-            original_filesize = self.file.size
+        if self.original_filesize is None and self.file:
+            self.original_filesize = self.file.size
 
         super().save(*args, **kwargs)
     
@@ -60,17 +79,147 @@ class MediaFile(models.Model):
         return os.path.splitext(self.original_filename)[1].lower()
     
     def is_video(self):
+        if self.has_video is not None:
+            return self.has_video
         video_extensions = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']
         return self.get_file_extension() in video_extensions
     
     def is_audio(self):
+        if self.has_video is not None:
+            return not self.has_video and self.audio_stream_index is not None
         audio_extensions = ['.mp3', '.wav', '.ogg', '.aac', '.flac', '.m4a']
         return self.get_file_extension() in audio_extensions
     
     class Meta:
         ordering = ['-upload_date']
+        indexes = [
+            # Список файлів користувача з keyset-пагінацією по upload_date
+            models.Index(fields=['user', '-upload_date', '-id'], name='mediafile_user_upload_idx'),
+            # Глибина черг (scheduling.queue_stats)
+            models.Index(fields=['status', 'queue'], name='mediafile_status_queue_idx'),
+            # Пошук завислих файлів (status='processing' і давній heartbeat_at)
+            models.Index(fields=['status', 'heartbeat_at'], name='mediafile_status_heartbeat_idx'),
+            # Видалення файлів після file_deletion_date: в індексі лише файли з датою видалення
+            models.Index(fields=['file_deletion_date'], name='mediafile_deletion_date_idx',
+                         condition=models.Q(file_deletion_date__isnull=False)),
+        ]
         verbose_name = 'Медіафайл'
         verbose_name_plural = 'Медіафайли'
     
     def __str__(self):
         return f"{self.original_filename} - {self.user.username}"
+
+
+class TranscriptSegment(models.Model):
+    """
+    Сегмент транскрипції з часом відносно початку оригінального файлу (секунди).
+    Дає змогу експортувати SRT/VTT і переходити до моменту запису без повторного розпізнавання.
+    """
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name='segments')
+    start = models.FloatField()
+    end = models.FloatField()
+    text = models.TextField()
+    tokens = models.JSONField(default=list, blank=True)
+    avg_logprob = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['media_file', 'start']),
+        ]
+        verbose_name = 'Сегмент транскрипції'
+        verbose_name_plural = 'Сегменти транскрипції'
+
+    def __str__(self):
+        return f"{self.media_file_id} [{self.start:.2f}-{self.end:.2f}] {self.text[:50]}"
+
+
+class TranscriptCheckpoint(models.Model):
+    """
+    Контрольна точка: готова частина файлу (текст і сегменти). Після падіння або перезапуску воркера
+    обробка продовжується з наступної частини; після завершення файлу точки видаляються.
+    """
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name='checkpoints')
+    index = models.PositiveIntegerField()
+    start = models.FloatField()
+    end = models.FloatField()
+    text = models.TextField(blank=True, default='')
+    segments = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['media_file', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['media_file', 'index'], name='checkpoint_unique_chunk'),
+        ]
+        verbose_name = 'Контрольна точка'
+        verbose_name_plural = 'Контрольні точки'
+
+    def __str__(self):
+        return f"{self.media_file_id} #{self.index}"
+
+    def as_result(self):
+        return {'start': self.start, 'end': self.end, 'text': self.text, 'segments': self.segments}
+
+
+class ChunkedUpload(models.Model):
+    """
+    Відновлюване завантаження частинами: байти пишуться одразу у файл, сервер пам'ятає лише зсув.
+    Поки файл завантажується, його вже може декодувати воркер (decode_status).
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Завантажується'),
+        ('complete', 'Завантажено'),
+    ]
+    DECODE_STATUS_CHOICES = [
+        ('', 'Не запускалось'),
+        ('queued', 'У черзі'),
+        ('running', 'Декодується'),
+        ('done', 'Декодовано'),
+        ('failed', 'Помилка'),
+    ]
+
+    upload_id = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    content_hash = models.CharField(max_length=32, blank=True, default='')
+    decode_status = models.CharField(max_length=10, choices=DECODE_STATUS_CHOICES, blank=True, default='')
+    decoded_samples = models.BigIntegerField(null=True, blank=True)
+    media_file = models.OneToOneField(
+        MediaFile, null=True, blank=True, on_delete=models.SET_NULL, related_name='chunked_upload',
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Завантаження частинами'
+        verbose_name_plural = 'Завантаження частинами'
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class TranscriptCache(models.Model):
+    """
+    Кеш готових транскрипцій за вмістом: ключ — хеш декодованого PCM разом із параметрами
+    розпізнавання. Повторно завантажений (або перекодований) запис отримує результат миттєво.
+    """
+    key = models.CharField(max_length=32, unique=True)
+    pcm_hash = models.CharField(max_length=32, db_index=True)
+    options = models.JSONField(default=dict)
+    recognized_text = models.TextField(blank=True, default='')
+    segments = models.JSONField(default=list, blank=True)
+    size_bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hit_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Кеш транскрипції'
+        verbose_name_plural = 'Кеш транскрипцій'
+
+    def __str__(self):
+        return f"{self.key} ({self.hit_count} звернень)"
@@ -0,0 +1,128 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .audio import gather_chunk
+
+
+# Модель, завантажена у процесі пулу (по одній на процес)
+_worker_model = None
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(model_name, num_threads):
+    """
+    Ініціалізація процесу пулу: ділимо ядра між процесами, щоб torch не створював
+    по потоку на кожне ядро в кожному процесі, і один раз завантажуємо модель.
+    """
+    global _worker_model
+    import torch
+    from .model_registry import load_model
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    _worker_model = load_model(model_name, device="cpu")
+
+
+def _transcribe_chunk(audio, transcribe_args):
+    result = _worker_model.transcribe(audio, fp16=False, verbose=False, **transcribe_args)
+    # Назад у батьківський процес — лише те, що потрібно для тексту і сегментів
+    return {
+        'text': result['text'],
+        'segments': [
+            {key: seg.get(key) for key in ('start', 'end', 'text', 'tokens', 'avg_logprob')}
+            for seg in result.get('segments', [])
+        ],
+    }
+
+
+def pool_supported():
+    """
+    Чи може поточний процес запускати дочірні процеси. Дочірні процеси prefork-пулу Celery
+    демонічні, і multiprocessing не дозволяє їм створювати власні процеси
+    ("daemonic processes are not allowed to have children") — там пул недоступний,
+    потрібен воркер з -P threads або -P solo.
+    """
+    return not multiprocessing.current_process().daemon
+
+
+def _detect_language(audio):
+    from .decoding import DecodingSession
+    return DecodingSession(_worker_model).ensure_language(audio)
+
+
+def get_chunk_pool(model_name, workers, mp_context='spawn'):
+    """
+    Повертає постійний пул процесів для моделі model_name.
+    Пул живе між задачами, тож модель у процесах пулу завантажується один раз.
+    """
+    key = (model_name, workers, mp_context)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            num_threads = max(1, available_cpus() // workers)
+            logging.info(f"Запуск пулу з {workers} процесів для моделі {model_name} "
+                         f"({num_threads} потоків torch на процес)")
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(mp_context),
+                initializer=_init_worker,
+                initargs=(model_name, num_threads),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def _discard_pool(pool):
+    with _pools_lock:
+        for key, value in list(_pools.items()):
+            if value is pool:
+                del _pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def detect_language_parallel(model_name, audio, workers, mp_context='spawn'):
+    """
+    Визначає мову за audio моделлю з процесу пулу — батьківському процесу не потрібна власна копія моделі.
+    """
+    pool = get_chunk_pool(model_name, workers, mp_context)
+    try:
+        return pool.submit(_detect_language, audio).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+def transcribe_chunks_parallel(model_name, audio, chunk_ranges, transcribe_args, workers, mp_context='spawn'):
+    """
+    Генератор: розсилає частини у пул процесів і повертає (індекс, результат) строго по порядку,
+    щойно готовий черговий префікс частин.
+    """
+    pool = get_chunk_pool(model_name, workers, mp_context)
+    try:
+        futures = [pool.submit(_transcribe_chunk, gather_chunk(audio, chunk), transcribe_args)
+                   for chunk in chunk_ranges]
+        try:
+            for i, future in enumerate(futures):
+                yield i, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    except BrokenProcessPool:
+        # Процес пулу впав (наприклад, OOM) — наступна задача створить новий пул
+        _discard_pool(pool)
+        raise
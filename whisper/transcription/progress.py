@@ -0,0 +1,40 @@
+import time
+from django.conf import settings
+
+
+class ProgressWriter:
+    """
+    Накопичує розпізнаний текст частинами і зберігає проміжний результат у БД з обмеженням частоти.
+    - Рядок не нарощується через +=, частини тримаються у списку.
+    - У БД оновлюється лише recognized_text (save(update_fields=...)), не весь рядок.
+    - Запис відбувається не частіше ніж раз на min_interval_sec або коли накопичилось min_chars символів.
+    """
+
+    def __init__(self, media_file, min_interval_sec=None, min_chars=None):
+        self.media_file = media_file
+        self.min_interval_sec = (min_interval_sec if min_interval_sec is not None
+                                 else getattr(settings, 'TRANSCRIPTION_PROGRESS_SAVE_INTERVAL_SEC', 5))
+        self.min_chars = (min_chars if min_chars is not None
+                          else getattr(settings, 'TRANSCRIPTION_PROGRESS_SAVE_MIN_CHARS', 16384))
+        self._parts = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    def append(self, text):
+        self._parts.append(text)
+        self._pending_chars += len(text)
+        if (self._pending_chars >= self.min_chars
+                or time.monotonic() - self._last_flush >= self.min_interval_sec):
+            self.flush()
+
+    def text(self):
+        return "".join(self._parts)
+
+    def flush(self, extra_fields=()):
+        """
+        Записує поточний текст (і, за потреби, додаткові поля) одним UPDATE.
+        """
+        self.media_file.recognized_text = self.text()
+        self.media_file.save(update_fields=['recognized_text', *extra_fields])
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
@@ -0,0 +1,103 @@
+import logging
+import os
+import wave
+from django.conf import settings
+from django.db.models import Count, Sum
+from .models import MediaFile
+
+
+# Пріоритети Celery з брокером Redis: 0 — найвищий
+MAX_PRIORITY = 9
+
+
+def short_queue():
+    return getattr(settings, 'TRANSCRIPTION_SHORT_QUEUE', 'transcription_short')
+
+
+def long_queue():
+    return getattr(settings, 'TRANSCRIPTION_LONG_QUEUE', 'transcription_long')
+
+
+def estimate_duration(media_file):
+    """
+    Оцінка тривалості до декодування: тривалість з ffprobe (uploads.probe_media_file), для WAV — із заголовка,
+    для решти — з розміру файлу і типового бітрейту аудіо/відео.
+    """
+    if media_file.has_video is not None and media_file.duration is not None:
+        return media_file.duration
+    if media_file.get_file_extension() == '.wav':
+        try:
+            with wave.open(media_file.file.path, 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError, OSError) as e:
+            logging.warning(f"Не вдалося прочитати заголовок WAV: {e}")
+    size = media_file.original_filesize
+    if size is None:
+        size = os.path.getsize(media_file.file.path)
+    bitrates = getattr(settings, 'TRANSCRIPTION_ASSUMED_BITRATE', {'audio': 128_000, 'video': 2_000_000})
+    return size * 8 / bitrates.get(media_file.file_type, bitrates['audio'])
+
+
+def choose_queue(duration_sec):
+    if duration_sec <= getattr(settings, 'TRANSCRIPTION_SHORT_MAX_DURATION_SEC', 600):
+        return short_queue()
+    return long_queue()
+
+
+def user_priority(media_file):
+    """
+    Fair-share: кожна наступна активна задача того ж користувача отримує нижчий пріоритет,
+    тож масове завантаження одного користувача не блокує перші файли інших.
+    """
+    active = (MediaFile.objects
+              .filter(user_id=media_file.user_id, status__in=['pending', 'processing'])
+              .exclude(id=media_file.id)
+              .count())
+    return min(active, MAX_PRIORITY)
+
+
+def enqueue_media_file(media_file, duration_sec=None, countdown=None):
+    """
+    Ставить файл у чергу: коротка чи довга — за тривалістю, пріоритет — за fair-share.
+    countdown — затримка запуску (с), напр. для повтору після помилки.
+    Returns:
+        str: Назва черги.
+    """
+    from .tasks import process_media_file_task
+    if duration_sec is None:
+        duration_sec = estimate_duration(media_file)
+    queue = choose_queue(duration_sec)
+    priority = user_priority(media_file)
+    media_file.duration = duration_sec
+    media_file.queue = queue
+    MediaFile.objects.filter(id=media_file.id).update(duration=duration_sec, queue=queue)
+    process_media_file_task.apply_async(
+        args=[media_file.id], kwargs={'queue': queue}, queue=queue, priority=priority, countdown=countdown,
+    )
+    logging.info(f"Файл {media_file.id} ({duration_sec:.0f} с) у черзі {queue}, пріоритет {priority}")
+    return queue
+
+
+def queue_stats():
+    """
+    Глибина черг і оцінка очікування: сумарна тривалість файлів у черзі (та в обробці),
+    помножена на час обробки секунди аудіо і поділена на кількість воркерів черги.
+    """
+    seconds_per_audio_second = getattr(settings, 'TRANSCRIPTION_SECONDS_PER_AUDIO_SECOND', 0.5)
+    concurrency = getattr(settings, 'TRANSCRIPTION_QUEUE_CONCURRENCY', {})
+    rows = {
+        row['queue']: row
+        for row in (MediaFile.objects
+                    .filter(status__in=['pending', 'processing'], queue__in=[short_queue(), long_queue()])
+                    .values('queue')
+                    .annotate(depth=Count('id'), total_duration=Sum('duration')))
+    }
+    stats = {}
+    for queue in (short_queue(), long_queue()):
+        row = rows.get(queue, {})
+        total_duration = row.get('total_duration') or 0
+        stats[queue] = {
+            'depth': row.get('depth', 0),
+            'estimated_wait_sec': round(total_duration * seconds_per_audio_second / concurrency.get(queue, 1)),
+        }
+    return stats
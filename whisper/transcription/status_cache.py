@@ -0,0 +1,108 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _status_key(media_file_id):
+    return f"transcription-status:{media_file_id}"
+
+
+def _done_key(media_file_id):
+    return f"transcription-status:{media_file_id}:done"
+
+
+def _progress_key(media_file_id):
+    return f"transcription-status:{media_file_id}:progress"
+
+
+def _listing_key(user_id):
+    return f"transcription-listing:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, 'TRANSCRIPTION_STATUS_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def set_status(media_file_id, user_id, status):
+    """
+    Записує статус файлу в кеш. Прогрес (start_progress, chunk_done) лежить в окремих ключах,
+    тож запис статусу не може перезаписати лічильник готових частин.
+    """
+    previous = cache.get(_status_key(media_file_id))
+    cache.set(_status_key(media_file_id), {'user_id': user_id, 'status': status}, _timeout())
+    if previous is None or previous.get('status') != status:
+        touch_listing(user_id)
+
+
+def restore_status(media_file_id, user_id, status):
+    """
+    Відновлює статус з БД, якщо запису в кеші немає (кеш очищено або запис вичерпався).
+    cache.add не перезаписує статус, який воркер встиг записати тим часом, і не чіпає прогрес.
+    """
+    cache.add(_status_key(media_file_id), {'user_id': user_id, 'status': status}, _timeout())
+
+
+def start_progress(media_file_id, chunks_total):
+    """
+    Починає відлік прогресу запуску обробки, коли відомий план частин: лічильник готових частин — 0.
+    """
+    cache.set_many({
+        _progress_key(media_file_id): {'started_at': time.time(), 'chunks_total': chunks_total},
+        _done_key(media_file_id): 0,
+    }, _timeout())
+
+
+def touch_listing(user_id):
+    """
+    Оновлює версію списку файлів користувача (нове завантаження, зміна статусу, спільний доступ).
+    """
+    cache.set(_listing_key(user_id), time.time_ns(), None)
+
+
+def listing_version(user_id):
+    """
+    Версія списку файлів користувача для ETag. Якщо запису немає (кеш очищено), створюється нова.
+    None — кеш недоступний (помилки Redis ігноруються): версії немає, і ETag не використовується.
+    """
+    version = cache.get(_listing_key(user_id))
+    if version is None:
+        cache.add(_listing_key(user_id), time.time_ns(), None)
+        version = cache.get(_listing_key(user_id))
+    return version
+
+
+def chunk_done(media_file_id):
+    """
+    Атомарно збільшує лічильник готових частин (частини можуть завершуватись на різних воркерах).
+    """
+    try:
+        cache.incr(_done_key(media_file_id))
+    except ValueError:
+        cache.add(_done_key(media_file_id), 1, _timeout())
+
+
+def get_status(media_file_id):
+    """
+    Статус і прогрес файлу з кешу або None, якщо запису немає.
+    Returns:
+        dict: user_id, status, chunks_done, chunks_total, eta_sec (оцінка часу до завершення).
+    """
+    keys = [_status_key(media_file_id), _progress_key(media_file_id), _done_key(media_file_id)]
+    values = cache.get_many(keys)
+    entry = values.get(keys[0])
+    if entry is None:
+        return None
+    progress = values.get(keys[1]) or {}
+    chunks_done = values.get(keys[2])
+    chunks_total = progress.get('chunks_total')
+    eta_sec = None
+    if entry['status'] == 'processing' and chunks_done and chunks_total and 'started_at' in progress:
+        elapsed = time.time() - progress['started_at']
+        eta_sec = round(elapsed / chunks_done * max(chunks_total - chunks_done, 0))
+    return {
+        'user_id': entry['user_id'],
+        'status': entry['status'],
+        'chunks_done': chunks_done,
+        'chunks_total': chunks_total,
+        'eta_sec': eta_sec,
+    }
@@ -1,44 +1,110 @@
+import gc
 import logging
+import math
 import time
 import random
-from celery import shared_task
+from celery import chord, group, shared_task
+from celery.signals import worker_init, worker_process_init
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
 from django.utils import timezone
-from .models import MediaFile
+from .models import ChunkedUpload, MediaFile, TranscriptCheckpoint, TranscriptSegment
 import os
 import hashlib
 import subprocess
 import tempfile
-import numpy as np
-from pydub import AudioSegment, silence
-import noisereduce as nr
+from .batching import WINDOW_SECONDS, BatchingEngine
+from .chunk_store import get_chunk_store
+from .decoding import DecodingSession
+from .denoise import BackgroundDenoiser
+from .events import publish_event
+from .features import N_FRAMES, LogMel
+from .heartbeat import Heartbeat, is_alive
+from .model_registry import ModelRegistry, model_key
+from .parallel import detect_language_parallel, pool_supported, transcribe_chunks_parallel
+from .progress import ProgressWriter
+from . import scheduling, status_cache, uploads
+from .utils import hash_to_base62, md5_to_base62, pcm_md5_to_base62
+from .vad import detect_speech, gate_ranges
+from . import transcript_cache
+from .audio import (
+    SAMPLE_RATE, decode_to_pcm, load_wav_pcm, pcm_to_float32, float32_to_pcm,
+    chunk_samples, chunk_span, gather_chunk, pack_ranges, plan_chunks, source_time, window_padding,
+)
 
 
-# --- lazy load whisper model ---
-_whisper_model_cache = None
-MODEL_NAME = "base"
+# --- реєстр моделей Whisper (по одному на процес воркера) ---
+MODEL_NAME = getattr(settings, 'WHISPER_DEFAULT_MODEL', 'base')
+BACKEND = getattr(settings, 'WHISPER_DEFAULT_BACKEND', 'fp32')
+model_registry = ModelRegistry(
+    memory_budget_mb=getattr(settings, 'WHISPER_MODEL_MEMORY_BUDGET_MB', None),
+)
 
-def get_whisper_model():
+def get_whisper_model(model_name=None, backend=None):
     """
-    lazy load and cache model Whisper.
+    Повертає модель Whisper з реєстру процесу (завантажує за потреби).
+    backend — бекенд інференсу (fp32, int8, ...), за замовчуванням WHISPER_DEFAULT_BACKEND.
     """
-    global _whisper_model_cache
-    if _whisper_model_cache is None:
-        try:
-            import whisper
-            logging.info(f"Завантаження моделі Whisper: {MODEL_NAME}...")
-            _whisper_model_cache = whisper.load_model(MODEL_NAME)
-            logging.info("Модель успішно завантажена.")
-        except Exception as e:
-            logging.error(f"Не вдалося завантажити модель Whisper: {e}")
-            _whisper_model_cache = None
-            raise RuntimeError(f"Не вдалося завантажити модель Whisper: {e}")
-    return _whisper_model_cache
+    model_name = model_key(model_name or MODEL_NAME, backend or BACKEND)
+    try:
+        return model_registry.get(model_name)
+    except Exception as e:
+        logging.error(f"Не вдалося завантажити модель Whisper: {e}")
+        raise RuntimeError(f"Не вдалося завантажити модель Whisper: {e}")
+
+
+def preload_model_keys():
+    """
+    Моделі для прогріву: WHISPER_PRELOAD_MODELS з бекендом за замовчуванням
+    (ключ 'base@int8' задає бекенд явно).
+    """
+    return [name if '@' in name else model_key(name, BACKEND)
+            for name in getattr(settings, 'WHISPER_PRELOAD_MODELS', [MODEL_NAME])]
+
+
+@worker_init.connect
+def preload_models_before_fork(**kwargs):
+    """
+    Завантажує моделі у головному процесі воркера до створення prefork-пулу,
+    тож дочірні процеси успадковують ваги спільними сторінками пам'яті (copy-on-write).
+    """
+    if not getattr(settings, 'WHISPER_PRELOAD_BEFORE_FORK', True):
+        return
+    model_registry.preload(preload_model_keys())
+    # Об'єкти, що вже є, не потрапляють під збирач сміття, і він не «торкається» сторінок після fork
+    gc.freeze()
+
+
+@worker_process_init.connect
+def warm_up_models(**kwargs):
+    """
+    Прогрів у дочірньому процесі: якщо моделі вже успадковані від батька — нічого не завантажується.
+    """
+    model_registry.preload(preload_model_keys())
+
+_batching_engine = None
+
+def get_batching_engine():
+    """
+    Спільний для всього процесу пакетний engine (WHISPER_BATCH_MAX_SIZE / WHISPER_BATCH_MAX_WAIT_MS).
+    """
+    global _batching_engine
+    if _batching_engine is None:
+        _batching_engine = BatchingEngine(
+            get_whisper_model,
+            max_batch_size=getattr(settings, 'WHISPER_BATCH_MAX_SIZE', 8),
+            max_wait_ms=getattr(settings, 'WHISPER_BATCH_MAX_WAIT_MS', 50),
+        )
+    return _batching_engine
 
 # --- Основна логіка ---
-def process_input_file(filepath):
+def process_input_file(filepath, stream_index=None):
     """
     Обробляє вхідний файл (аудіо або відео).
     Конвертує файл у формат WAV (16kHz, моно, pcm_s16le) за допомогою ffmpeg.
+    Береться лише один аудіопотік (stream_index з probe_media або потік за замовчуванням), відео не декодується.
     """
     if not filepath or not os.path.exists(filepath):
         logging.error(f"Файл {filepath} не знайдено.")
@@ -53,6 +119,8 @@ def process_input_file(filepath):
         command = [
             "ffmpeg",
             "-i", filepath,
+            *(["-map", f"0:{stream_index}"] if stream_index is not None else []),
+            "-vn", "-sn", "-dn",
             "-ar", "16000",
             "-ac", "1",
             "-c:a", "pcm_s16le",
@@ -78,137 +146,619 @@ def process_input_file(filepath):
             shutil.rmtree(temp_dir)
         raise RuntimeError(f"Сталася невідома помилка: {e}")
 
-def combine_chunks(audio_chunks, target_length_sec):
+def decode_input_file(filepath, expected_samples=None, stream_index=None):
     """
-    Об'єднує дрібні аудіо-сегменти у більші, заданої довжини.
+    Декодує вхідний файл (аудіо або відео) одним проходом ffmpeg прямо у пам'ять.
+    На відміну від process_input_file, не створює тимчасовий WAV і тимчасову директорію.
+    Дуже довгі записи переносяться у memmap (TRANSCRIPTION_DECODE_MMAP_THRESHOLD_SEC).
+    stream_index — аудіопотік з probe_media (MediaFile.audio_stream_index); відео не демультиплексується.
     """
-    target_length_ms = target_length_sec * 1000
-    combined_chunks = []
-    current_chunk = AudioSegment.silent(duration=0)
+    if not filepath or not os.path.exists(filepath):
+        logging.error(f"Файл {filepath} не знайдено.")
+        raise FileNotFoundError(f"Файл {filepath} не знайдено.")
 
-    for chunk in audio_chunks:
-        if len(current_chunk) + len(chunk) <= target_length_ms:
-            current_chunk += chunk
-        else:
-            if len(current_chunk) > 0:
-                combined_chunks.append(current_chunk)
-            current_chunk = chunk
+    try:
+        logging.info(f"Декодування файлу у пам'ять: {filepath}")
+        return decode_to_pcm(
+            filepath,
+            expected_samples=expected_samples,
+            mmap_threshold_sec=getattr(settings, 'TRANSCRIPTION_DECODE_MMAP_THRESHOLD_SEC', None),
+            stream_index=stream_index,
+        )
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Помилка ffmpeg: {e.stderr}")
+        raise RuntimeError(f"Помилка обробки файлу за допомогою ffmpeg. Деталі: {e.stderr}")
+    except Exception as e:
+        logging.error(f"Невідома помилка при обробці файлу: {e}")
+        raise RuntimeError(f"Сталася невідома помилка: {e}")
 
-    if len(current_chunk) > 0:
-        combined_chunks.append(current_chunk)
-    
-    return combined_chunks
+def plan_chunk_ranges(samples, sample_rate, need_split_audio=True, use_vad=None, speech_ranges=None):
+    """
+    План частин по тиші для int16 PCM: список частин, кожна — список діапазонів (start_sample, end_sample).
+    З use_vad у частинах лишаються тільки мовні ділянки (тиша, музика і тони не йдуть у модель);
+    VAD застосовується до пакування, тож частини складаються з мовних ділянок (склеюються без пауз між ними).
+    Частини пакуються до TRANSCRIPTION_CHUNK_TARGET_SEC (за замовчуванням одне 30-секундне вікно
+    енкодера Whisper), довгі мовні ділянки ріжуться у найтихшому місці біля межі вікна.
+    speech_ranges — вже пораховані мовні ділянки (detect_speech), якщо є.
+    """
+    if use_vad is None:
+        use_vad = getattr(settings, 'TRANSCRIPTION_VAD_ENABLED', True)
+    max_gap = int(getattr(settings, 'TRANSCRIPTION_VAD_MAX_GAP_SEC', 2) * sample_rate)
+    if not use_vad:
+        speech_ranges = None
+    elif speech_ranges is None:
+        speech_ranges = detect_speech(samples, sample_rate)
+
+    target_length_sec = getattr(settings, 'TRANSCRIPTION_CHUNK_TARGET_SEC', WINDOW_SECONDS)
+    chunk_ranges = None
+    if need_split_audio:
+        logging.info("Розбиття аудіо на частини...")
+        chunk_ranges = plan_chunks(
+            samples,
+            sample_rate,
+            target_length_sec=target_length_sec,
+            min_silence_len=1250,
+            silence_offset_db=16,
+            keep_silence=500,
+            split_long=True,
+            speech_ranges=speech_ranges,
+            max_gap=max_gap,
+        )
+        if not chunk_ranges:
+            logging.warning("Не вдалося розбити аудіо на частини. Спроба транскрибувати цілий файл.")
+    else:
+        logging.warning("Транскрибуємо файл.")
+    if not chunk_ranges:
+        chunk_ranges = [[(0, len(samples))]]
+        if speech_ranges is not None:
+            # Без розбиття по тиші мовні ділянки теж пакуються у вікна, а не йдуть по одній на вікно
+            chunk_ranges = pack_ranges(
+                gate_ranges(chunk_ranges[0], speech_ranges, max_gap), target_length_sec, sample_rate)
+
+    speech_samples = None
+    if speech_ranges is not None:
+        # Мовлення після вирізання немови (з паузами до max_gap); паузи понад виявлене мовлення — марні семпли
+        gated_samples = sum(chunk_samples(chunk) for chunk in chunk_ranges)
+        speech_samples = sum(end - start for start, end in speech_ranges)
+        logging.info(f"VAD: мовлення {gated_samples / sample_rate:.1f} с з {len(samples) / sample_rate:.1f} с.")
+    padding = window_padding(chunk_ranges, sample_rate, WINDOW_SECONDS, speech_samples)
+    logging.info(f"Вікон енкодера: {padding['windows']}, у модель {padding['sent_sec']:.1f} с, "
+                 f"доповнення {padding['padded_sec']:.1f} с "
+                 f"({padding['padding_ratio']:.0%}).")
+    return chunk_ranges
+
+
+def start_denoiser(audio, sample_rate):
+    """
+    Запускає поблочне зменшення шуму (на місці, у фоновому потоці) з параметрами з settings.
+    """
+    logging.info("Зменшення шуму...")
+    return BackgroundDenoiser(
+        audio, sample_rate,
+        block_sec=getattr(settings, 'TRANSCRIPTION_DENOISE_BLOCK_SEC', 60),
+        n_jobs=getattr(settings, 'TRANSCRIPTION_DENOISE_JOBS', 1),
+    ).start()
+
+
+def prepare_chunks(samples, sample_rate, need_reduce_noise=True, need_split_audio=True, use_vad=None):
+    """
+    Готує аудіо до транскрипції: float32, зменшення шуму та план частин по тиші.
+    Частини плануються за оригінальним PCM, тож зменшення шуму не впливає на межі частин.
+    Returns:
+        tuple: (audio: np.ndarray[float32], chunk_ranges: list[list[(start_sample, end_sample)]])
+    """
+    # Одна конвертація у float32 на весь файл; частини — це view цього буфера
+    audio = pcm_to_float32(samples)
+    chunk_ranges = plan_chunk_ranges(samples, sample_rate, need_split_audio, use_vad)
+
+    if need_reduce_noise:
+        start_denoiser(audio, sample_rate).join()
+    else:
+        logging.info("Зменшення шуму пропущено")
+
+    return audio, chunk_ranges
+
+
+def _transcribe_sequential(session, audio, chunk_ranges, denoiser=None, previous_results=None):
+    """
+    Транскрибує частини по черзі в одній сесії декодування (мова і підказка з попередньої частини).
+    previous_results: {j: результат частини перед chunk_ranges[j]}, якщо вона відновлена з контрольної точки.
+    """
+    previous_results = previous_results or {}
+    for i, chunk in enumerate(chunk_ranges):
+        if i in previous_results:
+            session.remember(previous_results[i])
+        end = chunk_span(chunk)[1]
+        if denoiser is not None:
+            # Інференс частини i йде паралельно зі зменшенням шуму наступних блоків
+            denoiser.wait_until(session.mel.samples_needed(end) if session.mel is not None else end)
+        # Частина — з float32 буфера (і кадрів мелу файлу): без тимчасових файлів і без ffmpeg
+        yield i, session.transcribe(gather_chunk(audio, chunk), chunk)
+
+
+def _chunk_result(index, chunk, transcribe_result, sample_rate=SAMPLE_RATE):
+    """
+    Результат однієї частини: текст і сегменти з часом відносно початку оригінального файлу.
+    Час сегментів у склеєному аудіо частини переводиться у час файлу (source_time).
+    """
+    start, end = chunk_span(chunk)
+    return {
+        'index': index,
+        'start': start / sample_rate,
+        'end': end / sample_rate,
+        'text': transcribe_result['text'].strip(),
+        'segments': [
+            {
+                'start': round(source_time(seg['start'], chunk, sample_rate), 3),
+                'end': round(source_time(seg['end'], chunk, sample_rate, is_end=True), 3),
+                'text': seg['text'].strip(),
+                'tokens': list(seg.get('tokens') or []),
+                'avg_logprob': seg.get('avg_logprob'),
+            }
+            for seg in transcribe_result.get('segments', [])
+        ],
+    }
 
-def transcribe_generator(path_to_wav, need_reduce_noise=True, need_split_audio=True, choosed_language="auto"):
+def _same_chunk(checkpoint, start, end, sample_rate=SAMPLE_RATE):
+    return (math.isclose(checkpoint['start'], start / sample_rate, abs_tol=1e-6)
+            and math.isclose(checkpoint['end'], end / sample_rate, abs_tol=1e-6))
+
+
+def transcribe_chunks(path_to_wav=None, need_reduce_noise=True, need_split_audio=True, choosed_language="auto",
+                      samples=None, model_name=None, use_batching=None, parallel_workers=None, use_vad=None,
+                      checkpoints=None, backend=None):
     """
     Генератор, який виконує транскрипцію аудіофайлу по частинах.
+    Аудіо береться з samples (int16 PCM 16 кГц від decode_input_file) або з WAV-файлу path_to_wav.
     - Зменшує шум.
-    - Розбиває аудіо на частини по тиші.
+    - Розбиває аудіо на частини по тиші і відкидає немовні ділянки (VAD).
     - Транскрибує кожну частину та повертає результат.
+    - Частини з checkpoints ({індекс: результат}) з тими самими межами не транскрибуються повторно.
+    - backend обирає бекенд інференсу моделі (fp32, int8, ...).
+    - Мова (choosed_language або визначена один раз за першою частиною) спільна для всіх частин;
+      у послідовному режимі хвіст попередньої частини — підказка (prompt) для наступної.
+    - Лог-мел спектрограма рахується один раз на файл (TRANSCRIPTION_SHARED_MEL), частини до 30 с
+      декодуються прямо з неї.
     
     Yields:
-        str: Частини транскрибованого тексту.
+        dict: Результат частини (index, start, end, text, segments, num_chunks, resumed),
+              час у секундах від початку файлу.
     """
-    if not path_to_wav or not os.path.exists(path_to_wav):
+    if samples is None and (not path_to_wav or not os.path.exists(path_to_wav)):
         logging.error("Помилка: файл не знайдено.")
         return
 
     try:
-        model = get_whisper_model()
-        if model is None:
-            logging.error("Модель Whisper не завантажена. Неможливо виконати транскрипцію.")
-            return
-
-        sound_file = AudioSegment.from_wav(path_to_wav)
-        samples = np.array(sound_file.get_array_of_samples())
+        if samples is None:
+            samples, sample_rate = load_wav_pcm(path_to_wav)
+        else:
+            sample_rate = SAMPLE_RATE
         
         if samples.size == 0:
             logging.warning("Аудіофайл порожній.")
             return
 
-        if need_reduce_noise:
-            logging.info("Зменшення шуму...")
-            reduced_noise_samples = nr.reduce_noise(y=samples, sr=sound_file.frame_rate)
-            reduced_audio = AudioSegment(
-                reduced_noise_samples.tobytes(),
-                frame_rate=sound_file.frame_rate,
-                sample_width=sound_file.sample_width,
-                channels=sound_file.channels)
-            logging.info("Зменшення шуму завершено.")
-        else:
-            logging.info("Зменшення шуму пропущено")
-            reduced_audio = AudioSegment(
-                samples.tobytes(),
-                frame_rate=sound_file.frame_rate,
-                sample_width=sound_file.sample_width,
-                channels=sound_file.channels)
-        
-        if need_split_audio:
-            logging.info("Розбиття аудіо на частини...")
-            audio_little_chunks = silence.split_on_silence(
-                reduced_audio,
-                min_silence_len=1250,
-                silence_thresh=sound_file.dBFS - 16,
-                keep_silence=500
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(
+                f"Очікується WAV {SAMPLE_RATE} Гц (результат process_input_file), отримано {sample_rate} Гц"
             )
-            audio_chunks = combine_chunks(audio_chunks=audio_little_chunks, target_length_sec=60)
-            if not audio_chunks:
-                logging.warning("Не вдалося розбити аудіо на частини. Спроба транскрибувати цілий файл.")
-                audio_chunks = [reduced_audio]
-        else:
-            logging.warning("Транскрибуємо файл.")
-            audio_chunks = [reduced_audio]
 
-        num_chunks = len(audio_chunks)
+        # Одна конвертація у float32 на весь файл; частини — це view цього буфера
+        audio = pcm_to_float32(samples)
+        chunk_ranges = plan_chunk_ranges(samples, sample_rate, need_split_audio, use_vad)
+        if not chunk_ranges:
+            logging.warning("Мовлення не знайдено.")
+            return
+        num_chunks = len(chunk_ranges)
         logging.info(f"Аудіо розбито на {num_chunks} частин.")
 
-        path_to_wav_dir = os.path.dirname(path_to_wav)
+        # Частини, готові до перезапуску воркера: межі мають збігатися з поточним планом
+        checkpoints = checkpoints or {}
+        resumed = {
+            i: checkpoints[i] for i, chunk in enumerate(chunk_ranges)
+            if i in checkpoints and _same_chunk(checkpoints[i], *chunk_span(chunk), sample_rate)
+        }
+        pending = [i for i in range(num_chunks) if i not in resumed]
+        pending_ranges = [chunk_ranges[i] for i in pending]
+        if resumed:
+            logging.info(f"Відновлення: {len(resumed)} з {num_chunks} частин уже готові.")
 
-        for i, chunk in enumerate(audio_chunks):
-            chunk_filename = os.path.join(path_to_wav_dir, f"chunk_{i:04}.wav")
-            chunk.export(chunk_filename, format="wav")
-            
-            if choosed_language == "auto":
-                transcribe_args = {}
-            else:
-                transcribe_args = {"language": choosed_language}
-            
-            transcribe_result = model.transcribe(chunk_filename, fp16=False, verbose=False, **transcribe_args)
-            
-            text = transcribe_result['text'].strip()
-            if text:
-                yield text + " "
-            
-            os.remove(chunk_filename)
-            logging.info(f"Частина {i+1}/{num_chunks}: {text}")
+        denoiser = start_denoiser(audio, sample_rate) if need_reduce_noise and pending else None
+
+        if choosed_language in (None, "", "auto"):
+            transcribe_args = {}
+        else:
+            transcribe_args = {"language": choosed_language}
+
+        if use_batching is None:
+            use_batching = getattr(settings, 'WHISPER_BATCHING_ENABLED', False)
+
+        if parallel_workers is None:
+            parallel_workers = getattr(settings, 'WHISPER_PARALLEL_WORKERS', 0)
+        use_parallel = bool(parallel_workers) and len(pending_ranges) > 1
+        if use_parallel and not pool_supported():
+            logging.warning("WHISPER_PARALLEL_WORKERS потребує воркера з -P threads або -P solo: "
+                            "у демонічному процесі (prefork) пул процесів недоступний, частини йдуть послідовно.")
+            use_parallel = False
+
+        # Лог-мел рахується один раз на файл, частини — діапазони його кадрів
+        use_shared_mel = getattr(settings, 'TRANSCRIPTION_SHARED_MEL', True)
+
+        # Пул процесів і пакетний engine розрізняють моделі за ключем назва@бекенд
+        key = model_key(model_name or MODEL_NAME, backend or BACKEND)
+
+        if denoiser is not None and (use_batching or use_parallel):
+            # Пакетний і паралельний режими забирають частини наперед — чекаємо весь буфер
+            denoiser.join()
+
+        if not pending_ranges:
+            chunk_results = iter(())
+        elif use_parallel:
+            mp_context = getattr(settings, 'WHISPER_PARALLEL_MP_CONTEXT', 'spawn')
+            if "language" not in transcribe_args:
+                # Мова визначається один раз (у процесі пулу), а не окремо в кожній частині
+                transcribe_args = {"language": detect_language_parallel(
+                    key, gather_chunk(audio, pending_ranges[0]), parallel_workers, mp_context)}
+            # Незалежні частини паралельно у пулі процесів, текст повертається по порядку
+            chunk_results = transcribe_chunks_parallel(
+                key, audio, pending_ranges, transcribe_args,
+                workers=parallel_workers, mp_context=mp_context,
+            )
+        elif use_batching:
+            # Мова визначається один раз на файл, а не в кожному 30-секундному вікні пакета
+            language = transcribe_args.get("language")
+            model = get_whisper_model(model_name, backend)
+            mel = LogMel(audio, model.dims.n_mels) if use_shared_mel else None
+            if language is None:
+                first = pending_ranges[0]
+                language = DecodingSession(model).ensure_language(
+                    gather_chunk(audio, first),
+                    mel.window(first) if mel is not None and LogMel.chunk_frames(first) <= N_FRAMES else None)
+            # Сегменти частин ідуть у спільний пакетний engine процесу
+            chunk_results = get_batching_engine().transcribe_chunks(
+                key, audio, pending_ranges, sample_rate, language=language, mel=mel,
+            )
+        else:
+            model = get_whisper_model(model_name, backend)
+            if model is None:
+                logging.error("Модель Whisper не завантажена. Неможливо виконати транскрипцію.")
+                return
+            session = DecodingSession(
+                model, transcribe_args.get("language"),
+                mel=LogMel(audio, model.dims.n_mels) if use_shared_mel else None,
+            )
+            # Підказка для першої частини після відновлених — з контрольної точки попередньої
+            previous_results = {
+                j: resumed[i - 1] for j, i in enumerate(pending) if i - 1 in resumed
+            }
+            chunk_results = _transcribe_sequential(session, audio, pending_ranges, denoiser, previous_results)
+
+        next_index = 0
+        for j, transcribe_result in chunk_results:
+            i = pending[j]
+            # Готові частини перед поточною віддаються з контрольних точок, зберігаючи порядок
+            for k in range(next_index, i):
+                yield {**resumed[k], 'index': k, 'num_chunks': num_chunks, 'resumed': True}
+            result = _chunk_result(i, chunk_ranges[i], transcribe_result, sample_rate)
+            result['num_chunks'] = num_chunks
+            result['resumed'] = False
+            logging.info(f"Частина {i+1}/{num_chunks}: {result['text']}")
+            yield result
+            next_index = i + 1
+        for k in range(next_index, num_chunks):
+            yield {**resumed[k], 'index': k, 'num_chunks': num_chunks, 'resumed': True}
 
     except Exception as e:
         logging.error(f"Помилка під час транскрипції: {e}")
         raise
 
 
+def transcribe_generator(*args, **kwargs):
+    """
+    Генератор, який повертає лише текст частин (аргументи ті самі, що й у transcribe_chunks).
+    
+    Yields:
+        str: Частини транскрибованого тексту.
+    """
+    for result in transcribe_chunks(*args, **kwargs):
+        if result['text']:
+            yield result['text'] + " "
+
+
+
+def save_segments(media_file, segments):
+    """
+    Зберігає сегменти транскрипції одним bulk_create (попередні сегменти файлу замінюються).
+    """
+    TranscriptSegment.objects.filter(media_file=media_file).delete()
+    TranscriptSegment.objects.bulk_create(
+        [
+            TranscriptSegment(
+                media_file=media_file,
+                start=seg['start'],
+                end=seg['end'],
+                text=seg['text'],
+                tokens=seg.get('tokens') or [],
+                avg_logprob=seg.get('avg_logprob'),
+            )
+            for seg in segments
+        ],
+        batch_size=500,
+    )
+
+
+def load_checkpoints(media_file_id):
+    """
+    Готові частини файлу з попередніх запусків: {індекс: результат частини}.
+    """
+    return {
+        checkpoint.index: checkpoint.as_result()
+        for checkpoint in TranscriptCheckpoint.objects.filter(media_file_id=media_file_id)
+    }
+
+
+def save_checkpoint(media_file_id, chunk):
+    """
+    Зберігає готову частину одним INSERT ... ON CONFLICT і оновлює heartbeat файлу.
+    """
+    TranscriptCheckpoint.objects.bulk_create(
+        [TranscriptCheckpoint(
+            media_file_id=media_file_id,
+            index=chunk['index'],
+            start=chunk['start'],
+            end=chunk['end'],
+            text=chunk['text'],
+            segments=chunk['segments'],
+        )],
+        update_conflicts=True,
+        unique_fields=['media_file', 'index'],
+        update_fields=['start', 'end', 'text', 'segments', 'created_at'],
+    )
+    MediaFile.objects.filter(id=media_file_id).update(heartbeat_at=timezone.now())
+
+
+def transcription_options(media_file):
+    """
+    Параметри розпізнавання файлу. Від них залежить результат, тому вони ж входять у ключ кешу.
+    """
+    options = {
+        'model': media_file.whisper_model,
+        'language': media_file.language or "auto",
+        'need_reduce_noise': media_file.noise_cancellation,
+        'need_split_audio': media_file.need_split_audio,
+        'vad': getattr(settings, 'TRANSCRIPTION_VAD_ENABLED', True),
+    }
+    backend = media_file.inference_backend or BACKEND
+    if backend != 'fp32':
+        # fp32 не додається до ключа, тож записи кешу, створені до появи бекендів, лишаються дійсними
+        options['backend'] = backend
+    return options
+
 
 @shared_task
-def process_media_file_task(media_file_id):
+def predecode_upload_task(upload_id):
+    """
+    Декодує файл, що ще завантажується частинами: байти подаються у ffmpeg у міру надходження,
+    паралельно рахується MD5 вмісту (той самий формат, що й md5_to_base62 для файлу).
+    Задача чекає на мережу, а не на CPU, тому йде в легку службову чергу (CELERY_TASK_ROUTES)
+    і обмежена в часі (TRANSCRIPTION_PREDECODE_MAX_SEC), а не займає слот воркера транскрипції.
+    """
+    upload = ChunkedUpload.objects.get(upload_id=upload_id)
+    # Обробка файлу могла вже скасувати декодування, яке довго чекало в черзі (load_predecoded)
+    if not ChunkedUpload.objects.filter(id=upload.id, decode_status='queued').update(decode_status='running'):
+        return f"Попереднє декодування {upload_id} скасовано"
+    md5_hash = hashlib.md5()
+
+    def hashed_chunks():
+        # Виконується в потоці, що подає байти у ffmpeg: його з'єднання з БД закривається наприкінці
+        try:
+            for chunk in uploads.follow_upload(upload):
+                md5_hash.update(chunk)
+                yield chunk
+        finally:
+            connection.close()
+
     try:
-        media_file = MediaFile.objects.get(id=media_file_id)
-        
-        # Оновлюємо статус на "в обробці"
+        samples = decode_to_pcm(
+            None,
+            mmap_threshold_sec=getattr(settings, 'TRANSCRIPTION_DECODE_MMAP_THRESHOLD_SEC', None),
+            input_chunks=hashed_chunks(),
+        )
+        uploads.save_predecoded(upload, samples)
+    except Exception as e:
+        logging.warning(f"Попереднє декодування {upload_id} не вдалося, файл буде декодовано після завантаження: {e}")
+        ChunkedUpload.objects.filter(id=upload.id).update(decode_status='failed')
+        upload.refresh_from_db(fields=['media_file'])
+        if upload.media_file is not None:
+            ChunkedUpload.objects.filter(id=upload.id).update(
+                content_hash=md5_to_base62(upload.media_file.file.path) or '')
+        return f"Попереднє декодування {upload_id} не вдалося"
+    ChunkedUpload.objects.filter(id=upload.id).update(
+        decode_status='done',
+        decoded_samples=len(samples),
+        content_hash=hash_to_base62(md5_hash),
+    )
+    return f"Завантаження {upload_id}: декодовано {len(samples) / SAMPLE_RATE:.1f} с"
+
+
+@shared_task
+def prune_chunked_uploads_task():
+    return f"Видалено {uploads.prune_chunked_uploads()} незавершених завантажень"
+
+
+@shared_task
+def prune_transcript_cache_task():
+    deleted = transcript_cache.prune(
+        max_age_days=getattr(settings, 'TRANSCRIPT_CACHE_MAX_AGE_DAYS', None),
+        max_bytes=getattr(settings, 'TRANSCRIPT_CACHE_MAX_BYTES', None),
+    )
+    return f"Видалено {deleted} записів кешу транскрипцій"
+
+
+def publish_status(media_file_id, status, user_id=None):
+    """
+    Записує статус файлу в кеш статусів і публікує зміну в push-канал користувача.
+    """
+    if user_id is None:
+        user_id = MediaFile.objects.filter(id=media_file_id).values_list('user_id', flat=True).first()
+    status_cache.set_status(media_file_id, user_id, status)
+    publish_event(user_id, 'status', file_id=media_file_id, status=status)
+
+
+def max_attempts():
+    return getattr(settings, 'TRANSCRIPTION_MAX_ATTEMPTS', 3)
+
+
+def retry_countdown(attempts):
+    """
+    Затримка повторного запуску після помилки (с): експоненційно від TRANSCRIPTION_RETRY_BACKOFF_SEC,
+    не більше TRANSCRIPTION_RETRY_BACKOFF_MAX_SEC.
+    """
+    base = getattr(settings, 'TRANSCRIPTION_RETRY_BACKOFF_SEC', 30)
+    return min(base * 2 ** max(attempts - 1, 0), getattr(settings, 'TRANSCRIPTION_RETRY_BACKOFF_MAX_SEC', 10 * 60))
+
+
+def count_chunk_delivery(media_file_id, index):
+    """
+    Рахує доставки підзадачі частини (acks_late і reject_on_worker_lost повертають її в чергу після падіння воркера).
+    Returns:
+        int: Номер доставки, або None, якщо кеш недоступний (помилки Redis ігноруються).
+    """
+    key = f"transcription-chunk-deliveries:{media_file_id}:{index}"
+    timeout = getattr(settings, 'TRANSCRIPTION_DISTRIBUTED_STUCK_AFTER_SEC', 12 * 60 * 60)
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Запис щойно витіснено з кешу
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def claim_media_file(media_file):
+    """
+    Атомарно забирає файл в обробку: умовне оновлення за статусом і heartbeat_at, які бачив цей воркер,
+    тож з двох доставок тієї ж задачі (acks_late, reaper) файл отримує лише одна.
+    Файл у processing з живим heartbeat не забирається — його вже обробляє інший воркер.
+    Returns:
+        bool: True, якщо файл забрано (статус processing, лічильник запусків збільшено).
+    """
+    if media_file.status == 'processing' and is_alive(media_file.heartbeat_at):
+        return False
+    now = timezone.now()
+    claimed = MediaFile.objects.filter(
+        id=media_file.id, status=media_file.status, heartbeat_at=media_file.heartbeat_at,
+    ).update(status='processing', heartbeat_at=now, processing_attempts=F('processing_attempts') + 1)
+    if claimed:
         media_file.status = 'processing'
-        media_file.save()
-        processed_wav, temp_dir_to_clean = process_input_file(media_file.file.path)
+        media_file.heartbeat_at = now
+        media_file.processing_attempts += 1
+    return bool(claimed)
+
+
+def fail_media_file(media_file_id, user_id=None):
+    """
+    Остаточно позначає файл як failed: контрольні точки і декодований при завантаженні PCM більше не потрібні.
+    """
+    MediaFile.objects.filter(id=media_file_id).update(status='failed')
+    TranscriptCheckpoint.objects.filter(media_file_id=media_file_id).delete()
+    uploads.discard_predecoded(media_file_id)
+    publish_status(media_file_id, 'failed', user_id)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def process_media_file_task(media_file_id, queue=None):
+    heartbeat = None
+    try:
+        media_file = MediaFile.objects.get(id=media_file_id)
+        if media_file.status in ('completed', 'failed'):
+            # Повторна доставка після завершення (acks_late)
+            return f"Файл {media_file.original_filename} вже оброблено"
+        if media_file.processing_attempts >= max_attempts():
+            # Воркер падав на цьому файлі кожного разу (OOM тощо) — повторні доставки зупиняються тут
+            logging.error(f"Файл {media_file.id}: {media_file.processing_attempts} невдалих запусків, обробку зупинено.")
+            fail_media_file(media_file.id, media_file.user_id)
+            return f"Файл {media_file.original_filename}: вичерпано спроби обробки"
+        if not claim_media_file(media_file):
+            return f"Файл {media_file.original_filename} вже обробляється"
+        heartbeat = Heartbeat(media_file.id).start()
+        publish_status(media_file.id, media_file.status, media_file.user_id)
+        # PCM, декодований ще під час завантаження частинами, інакше — звичайне декодування
+        samples = uploads.load_predecoded(media_file)
+        if samples is None:
+            # Тривалість з ffprobe дає буфер потрібного розміру одразу (+1 с запасу на неточність контейнера)
+            probed = media_file.audio_stream_index is not None and media_file.duration
+            samples = decode_input_file(
+                media_file.file.path,
+                expected_samples=int((media_file.duration + 1) * SAMPLE_RATE) if probed else None,
+                stream_index=media_file.audio_stream_index,
+            )
+        duration = len(samples) / SAMPLE_RATE
+        if queue == scheduling.short_queue() and scheduling.choose_queue(duration) != queue:
+            # Оцінка при завантаженні виявилась заниженою: довгий файл не займає коротку чергу
+            # Перенаправлення — не невдалий запуск: спроба, зарахована в claim_media_file, повертається
+            MediaFile.objects.filter(id=media_file.id).update(
+                status='pending', processing_attempts=F('processing_attempts') - 1)
+            media_file.status = 'pending'
+            media_file.processing_attempts -= 1
+            publish_status(media_file.id, media_file.status, media_file.user_id)
+            new_queue = scheduling.enqueue_media_file(media_file, duration)
+            return f"Файл {media_file.original_filename} ({duration:.0f} с) перенаправлено в чергу {new_queue}"
+        MediaFile.objects.filter(id=media_file.id).update(duration=duration)
+        options = transcription_options(media_file)
+
+        distributed_min_sec = getattr(settings, 'TRANSCRIPTION_DISTRIBUTED_MIN_DURATION_SEC', None)
+        distributed = distributed_min_sec is not None and len(samples) >= distributed_min_sec * SAMPLE_RATE
+        if distributed:
+            # Розподілений режим завжди ділить файл на частини
+            options['need_split_audio'] = True
+
+        cache_key = pcm_hash = None
+        if getattr(settings, 'TRANSCRIPT_CACHE_ENABLED', True):
+            pcm_hash = pcm_md5_to_base62(samples)
+            cache_key = transcript_cache.make_cache_key(pcm_hash, options)
+            cached = transcript_cache.lookup(cache_key)
+            if cached is not None:
+                logging.info(f"Файл {media_file.id}: результат знайдено у кеші ({cache_key}).")
+                transcript_cache.apply_cached(cached, media_file)
+                media_file.status = 'completed'
+                media_file.file_deletion_date = timezone.now() + timezone.timedelta(days=30)
+                media_file.save(update_fields=['recognized_text', 'status', 'file_deletion_date'])
+                uploads.discard_predecoded(media_file)
+                publish_status(media_file.id, media_file.status, media_file.user_id)
+                return f"Обробка файлу {media_file.original_filename} завершена (з кешу)"
+
+        if distributed:
+            num_chunks = dispatch_chunk_subtasks(media_file, samples, options, cache_key=cache_key, pcm_hash=pcm_hash)
+            return f"Файл {media_file.original_filename} розподілено на {num_chunks} частин"
         
-        full_transcribed_text = ""
+        progress = ProgressWriter(media_file)
+        segments = []
         # Використання генератора для отримання тексту по частинах
-        for text_chunk in transcribe_generator(
-            path_to_wav=media_file.file.path,
-            need_reduce_noise=False,
-            need_split_audio=False, # TODO get this field from model
-            choosed_language="auto"
+        for chunk in transcribe_chunks(
+            samples=samples,
+            need_reduce_noise=options['need_reduce_noise'],
+            need_split_audio=options['need_split_audio'],
+            choosed_language=options['language'],
+            model_name=options['model'],
+            backend=options.get('backend'),
+            use_vad=options['vad'],
+            checkpoints=load_checkpoints(media_file.id),
         ):
-            full_transcribed_text += text_chunk
-            media_file.recognized_text = full_transcribed_text
-            media_file.save()
+            if not chunk['resumed']:
+                save_checkpoint(media_file.id, chunk)
+            if chunk['index'] == 0:
+                status_cache.start_progress(media_file.id, chunk['num_chunks'])
+            status_cache.chunk_done(media_file.id)
+            if chunk['text']:
+                progress.append(chunk['text'] + " ")
+                publish_event(media_file.user_id, 'chunk', file_id=media_file.id, text=chunk['text'])
+            segments.extend(chunk['segments'])
+
+        save_segments(media_file, segments)
+        TranscriptCheckpoint.objects.filter(media_file=media_file).delete()
+        uploads.discard_predecoded(media_file)
 
         # Оновлюємо результат
         media_file.status = 'completed'
@@ -216,7 +766,12 @@ def process_media_file_task(media_file_id):
         # Встановлюємо дату видалення файлу (через 30 днів)
         media_file.file_deletion_date = timezone.now() + timezone.timedelta(days=30)
         
-        media_file.save()
+        # Повний текст збирається один раз і пишеться разом зі статусом
+        progress.flush(extra_fields=['status', 'file_deletion_date'])
+        publish_status(media_file.id, media_file.status, media_file.user_id)
+
+        if cache_key is not None:
+            transcript_cache.store(cache_key, pcm_hash, options, media_file.recognized_text, segments)
         
         return f"Обробка файлу {media_file.original_filename} завершена успішно"
         
@@ -224,13 +779,174 @@ def process_media_file_task(media_file_id):
         return f"Файл з ID {media_file_id} не знайдено"
     except Exception as e:
         # У випадку помилки
+        if heartbeat is not None:
+            heartbeat.stop()
+            heartbeat = None
         try:
             media_file = MediaFile.objects.get(id=media_file_id)
-            media_file.status = 'failed'
-            media_file.save()
+            if media_file.processing_attempts < max_attempts():
+                # Контрольні точки лишаються: наступний запуск продовжить з готових частин
+                countdown = retry_countdown(media_file.processing_attempts)
+                logging.warning(f"Файл {media_file_id}: помилка обробки ({e}), повтор через {countdown} с.")
+                MediaFile.objects.filter(id=media_file_id).update(status='pending')
+                publish_status(media_file_id, 'pending', media_file.user_id)
+                scheduling.enqueue_media_file(media_file, media_file.duration, countdown=countdown)
+            else:
+                fail_media_file(media_file_id, media_file.user_id)
         except:
             pass
         return f"Помилка обробки: {str(e)}"
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
 
 
+# --- Розподілена обробка: частини як окремі задачі Celery + chord для збирання ---
+def dispatch_chunk_subtasks(media_file, samples, options, cache_key=None, pcm_hash=None):
+    """
+    Етап 1: розбиває декодоване аудіо по тиші, кладе частини у сховище частин
+    і запускає chord: по задачі на частину + assemble_transcription_task наприкінці.
+    """
+    audio, chunk_ranges = prepare_chunks(
+        samples, SAMPLE_RATE, need_reduce_noise=options['need_reduce_noise'], need_split_audio=True,
+        use_vad=options.get('vad'),
+    )
+    store = get_chunk_store()
+    store.delete(media_file.id)
+    for index, chunk in enumerate(chunk_ranges):
+        store.put(media_file.id, index, float32_to_pcm(gather_chunk(audio, chunk)))
+
+    language = options['language']
+    if language in (None, "", "auto") and chunk_ranges:
+        # Мова визначається один раз тут, а не окремим проходом енкодера в кожній підзадачі
+        language = DecodingSession(get_whisper_model(options['model'], options.get('backend'))).ensure_language(
+            gather_chunk(audio, chunk_ranges[0]))
 
+    # Підзадачі, збирання і обробник помилки — у черзі файлу, яку слухають воркери транскрипції
+    queue = media_file.queue or scheduling.choose_queue(media_file.duration or 0)
+    header = group(
+        transcribe_chunk_task.s(
+            media_file.id, index, *chunk_span(chunk),
+            model_name=options['model'],
+            language=language,
+            backend=options.get('backend'),
+            parts=chunk,
+        ).set(queue=queue)
+        for index, chunk in enumerate(chunk_ranges)
+    )
+    cache_entry = {'key': cache_key, 'pcm_hash': pcm_hash, 'options': options} if cache_key else None
+    callback = assemble_transcription_task.s(media_file.id, cache_entry=cache_entry).set(queue=queue).on_error(
+        transcription_failed_task.s(media_file_id=media_file.id).set(queue=queue)
+    )
+    chord(header)(callback)
+    status_cache.start_progress(media_file.id, len(chunk_ranges))
+    logging.info(f"Файл {media_file.id}: {len(chunk_ranges)} частин відправлено на обробку.")
+    return len(chunk_ranges)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def transcribe_chunk_task(media_file_id, index, start, end, model_name=None, language="auto", backend=None,
+                          parts=None):
+    """
+    Етап 2: транскрибує одну частину на будь-якому воркері.
+    parts — діапазони семплів склеєної частини (за замовчуванням суцільний [start, end));
+    часові мітки сегментів переводяться у час оригінального файлу.
+    Частина з контрольною точкою (повторний запуск після падіння) не транскрибується вдруге.
+    Частина, на якій воркер падав більше за TRANSCRIPTION_MAX_ATTEMPTS разів, позначає файл як failed.
+    """
+    checkpoint = TranscriptCheckpoint.objects.filter(media_file_id=media_file_id, index=index).first()
+    if checkpoint is not None and _same_chunk(checkpoint.as_result(), start, end):
+        status_cache.chunk_done(media_file_id)
+        return {**checkpoint.as_result(), 'index': index}
+    deliveries = count_chunk_delivery(media_file_id, index)
+    if deliveries is not None and deliveries > max_attempts():
+        logging.error(f"Файл {media_file_id}: частина {index} доставлена {deliveries} разів, обробку зупинено.")
+        fail_media_file(media_file_id)
+        # Помилка зупиняє chord: обробник помилки прибирає сховище частин
+        raise RuntimeError(f"Частина {index} файлу {media_file_id}: вичерпано спроби обробки")
+    samples = get_chunk_store().get(media_file_id, index)
+    transcribe_args = {} if language == "auto" else {"language": language}
+    with Heartbeat(media_file_id):
+        result = get_whisper_model(model_name, backend).transcribe(
+            pcm_to_float32(samples), fp16=False, verbose=False, **transcribe_args
+        )
+    chunk = _chunk_result(index, [tuple(part) for part in parts or [(start, end)]], result)
+    save_checkpoint(media_file_id, chunk)
+    status_cache.chunk_done(media_file_id)
+    return chunk
+
+
+@shared_task
+def assemble_transcription_task(chunk_results, media_file_id, cache_entry=None):
+    """
+    Етап 3 (callback chord): збирає текст частин у порядку індексів і записує recognized_text один раз.
+    """
+    chunk_results = sorted(chunk_results, key=lambda r: r['index'])
+    media_file = MediaFile.objects.get(id=media_file_id)
+    media_file.recognized_text = " ".join(r['text'] for r in chunk_results if r['text'])
+    media_file.status = 'completed'
+    media_file.file_deletion_date = timezone.now() + timezone.timedelta(days=30)
+    media_file.save(update_fields=['recognized_text', 'status', 'file_deletion_date'])
+    publish_status(media_file.id, media_file.status, media_file.user_id)
+    segments = [seg for r in chunk_results for seg in r['segments']]
+    save_segments(media_file, segments)
+    TranscriptCheckpoint.objects.filter(media_file_id=media_file_id).delete()
+    get_chunk_store().delete(media_file_id)
+    uploads.discard_predecoded(media_file)
+    if cache_entry:
+        transcript_cache.store(
+            cache_entry['key'], cache_entry['pcm_hash'], cache_entry['options'],
+            media_file.recognized_text, segments,
+        )
+    return f"Обробка файлу {media_file.original_filename} завершена успішно"
+
+
+@shared_task
+def transcription_failed_task(request, exc, traceback, media_file_id):
+    logging.error(f"Помилка розподіленої обробки файлу {media_file_id}: {exc}")
+    fail_media_file(media_file_id)
+    get_chunk_store().delete(media_file_id)
+
+
+@shared_task
+def requeue_stuck_transcriptions_task():
+    """
+    Reaper: файли в статусі processing без прогресу довше за TRANSCRIPTION_STUCK_AFTER_SEC
+    (воркер впав або був перезапущений) повертаються в чергу і продовжуються з контрольних точок.
+    Після TRANSCRIPTION_MAX_ATTEMPTS запусків файл позначається як failed.
+    Файл, розподілений на підзадачі (частини ще у сховищі), чекає на них у черзі довше —
+    до TRANSCRIPTION_DISTRIBUTED_STUCK_AFTER_SEC.
+    """
+    now = timezone.now()
+    cutoff = now - timezone.timedelta(seconds=getattr(settings, 'TRANSCRIPTION_STUCK_AFTER_SEC', 30 * 60))
+    distributed_cutoff = now - timezone.timedelta(
+        seconds=getattr(settings, 'TRANSCRIPTION_DISTRIBUTED_STUCK_AFTER_SEC', 12 * 60 * 60))
+    store = get_chunk_store()
+    stuck = (MediaFile.objects
+             .filter(status='processing')
+             .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True))
+             .only('id', 'user_id', 'original_filename', 'original_filesize', 'file', 'file_type',
+                   'duration', 'heartbeat_at', 'processing_attempts'))
+    requeued = failed = 0
+    for media_file in stuck:
+        if (media_file.heartbeat_at is not None and media_file.heartbeat_at >= distributed_cutoff
+                and store.exists(media_file.id)):
+            continue
+        new_status = 'failed' if media_file.processing_attempts >= max_attempts() else 'pending'
+        # Умовне оновлення: файл міг ожити або його вже забрав інший reaper
+        claimed = MediaFile.objects.filter(
+            id=media_file.id, status='processing', heartbeat_at=media_file.heartbeat_at,
+        ).update(status=new_status)
+        if not claimed:
+            continue
+        publish_status(media_file.id, new_status, media_file.user_id)
+        if new_status == 'failed':
+            logging.error(f"Файл {media_file.id}: {media_file.processing_attempts} невдалих запусків, обробку зупинено.")
+            TranscriptCheckpoint.objects.filter(media_file_id=media_file.id).delete()
+            uploads.discard_predecoded(media_file)
+            failed += 1
+        else:
+            logging.warning(f"Файл {media_file.id}: обробка зависла, повторна постановка в чергу.")
+            scheduling.enqueue_media_file(media_file, media_file.duration)
+            requeued += 1
+    return f"Повторно в черзі: {requeued}, позначено як failed: {failed}"
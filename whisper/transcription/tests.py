@@ -1,3 +1,665 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from importlib.util import find_spec
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from . import progress as progress_module
+from . import scheduling, status_cache, tasks, transcript_cache, uploads
+from .audio import (
+    SAMPLE_RATE, chunk_samples, detect_nonsilent_ranges, gather_chunk, plan_chunks, slice_chunk, source_time,
+    window_padding,
+)
+from .batching import BatchingEngine
+from .features import LogMel
+from .models import ChunkedUpload, MediaFile, TranscriptCache
+from .progress import ProgressWriter
+from .utils import segments_to_srt, segments_to_vtt
+from .vad import gate_ranges
+from .views import decode_cursor, encode_cursor
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def speech_like(pattern, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    int16 PCM зі шматків (тривалість у с, гучний?): гучний — шум з амплітудою ~0.3,
+    тихий — ледь чутний фон. Тривалості кратні 1 мс.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for seconds, loud in pattern:
+        length = int(round(seconds * 1000)) * (sample_rate // 1000)
+        amplitude = 10000 if loud else 30
+        parts.append(rng.normal(0, amplitude, length))
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+class DetectNonsilentRangesTests(SimpleTestCase):
+    def test_matches_pydub_split_on_silence(self):
+        from pydub import AudioSegment
+        from pydub.silence import split_on_silence
+        samples = speech_like([(0.7, False), (2.3, True), (1.6, False), (0.9, True), (0.3, False),
+                               (1.1, True), (2.0, False), (1.5, True), (0.4, False)])
+        segment = AudioSegment(samples.tobytes(), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+        for min_silence_len, keep_silence in ((500, 100), (250, 500), (1000, 0)):
+            expected = split_on_silence(segment, min_silence_len=min_silence_len, silence_thresh=-50,
+                                        keep_silence=keep_silence)
+            ranges = detect_nonsilent_ranges(samples, SAMPLE_RATE, min_silence_len, -50, keep_silence)
+            self.assertEqual(
+                [samples[start:end].tobytes() for start, end in ranges],
+                [chunk.raw_data for chunk in expected],
+            )
+
+    def test_short_audio_is_one_range(self):
+        samples = speech_like([(0.2, True)])
+        self.assertEqual(detect_nonsilent_ranges(samples, SAMPLE_RATE, 500, -50, 100), [(0, len(samples))])
+
+
+class PlanChunksTests(SimpleTestCase):
+    def test_chunks_fit_encoder_window(self):
+        samples = speech_like([(4, True), (1.5, False)] * 14 + [(75, True)])
+        chunks = plan_chunks(samples, SAMPLE_RATE, 30, split_long=True)
+        self.assertTrue(chunks)
+        self.assertTrue(all(len(chunk) == 1 for chunk in chunks))
+        self.assertTrue(all(chunk_samples(chunk) <= 30 * SAMPLE_RATE for chunk in chunks))
+        self.assertTrue(all(a[-1][1] <= b[0][0] for a, b in zip(chunks, chunks[1:])))
+
+    def test_long_speech_is_split(self):
+        samples = speech_like([(1, False), (75, True), (1, False)])
+        chunks = plan_chunks(samples, SAMPLE_RATE, 30, split_long=True)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0][0][1], chunks[1][0][0])
+
+    def test_speech_gated_before_packing(self):
+        samples = speech_like([(10, True), (1.5, False)] * 8)
+        # Мовлення — лише перші 5 с кожного гучного шматка
+        step = int(11.5 * SAMPLE_RATE)
+        speech = [(i * step, i * step + 5 * SAMPLE_RATE) for i in range(8)]
+        chunks = plan_chunks(samples, SAMPLE_RATE, 30, split_long=True, speech_ranges=speech)
+        # Мовні ділянки пакуються по шість у 30-секундне вікно, відрізки між ними в частини не входять
+        self.assertEqual(chunks, [speech[:6], speech[6:]])
+        sent = sum(len(gather_chunk(samples, chunk)) for chunk in chunks)
+        self.assertEqual(sent, sum(end - start for start, end in speech))
+        padding = window_padding(chunks, SAMPLE_RATE, speech_samples=sent)
+        self.assertEqual(padding['windows'], 2)
+        self.assertAlmostEqual(padding['sent_sec'], 40.0)
+
+    def test_speech_packed_without_split(self):
+        samples = speech_like([(10, True), (1.5, False)] * 8)
+        step = int(11.5 * SAMPLE_RATE)
+        speech = [(i * step, i * step + 5 * SAMPLE_RATE) for i in range(8)]
+        with self.assertLogs(level='INFO') as logs:
+            chunks = tasks.plan_chunk_ranges(samples, SAMPLE_RATE, need_split_audio=False, use_vad=True,
+                                             speech_ranges=speech)
+        # Без розбиття по тиші мовні ділянки так само пакуються у вікна, а не по одній на вікно
+        self.assertEqual(chunks, [speech[:6], speech[6:]])
+        # У лозі — мовлення після VAD, а не межі частин разом з паузами
+        self.assertIn("VAD: мовлення 40.0 с", "\n".join(logs.output))
+
+    def test_gathered_chunk_maps_back_to_file(self):
+        audio = np.arange(100)
+        chunk = [(10, 20), (50, 60), (80, 85)]
+        self.assertEqual(gather_chunk(audio, chunk).tolist(), list(range(10, 20)) + list(range(50, 60)) + list(range(80, 85)))
+        self.assertEqual(slice_chunk(chunk, 5, 22), [(15, 20), (50, 60), (80, 82)])
+        self.assertEqual(slice_chunk(chunk, 12, 17), [(52, 57)])
+        self.assertEqual(source_time(12, chunk, sample_rate=1), 52)
+        # Кінець сегмента на стику — кінець попередньої ділянки, початок — наступної
+        self.assertEqual(source_time(10, chunk, sample_rate=1, is_end=True), 20)
+        self.assertEqual(source_time(10, chunk, sample_rate=1), 50)
+
+    def test_window_padding(self):
+        padding = window_padding([[(0, 30 * SAMPLE_RATE)], [(40 * SAMPLE_RATE, 50 * SAMPLE_RATE)]], SAMPLE_RATE)
+        self.assertEqual(padding['windows'], 2)
+        self.assertAlmostEqual(padding['padded_sec'], 20.0)
+        self.assertAlmostEqual(padding['padding_ratio'], 20 / 60)
+        # Надіслане немовне аудіо (лише 25 с мовлення з 40 с) — теж марна робота
+        padding = window_padding([[(0, 30 * SAMPLE_RATE)], [(40 * SAMPLE_RATE, 50 * SAMPLE_RATE)]], SAMPLE_RATE,
+                                 speech_samples=25 * SAMPLE_RATE)
+        self.assertAlmostEqual(padding['padded_sec'], 35.0)
+        self.assertEqual(window_padding([], SAMPLE_RATE)['padding_ratio'], 0.0)
+
+
+def decoding_result(tokens, no_speech_prob=0.1, avg_logprob=-0.2, compression_ratio=1.2):
+    return SimpleNamespace(tokens=tokens, no_speech_prob=no_speech_prob, avg_logprob=avg_logprob,
+                           compression_ratio=compression_ratio)
+
+
+# Токени 0..899 — текст, 900 — кінець тексту, від 1000 — часові мітки з кроком 0.02 с
+TOKENIZER = SimpleNamespace(eot=900, timestamp_begin=1000, decode=lambda tokens: "".join(f" w{t}" for t in tokens))
+
+
+class BatchingEngineTests(SimpleTestCase):
+    def engine(self, results):
+        engine = BatchingEngine(get_model=None)
+        results = iter(results)
+
+        def submit(model_name, audio, language=None, mel=None):
+            future = Future()
+            future.set_result(next(results))
+            return future
+        engine.submit = mock.Mock(side_effect=submit)
+        engine._tokenizer = mock.Mock(return_value=TOKENIZER)
+        return engine
+
+    def test_segments_by_timestamps_and_silence_skipped(self):
+        engine = self.engine([
+            decoding_result([1000, 1, 2, 1100, 1100, 3, 1250]),
+            decoding_result([1000, 4, 1100], no_speech_prob=0.9, avg_logprob=-1.5),
+            decoding_result([1000, 5, 1050]),
+        ])
+        audio = np.zeros(80 * SAMPLE_RATE, dtype=np.float32)
+        # Друга частина склеєна з двох ділянок: вікна нарізаються зі склеєного аудіо
+        chunks = [[(0, 40 * SAMPLE_RATE)], [(50 * SAMPLE_RATE, 55 * SAMPLE_RATE), (70 * SAMPLE_RATE, 75 * SAMPLE_RATE)]]
+        results = list(engine.transcribe_chunks('base', audio, chunks, SAMPLE_RATE, language='uk'))
+        self.assertEqual([i for i, _ in results], [0, 1])
+        first = results[0][1]
+        # Дві мітки в першому вікні — два сегменти; друге вікно (тиша) пропущено
+        self.assertEqual([(seg['start'], seg['end'], seg['text']) for seg in first['segments']],
+                         [(0.0, 2.0, ' w1 w2'), (2.0, 5.0, ' w3')])
+        self.assertEqual(first['text'], ' w1 w2 w3')
+        self.assertEqual(results[1][1]['segments'][0]['end'], 1.0)
+        window_audio = engine.submit.call_args_list[2].args[1]
+        self.assertEqual(len(window_audio), 10 * SAMPLE_RATE)
+
+    @skipUnless(find_spec('whisper'), "потрібен openai-whisper")
+    def test_fallback_redecodes_failed_windows(self):
+        import torch
+        calls = []
+
+        def decode(model, mel, options):
+            calls.append((options.temperature, len(mel)))
+            if options.temperature == 0.0:
+                return [decoding_result([1]), decoding_result([2], compression_ratio=3.0),
+                        decoding_result([3], no_speech_prob=0.9, avg_logprob=-1.5)]
+            return [decoding_result([4])]
+        with mock.patch('whisper.decode', side_effect=decode):
+            results = BatchingEngine._decode(None, torch.zeros(3, 80, 3000), 'uk')
+        # Повторно декодується лише вікно з повторами; тиша не перекодовується
+        self.assertEqual(calls, [(0.0, 3), (0.2, 1)])
+        self.assertEqual([r.tokens for r in results], [[1], [4], [3]])
+
+
+class ProgressWriterTests(SimpleTestCase):
+    def test_throttled_by_interval_and_size(self):
+        media_file = SimpleNamespace(recognized_text='', save=mock.Mock())
+        with mock.patch.object(progress_module.time, 'monotonic', return_value=100.0) as monotonic:
+            writer = ProgressWriter(media_file, min_interval_sec=5, min_chars=10)
+            writer.append("abc ")
+            writer.append("def ")
+            media_file.save.assert_not_called()
+            monotonic.return_value = 105.0
+            writer.append("g ")
+            self.assertEqual(media_file.save.call_count, 1)
+            self.assertEqual(media_file.recognized_text, "abc def g ")
+            # Без паузи — запис, щойно накопичилось min_chars
+            writer.append("0123456789")
+            self.assertEqual(media_file.save.call_count, 2)
+            writer.flush(extra_fields=['status'])
+        media_file.save.assert_called_with(update_fields=['recognized_text', 'status'])
+
+
+class DenoiseBlocksTests(SimpleTestCase):
+    def test_blocks_see_context_and_write_in_place(self):
+        from . import denoise
+        rng = np.random.default_rng(0)
+        audio = rng.normal(0, 0.1, 10 * SAMPLE_RATE + 123).astype(np.float32)
+        original = audio.copy()
+        inputs = []
+
+        def reduce_block(block, sample_rate, noise_clip):
+            inputs.append(block.copy())
+            return block * 2
+        for n_jobs in (1, 3):
+            audio[:] = original
+            inputs.clear()
+            with mock.patch.object(denoise, '_reduce_block', side_effect=reduce_block):
+                done = list(denoise.denoise_blocks(audio, SAMPLE_RATE, block_sec=2.0, context_sec=0.5, n_jobs=n_jobs,
+                                                   noise_clip=np.zeros(10, dtype=np.float32)))
+            # Кожен блок бачить оригінальні семпли (разом з контекстом), а не вже оброблені сусідом
+            self.assertEqual(len(inputs), 6)
+            self.assertTrue(all(np.isin(block, original).all() for block in inputs))
+            self.assertEqual(len(inputs[1]), 3 * SAMPLE_RATE)
+            np.testing.assert_allclose(audio, original * 2, rtol=1e-5)
+            self.assertEqual(done, sorted(done))
+            self.assertEqual(done[-1], len(audio))
+
+
+@skipUnless(find_spec('torch') and find_spec('whisper'), "потрібні torch і openai-whisper")
+class LogMelTests(SimpleTestCase):
+    def test_window_matches_whisper(self):
+        import whisper
+        audio = np.random.default_rng(0).normal(0, 0.1, 70 * SAMPLE_RATE).astype(np.float32)
+        mel = LogMel(audio, block_frames=1000)
+        start, end = 40 * SAMPLE_RATE, 52 * SAMPLE_RATE
+        expected = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[start:end]))
+        frames = (end - start) // 160
+        # Кадри біля меж частини рахуються з сусідніми семплами файлу, а не з доповненням
+        np.testing.assert_allclose(mel.window([(start, end)])[:, 2:frames - 2].numpy(),
+                                   expected[:, 2:frames - 2].numpy(), atol=1e-3)
+        self.assertEqual(mel.ready_frames, 52 * 100)
+        # Склеєна частина — кадри діапазонів підряд
+        chunk = [(0, 5 * SAMPLE_RATE), (60 * SAMPLE_RATE, 65 * SAMPLE_RATE)]
+        window = mel.window(chunk)
+        self.assertEqual(LogMel.chunk_frames(chunk), 1000)
+        self.assertTrue((window[:, 1000:] == window[:, -1:]).all())
+
+
+@override_settings(TRANSCRIPTION_SHORT_MAX_DURATION_SEC=600, TRANSCRIPTION_SHORT_QUEUE='short',
+                   TRANSCRIPTION_LONG_QUEUE='long')
+class SchedulingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+
+    def create(self, **kwargs):
+        return MediaFile.objects.create(
+            user=self.user, file='uploads/a.mp3', original_filename='a.mp3', original_filesize=1_000_000,
+            file_type='audio', **kwargs,
+        )
+
+    def test_choose_queue(self):
+        self.assertEqual(scheduling.choose_queue(600), 'short')
+        self.assertEqual(scheduling.choose_queue(601), 'long')
+
+    def test_enqueue_routes_by_duration_with_fair_share(self):
+        self.create(status='processing')
+        media_file = self.create()
+        with mock.patch.object(tasks.process_media_file_task, 'apply_async') as apply_async:
+            self.assertEqual(scheduling.enqueue_media_file(media_file, 3600, countdown=30), 'long')
+        apply_async.assert_called_once_with(
+            args=[media_file.id], kwargs={'queue': 'long'}, queue='long', priority=1, countdown=30,
+        )
+        self.assertEqual(MediaFile.objects.get(id=media_file.id).queue, 'long')
+
+    def test_duration_estimated_from_probe_or_size(self):
+        probed = self.create(has_video=False, duration=42.0)
+        self.assertEqual(scheduling.estimate_duration(probed), 42.0)
+        # 1 МБ при 128 кбіт/с
+        self.assertAlmostEqual(scheduling.estimate_duration(self.create()), 62.5)
+
+
+class GateRangesTests(SimpleTestCase):
+    def test_keeps_only_speech(self):
+        self.assertEqual(gate_ranges([(0, 100)], [(10, 20), (60, 70)], max_gap=5), [(10, 20), (60, 70)])
+
+    def test_short_gaps_stay_in_one_range(self):
+        self.assertEqual(gate_ranges([(0, 100)], [(10, 20), (23, 30)], max_gap=5), [(10, 30)])
+
+    def test_clipped_to_chunk(self):
+        self.assertEqual(gate_ranges([(0, 50), (50, 100)], [(40, 60)], max_gap=0), [(40, 50), (50, 60)])
+
+    def test_no_speech(self):
+        self.assertEqual(gate_ranges([(0, 100)], [], max_gap=5), [])
+        self.assertEqual(gate_ranges([(0, 100)], [(100, 120)], max_gap=5), [])
+
+
+class SubtitleTests(SimpleTestCase):
+    segments = [
+        SimpleNamespace(start=0.0, end=1.5, text=' Привіт.'),
+        SimpleNamespace(start=3661.25, end=3662.0, text='Світ '),
+    ]
+
+    def test_srt(self):
+        self.assertEqual(
+            segments_to_srt(self.segments),
+            "1\n00:00:00,000 --> 00:00:01,500\nПривіт.\n\n"
+            "2\n01:01:01,250 --> 01:01:02,000\nСвіт\n",
+        )
+
+    def test_vtt(self):
+        self.assertEqual(
+            segments_to_vtt(self.segments),
+            "WEBVTT\n\n"
+            "00:00:00.000 --> 00:00:01.500\nПривіт.\n\n"
+            "01:01:01.250 --> 01:01:02.000\nСвіт\n",
+        )
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        upload_date = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        cursor = encode_cursor(SimpleNamespace(upload_date=upload_date, id=42))
+        self.assertEqual(decode_cursor(cursor), (upload_date, 42))
+
+    def test_invalid(self):
+        for cursor in (None, '', 'abc', '1.2.3', '12'):
+            self.assertIsNone(decode_cursor(cursor))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, TRANSCRIPTION_LIST_PAGE_SIZE=2)
+class MyTranscriptionsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        # Два файли з однаковим часом: порядок між ними задає id
+        dates = [now, now - datetime.timedelta(minutes=1), now - datetime.timedelta(minutes=1),
+                 now - datetime.timedelta(minutes=2), now - datetime.timedelta(minutes=3)]
+        self.files = [
+            MediaFile.objects.create(
+                user=self.user, file=f'uploads/{i}.mp3', original_filename=f'{i}.mp3', original_filesize=1,
+                file_type='audio', upload_date=date,
+            )
+            for i, date in enumerate(dates)
+        ]
+
+    def page_ids(self, cursor=None):
+        response = self.client.get(reverse('my_transcriptions'), {'before': cursor} if cursor else {},
+                                   headers={'HX-Request': 'true'})
+        self.assertEqual(response.status_code, 200)
+        return [media_file.id for media_file in response.context['media_files']], response.context['next_cursor']
+
+    def test_keyset_pagination(self):
+        expected = [f.id for f in sorted(self.files, key=lambda f: (f.upload_date, f.id), reverse=True)]
+        seen = []
+        cursor = None
+        while True:
+            ids, cursor = self.page_ids(cursor)
+            seen.extend(ids)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_not_modified_until_listing_changes(self):
+        url = reverse('my_transcriptions')
+        # Перша відповідь ставить cookie CSRF, від якої теж залежить ETag
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        status_cache.touch_listing(self.user.id)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_no_etag_without_cache(self):
+        with mock.patch.object(status_cache, 'listing_version', return_value=None):
+            response = self.client.get(reverse('my_transcriptions'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class AppendChunkTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('user', password='password')
+        self.upload = uploads.create_upload(self.user, 'a.mp3', 10, {})
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def read_part(self):
+        with open(uploads.part_path(self.upload), 'rb') as f:
+            return f.read()
+
+    def test_appends_in_order(self):
+        self.assertEqual(uploads.append_chunk(self.upload, 0, io.BytesIO(b'abcd'), 4, read_size=3), 4)
+        self.assertEqual(uploads.append_chunk(self.upload, 4, io.BytesIO(b'efg'), 3), 7)
+        self.assertEqual(self.read_part(), b'abcdefg')
+        self.assertEqual(ChunkedUpload.objects.get(id=self.upload.id).offset, 7)
+
+    def test_rejects_wrong_offset_and_overflow(self):
+        uploads.append_chunk(self.upload, 0, io.BytesIO(b'abcd'), 4)
+        self.assertIsNone(uploads.append_chunk(self.upload, 2, io.BytesIO(b'xy'), 2))
+        self.assertIsNone(uploads.append_chunk(self.upload, 4, io.BytesIO(b'x' * 7), 7))
+        self.assertEqual(self.read_part(), b'abcd')
+
+    def test_short_body_keeps_received_bytes(self):
+        self.assertEqual(uploads.append_chunk(self.upload, 0, io.BytesIO(b'ab'), 4), 2)
+        self.assertEqual(uploads.append_chunk(self.upload, 2, io.BytesIO(b'cd'), 2), 4)
+        self.assertEqual(self.read_part(), b'abcd')
+
+    def test_concurrent_request_with_same_offset(self):
+        stale = ChunkedUpload.objects.get(id=self.upload.id)
+        uploads.append_chunk(self.upload, 0, io.BytesIO(b'abcd'), 4)
+        self.assertIsNone(uploads.append_chunk(stale, 0, io.BytesIO(b'wxyz'), 4))
+
+    def test_view_conflict(self):
+        self.client.force_login(self.user)
+        url = reverse('chunked_upload', args=[self.upload.upload_id])
+        response = self.client.put(url, b'cd', content_type='application/octet-stream',
+                                   headers={'Content-Range': 'bytes 2-3/10'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'offset': 0, 'size': 10})
+        response = self.client.put(url, b'ab', content_type='application/octet-stream',
+                                   headers={'Content-Range': 'bytes 0-1/10'})
+        self.assertEqual(response.json()['offset'], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PredecodeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('user', password='password')
+        self.upload = uploads.create_upload(self.user, 'a.mp3', 4, {})
+        uploads.append_chunk(self.upload, 0, io.BytesIO(b'abcd'), 4)
+        self.media_file = uploads.complete_upload(self.upload)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def save_pcm(self):
+        uploads.save_predecoded(self.upload, np.arange(16, dtype=np.int16))
+        ChunkedUpload.objects.filter(id=self.upload.id).update(decode_status='done')
+
+    def test_loads_done(self):
+        self.save_pcm()
+        self.assertEqual(uploads.load_predecoded(self.media_file).tolist(), list(range(16)))
+
+    def test_queued_decode_is_cancelled_without_waiting(self):
+        ChunkedUpload.objects.filter(id=self.upload.id).update(decode_status='queued')
+        with mock.patch.object(uploads.time, 'sleep') as sleep:
+            self.assertIsNone(uploads.load_predecoded(self.media_file, wait_sec=30))
+        sleep.assert_not_called()
+        self.assertEqual(ChunkedUpload.objects.get(id=self.upload.id).decode_status, '')
+        # Задача, що дійшла до воркера пізніше, вже не декодує файл
+        self.assertIn("скасовано", tasks.predecode_upload_task(self.upload.upload_id))
+
+    def test_fail_discards_pcm(self):
+        self.save_pcm()
+        tasks.fail_media_file(self.media_file.id, self.user.id)
+        self.assertFalse(os.path.exists(uploads.pcm_path(self.upload)))
+        self.assertEqual(MediaFile.objects.get(id=self.media_file.id).status, 'failed')
+
+    def test_prune_sweeps_finished_uploads(self):
+        self.save_pcm()
+        MediaFile.objects.filter(id=self.media_file.id).update(status='processing')
+        self.assertEqual(uploads.prune_chunked_uploads(), 0)
+        MediaFile.objects.filter(id=self.media_file.id).update(status='completed')
+        self.assertEqual(uploads.prune_chunked_uploads(), 1)
+        self.assertFalse(os.path.exists(uploads.pcm_path(self.upload)))
+        self.assertFalse(ChunkedUpload.objects.filter(id=self.upload.id).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, TRANSCRIPTION_HEARTBEAT_SEC=3600, TRANSCRIPTION_MAX_ATTEMPTS=3,
+                   TRANSCRIPTION_SHORT_MAX_DURATION_SEC=600)
+class ProcessingAttemptsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.media_file = MediaFile.objects.create(
+            user=self.user, file='uploads/a.mp3', original_filename='a.mp3', original_filesize=1, file_type='audio',
+        )
+
+    def refresh(self):
+        return MediaFile.objects.get(id=self.media_file.id)
+
+    def test_claim_once(self):
+        first, second = self.refresh(), self.refresh()
+        self.assertTrue(tasks.claim_media_file(first))
+        # Друга доставка тієї ж задачі бачила старий стан і файл не отримує
+        self.assertFalse(tasks.claim_media_file(second))
+        self.assertFalse(tasks.claim_media_file(self.refresh()))
+        self.assertEqual(self.refresh().processing_attempts, 1)
+
+    def test_claim_processing_with_dead_heartbeat(self):
+        MediaFile.objects.filter(id=self.media_file.id).update(
+            status='processing', heartbeat_at=timezone.now() - datetime.timedelta(hours=4), processing_attempts=1)
+        self.assertTrue(tasks.claim_media_file(self.refresh()))
+        self.assertEqual(self.refresh().processing_attempts, 2)
+
+    def test_attempt_limit_fails_file(self):
+        MediaFile.objects.filter(id=self.media_file.id).update(processing_attempts=3)
+        with mock.patch.object(tasks.uploads, 'load_predecoded') as load:
+            tasks.process_media_file_task(self.media_file.id)
+        load.assert_not_called()
+        self.assertEqual(self.refresh().status, 'failed')
+
+    def test_reroute_does_not_consume_attempt(self):
+        samples = np.zeros(700 * SAMPLE_RATE, dtype=np.int16)
+        with mock.patch.object(tasks.uploads, 'load_predecoded', return_value=samples), \
+                mock.patch.object(tasks.scheduling, 'enqueue_media_file', return_value='transcription_long') as enqueue:
+            tasks.process_media_file_task(self.media_file.id, queue=tasks.scheduling.short_queue())
+        enqueue.assert_called_once()
+        media_file = self.refresh()
+        self.assertEqual((media_file.status, media_file.processing_attempts), ('pending', 0))
+
+    def test_retry_backs_off(self):
+        with mock.patch.object(tasks.uploads, 'load_predecoded', side_effect=RuntimeError('decode')), \
+                mock.patch.object(tasks.scheduling, 'enqueue_media_file') as enqueue:
+            tasks.process_media_file_task(self.media_file.id)
+        self.assertEqual(enqueue.call_args.kwargs['countdown'], 30)
+        self.assertEqual(self.refresh().status, 'pending')
+        self.assertEqual(tasks.retry_countdown(3), 120)
+        self.assertEqual(tasks.retry_countdown(20), 600)
+
+    def test_chunk_deliveries_are_bounded(self):
+        MediaFile.objects.filter(id=self.media_file.id).update(status='processing')
+        for _ in range(3):
+            tasks.count_chunk_delivery(self.media_file.id, 0)
+        with self.assertRaises(RuntimeError):
+            tasks.transcribe_chunk_task(self.media_file.id, 0, 0, SAMPLE_RATE)
+        self.assertEqual(self.refresh().status, 'failed')
+        # Лічильник окремий для кожної частини
+        self.assertEqual(tasks.count_chunk_delivery(self.media_file.id, 1), 1)
+
+    def test_reaper(self):
+        stale = timezone.now() - datetime.timedelta(hours=1)
+        other = MediaFile.objects.create(
+            user=self.user, file='uploads/b.mp3', original_filename='b.mp3', original_filesize=1, file_type='audio',
+        )
+        alive = MediaFile.objects.create(
+            user=self.user, file='uploads/c.mp3', original_filename='c.mp3', original_filesize=1, file_type='audio',
+        )
+        MediaFile.objects.filter(id=self.media_file.id).update(
+            status='processing', heartbeat_at=stale, processing_attempts=1, duration=10)
+        MediaFile.objects.filter(id=other.id).update(status='processing', heartbeat_at=stale, processing_attempts=3)
+        MediaFile.objects.filter(id=alive.id).update(status='processing', heartbeat_at=timezone.now())
+        with mock.patch.object(tasks.scheduling, 'enqueue_media_file') as enqueue:
+            tasks.requeue_stuck_transcriptions_task()
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.args[0].id, self.media_file.id)
+        self.assertEqual(self.refresh().status, 'pending')
+        self.assertEqual(MediaFile.objects.get(id=other.id).status, 'failed')
+        self.assertEqual(MediaFile.objects.get(id=alive.id).status, 'processing')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StatusCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.media_file = MediaFile.objects.create(
+            user=self.user, file='uploads/a.mp3', original_filename='a.mp3', original_filesize=1, file_type='audio',
+            status='processing',
+        )
+
+    def test_status_write_keeps_progress(self):
+        status_cache.set_status(self.media_file.id, self.user.id, 'processing')
+        status_cache.start_progress(self.media_file.id, 4)
+        status_cache.chunk_done(self.media_file.id)
+        status_cache.chunk_done(self.media_file.id)
+        # Повторний запис статусу (publish_status з іншого місця) не скидає прогрес
+        status_cache.set_status(self.media_file.id, self.user.id, 'processing')
+        status = status_cache.get_status(self.media_file.id)
+        self.assertEqual((status['status'], status['chunks_done'], status['chunks_total']), ('processing', 2, 4))
+        self.assertIsNotNone(status['eta_sec'])
+        status_cache.set_status(self.media_file.id, self.user.id, 'completed')
+        self.assertEqual(status_cache.get_status(self.media_file.id)['chunks_done'], 2)
+
+    def test_restore_does_not_overwrite(self):
+        status_cache.set_status(self.media_file.id, self.user.id, 'completed')
+        status_cache.restore_status(self.media_file.id, self.user.id, 'processing')
+        self.assertEqual(status_cache.get_status(self.media_file.id)['status'], 'completed')
+
+    def test_view_fallback_keeps_progress(self):
+        from django.core.cache import cache
+        status_cache.start_progress(self.media_file.id, 3)
+        status_cache.chunk_done(self.media_file.id)
+        # Запис статусу вичерпався, прогрес воркера лишився
+        cache.delete(status_cache._status_key(self.media_file.id))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('transcription_status', args=[self.media_file.id]))
+        self.assertEqual(response.json()['status'], 'processing')
+        self.assertEqual(response.json()['chunks_done'], 1)
+        self.assertEqual(status_cache.get_status(self.media_file.id)['chunks_done'], 1)
+
+
+@override_settings(TRANSCRIPTION_SHARED_MEL=False, TRANSCRIPTION_VAD_ENABLED=False, WHISPER_BATCHING_ENABLED=False,
+                   WHISPER_PARALLEL_WORKERS=0)
+class CheckpointResumeTests(SimpleTestCase):
+    def setUp(self):
+        self.samples = speech_like([(8, True), (1.5, False)] * 9)
+        self.model = SimpleNamespace(is_multilingual=True, transcribe=mock.Mock(side_effect=self.transcribe))
+
+    @staticmethod
+    def transcribe(audio, **kwargs):
+        seconds = len(audio) / SAMPLE_RATE
+        return {'text': f" {seconds:.1f}", 'segments': [{'start': 0.0, 'end': seconds, 'text': f" {seconds:.1f}"}]}
+
+    def run_chunks(self, checkpoints=None):
+        with mock.patch.object(tasks, 'get_whisper_model', return_value=self.model):
+            return list(tasks.transcribe_chunks(
+                samples=self.samples, need_reduce_noise=False, choosed_language='uk', checkpoints=checkpoints,
+            ))
+
+    def test_resumes_from_checkpoints(self):
+        first = self.run_chunks()
+        self.assertGreaterEqual(len(first), 3)
+        self.model.transcribe.reset_mock()
+        checkpoints = {0: first[0], 1: first[1]}
+        # Контрольна точка з іншими межами (інший план частин) не використовується
+        checkpoints[2] = {**first[2], 'end': first[2]['end'] + 1}
+        resumed = self.run_chunks(checkpoints)
+        self.assertEqual(self.model.transcribe.call_count, len(first) - 2)
+        self.assertEqual([chunk['index'] for chunk in resumed], list(range(len(first))))
+        self.assertEqual([chunk['resumed'] for chunk in resumed[:3]], [True, True, False])
+        self.assertEqual([chunk['text'] for chunk in resumed], [chunk['text'] for chunk in first])
+        self.assertEqual(resumed[2]['segments'], first[2]['segments'])
+
+
+class TranscriptCacheTests(TestCase):
+    options = {'model': 'base', 'language': 'uk', 'need_reduce_noise': True, 'need_split_audio': False}
+
+    def test_key_depends_on_hash_and_options(self):
+        key = transcript_cache.make_cache_key('pcm', self.options)
+        self.assertEqual(key, transcript_cache.make_cache_key('pcm', dict(reversed(list(self.options.items())))))
+        self.assertNotEqual(key, transcript_cache.make_cache_key('other', self.options))
+        self.assertNotEqual(key, transcript_cache.make_cache_key('pcm', {**self.options, 'model': 'small'}))
+        self.assertNotEqual(key, transcript_cache.make_cache_key('pcm', {**self.options, 'backend': 'int8'}))
+
+    def test_store_and_lookup(self):
+        key = transcript_cache.make_cache_key('pcm', self.options)
+        self.assertIsNone(transcript_cache.lookup(key))
+        transcript_cache.store(key, 'pcm', self.options, 'текст', [{'start': 0.0, 'end': 1.0, 'text': 'текст'}])
+        entry = transcript_cache.lookup(key)
+        self.assertEqual(entry.recognized_text, 'текст')
+        transcript_cache.lookup(key)
+        self.assertEqual(TranscriptCache.objects.get(key=key).hit_count, 2)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import logging
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import TranscriptCache, TranscriptSegment
+from .utils import hash_to_base62
+
+
+def make_cache_key(pcm_hash, options):
+    """
+    Ключ кешу: хеш PCM + параметри, від яких залежить результат (модель, мова, шум, розбиття).
+    """
+    source = f"{pcm_hash}:{json.dumps(options, sort_keys=True)}"
+    return hash_to_base62(hashlib.md5(source.encode()), num_bits=128)
+
+
+def lookup(key):
+    entry = TranscriptCache.objects.filter(key=key).first()
+    if entry is not None:
+        TranscriptCache.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+        )
+    return entry
+
+
+def apply_cached(entry, media_file):
+    """
+    Копіює збережений результат у новий MediaFile (текст + сегменти).
+    """
+    media_file.recognized_text = entry.recognized_text
+    TranscriptSegment.objects.filter(media_file=media_file).delete()
+    TranscriptSegment.objects.bulk_create(
+        [TranscriptSegment(media_file=media_file, **segment) for segment in entry.segments],
+        batch_size=500,
+    )
+
+
+def store(key, pcm_hash, options, recognized_text, segments):
+    segments = [
+        {k: segment.get(k) for k in ('start', 'end', 'text', 'tokens', 'avg_logprob')}
+        for segment in segments
+    ]
+    size_bytes = len(recognized_text.encode()) + len(json.dumps(segments))
+    TranscriptCache.objects.update_or_create(
+        key=key,
+        defaults={
+            'pcm_hash': pcm_hash,
+            'options': options,
+            'recognized_text': recognized_text,
+            'segments': segments,
+            'size_bytes': size_bytes,
+            'last_used_at': timezone.now(),
+        },
+    )
+
+
+def prune(max_age_days=None, max_bytes=None):
+    """
+    Видаляє записи, якими не користувались довше max_age_days, а потім найдавніше
+    використані, доки сумарний розмір не стане меншим за max_bytes.
+    Returns:
+        int: Кількість видалених записів.
+    """
+    deleted = 0
+    if max_age_days is not None:
+        cutoff = timezone.now() - timezone.timedelta(days=max_age_days)
+        deleted += TranscriptCache.objects.filter(last_used_at__lt=cutoff).delete()[0]
+
+    if max_bytes is not None:
+        total = TranscriptCache.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+        if total > max_bytes:
+            to_delete = []
+            for pk, size_bytes in TranscriptCache.objects.order_by('last_used_at').values_list('pk', 'size_bytes').iterator():
+                if total <= max_bytes:
+                    break
+                to_delete.append(pk)
+                total -= size_bytes
+            deleted += TranscriptCache.objects.filter(pk__in=to_delete).delete()[0]
+
+    logging.info(f"Кеш транскрипцій: видалено {deleted} записів.")
+    return deleted
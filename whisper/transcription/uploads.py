@@ -0,0 +1,253 @@
+import logging
+import os
+import subprocess
+import time
+import uuid
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from .audio import probe_media
+from .models import ChunkedUpload, MediaFile
+from .utils import get_file_type, md5_to_base62
+
+
+# Формати, які ffmpeg декодує з потоку без перемотування (mp4/mov/m4a часто мають moov в кінці файлу)
+STREAMABLE_EXTENSIONS = {'.mp3', '.wav', '.ogg', '.flac', '.aac', '.webm'}
+
+
+def partial_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial')
+
+
+def part_path(upload):
+    return os.path.join(partial_dir(), f"{upload.upload_id}.part")
+
+
+def pcm_path(upload):
+    return os.path.join(partial_dir(), f"{upload.upload_id}.npy")
+
+
+def can_decode_early(filename):
+    return (getattr(settings, 'TRANSCRIPTION_EARLY_DECODE', True)
+            and os.path.splitext(filename)[1].lower() in STREAMABLE_EXTENSIONS)
+
+
+def create_upload(user, filename, size, options):
+    """
+    Створює сесію завантаження і порожній файл, у який дописуватимуться частини.
+    """
+    upload = ChunkedUpload.objects.create(
+        upload_id=uuid.uuid4().hex,
+        user=user,
+        filename=filename,
+        size=size,
+        options=options,
+    )
+    os.makedirs(partial_dir(), exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length, read_size=64 * 1024):
+    """
+    Дописує частину з потоку запиту прямо у файл, блоками по read_size (пам'ять не залежить від розміру).
+    Returns:
+        int: Новий зсув, або None, якщо offset не збігається з уже завантаженим (частину треба повторити з іншого місця).
+    """
+    if offset != upload.offset or offset + length > upload.size:
+        return None
+    with open(part_path(upload), 'r+b') as f:
+        f.seek(offset)
+        # Недописаний хвіст попередньої невдалої спроби відкидається
+        f.truncate()
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(read_size, remaining))
+            if not chunk:
+                break
+            f.write(chunk)
+            remaining -= len(chunk)
+    new_offset = offset + length - remaining
+    # Умовне оновлення: паралельний запит з тим самим offset не зсуне лічильник двічі
+    updated = ChunkedUpload.objects.filter(id=upload.id, offset=offset).update(offset=new_offset)
+    if not updated:
+        return None
+    upload.offset = new_offset
+    return new_offset
+
+
+def follow_upload(upload, read_size=1 << 20, poll_sec=0.5, max_poll_sec=5.0, idle_timeout_sec=None,
+                  max_duration_sec=None):
+    """
+    Генератор байтів файлу, що ще завантажується: віддає нові дані щойно вони записані
+    і завершується, коли завантаження завершене і всі байти прочитані.
+    Поки нових даних немає, інтервал опитування БД зростає від poll_sec до max_poll_sec.
+    Загальний час обмежений max_duration_sec: повільне завантаження не тримає воркер без кінця,
+    файл тоді декодується звичайним шляхом після завершення.
+    """
+    if idle_timeout_sec is None:
+        idle_timeout_sec = getattr(settings, 'TRANSCRIPTION_UPLOAD_IDLE_TIMEOUT_SEC', 10 * 60)
+    if max_duration_sec is None:
+        max_duration_sec = getattr(settings, 'TRANSCRIPTION_PREDECODE_MAX_SEC', 60 * 60)
+    read = 0
+    started = last_progress = time.monotonic()
+    delay = poll_sec
+    # Файл відкривається один раз: переміщення у фінальну теку після завершення не заважає читанню
+    with open(part_path(upload), 'rb') as f:
+        while True:
+            status, offset = ChunkedUpload.objects.filter(id=upload.id).values_list('status', 'offset').get()
+            progressed = read < offset
+            while read < offset:
+                chunk = f.read(min(read_size, offset - read))
+                if not chunk:
+                    break
+                read += len(chunk)
+                last_progress = time.monotonic()
+                yield chunk
+            if status == 'complete' and read >= offset:
+                return
+            now = time.monotonic()
+            if now - last_progress > idle_timeout_sec:
+                raise RuntimeError(f"Завантаження {upload.upload_id} не просувається")
+            if now - started > max_duration_sec:
+                raise RuntimeError(f"Завантаження {upload.upload_id} триває довше за {max_duration_sec} с")
+            delay = poll_sec if progressed else min(delay * 2, max_poll_sec)
+            time.sleep(delay)
+
+
+def save_predecoded(upload, samples):
+    path = pcm_path(upload)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(samples, dtype=np.int16))
+    os.replace(tmp_path, path)
+
+
+def complete_upload(upload):
+    """
+    Завершує завантаження: переносить файл у сховище медіа і створює MediaFile.
+    Якщо файл не декодувався під час завантаження, хеш вмісту рахується тут.
+    """
+    ChunkedUpload.objects.filter(id=upload.id).update(status='complete')
+    upload.status = 'complete'
+    source = part_path(upload)
+    if upload.decode_status in ('', 'queued'):
+        upload.content_hash = md5_to_base62(source) or ''
+
+    name = default_storage.get_available_name(
+        timezone.now().strftime('uploads/%Y-%m/') + default_storage.get_valid_name(upload.filename)
+    )
+    destination = default_storage.path(name)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(source, destination)
+
+    options = upload.options
+    media_file = MediaFile(
+        user=upload.user,
+        original_filename=upload.filename,
+        original_filesize=upload.size,
+        file_type=get_file_type(upload.filename),
+        noise_cancellation=options.get('noise_cancellation', False),
+        language=options.get('language', 'uk'),
+        diarisation=options.get('diarisation', False),
+        need_split_audio=options.get('need_split_audio', False),
+        whisper_model=options.get('whisper_model', 'base'),
+    )
+    media_file.file.name = name
+    media_file.save()
+    upload.media_file = media_file
+    upload.save(update_fields=['status', 'content_hash', 'media_file'])
+    return media_file
+
+
+def probe_media_file(media_file):
+    """
+    Один раз запускає ffprobe для завантаженого файлу і зберігає тривалість, кодек, розкладку каналів,
+    індекс аудіопотоку і тип (відео — за наявністю відеопотоку, а не за розширенням).
+    Якщо ffprobe не впорався, поля лишаються порожніми: тривалість оцінюється за розміром,
+    а ffmpeg обирає потік сам.
+    """
+    try:
+        info = probe_media(media_file.file.path)
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        logging.warning(f"ffprobe не зміг прочитати файл {media_file.id}: {e}")
+        return None
+    if info['audio_stream_index'] is None:
+        logging.warning(f"Файл {media_file.id}: аудіопотік не знайдено.")
+    fields = {
+        'has_video': info['has_video'],
+        'audio_stream_index': info['audio_stream_index'],
+        'audio_codec': info['audio_codec'][:32],
+        'channel_layout': (info['channel_layout'] or (f"{info['channels']}ch" if info['channels'] else ''))[:32],
+        'file_type': 'video' if info['has_video'] else 'audio',
+    }
+    if info['duration'] is not None:
+        fields['duration'] = info['duration']
+    for name, value in fields.items():
+        setattr(media_file, name, value)
+    MediaFile.objects.filter(id=media_file.id).update(**fields)
+    return info
+
+
+def load_predecoded(media_file, wait_sec=None, poll_sec=0.5):
+    """
+    PCM, декодований під час завантаження, або None. Якщо декодування ще дочитує хвіст файлу,
+    чекає до wait_sec секунд.
+    Декодування, яке так і не почалося (немає воркера службової черги), скасовується одразу:
+    файл декодується звичайним шляхом без очікування.
+    """
+    if wait_sec is None:
+        wait_sec = getattr(settings, 'TRANSCRIPTION_PREDECODE_WAIT_SEC', 30)
+    upload = ChunkedUpload.objects.filter(media_file=media_file).only('upload_id', 'decode_status').first()
+    if upload is None:
+        return None
+    if upload.decode_status == 'queued':
+        # Умовне оновлення: або задача вже забрала декодування (running), або вона його не почне
+        if ChunkedUpload.objects.filter(id=upload.id, decode_status='queued').update(decode_status=''):
+            return None
+        upload.refresh_from_db(fields=['decode_status'])
+    deadline = time.monotonic() + wait_sec
+    while upload.decode_status == 'running' and time.monotonic() < deadline:
+        time.sleep(poll_sec)
+        upload.refresh_from_db(fields=['decode_status'])
+    if upload.decode_status != 'done':
+        return None
+    try:
+        return np.load(pcm_path(upload), mmap_mode='r')
+    except OSError as e:
+        logging.warning(f"Не вдалося прочитати декодований PCM: {e}")
+        return None
+
+
+def discard_predecoded(media_file):
+    """
+    Видаляє PCM, декодований під час завантаження: викликається, коли обробка файлу завершилась.
+    """
+    upload = ChunkedUpload.objects.filter(media_file=media_file).only('upload_id').first()
+    if upload is not None and os.path.exists(pcm_path(upload)):
+        os.remove(pcm_path(upload))
+
+
+def prune_chunked_uploads(max_age_sec=None):
+    """
+    Видаляє незавершені завантаження, старші за max_age_sec, разом з файлами,
+    а також завершені завантаження, обробка файлу яких закінчилась (або файл видалено):
+    їхній декодований PCM більше не потрібен, навіть якщо обробка не прибрала його сама.
+    """
+    if max_age_sec is None:
+        max_age_sec = getattr(settings, 'TRANSCRIPTION_UPLOAD_EXPIRE_SEC', 24 * 60 * 60)
+    stale = ChunkedUpload.objects.filter(
+        Q(status='uploading', created_at__lt=timezone.now() - timezone.timedelta(seconds=max_age_sec))
+        | Q(status='complete', media_file__isnull=True)
+        | Q(status='complete', media_file__status__in=('completed', 'failed'))
+    )
+    deleted = 0
+    for upload in stale:
+        for path in (part_path(upload), pcm_path(upload)):
+            if os.path.exists(path):
+                os.remove(path)
+        upload.delete()
+        deleted += 1
+    return deleted
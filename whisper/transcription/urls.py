@@ -3,9 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.upload_view, name='upload'),
+    path('upload/chunked/', views.chunked_upload_start_view, name='chunked_upload_start'),
+    path('upload/chunked/<str:upload_id>/', views.chunked_upload_view, name='chunked_upload'),
     path('my-transcriptions/', views.my_transcriptions_view, name='my_transcriptions'),
+    path('queues/', views.queue_status_view, name='queue_status'),
+    path('transcription/events/', views.transcription_events_view, name='transcription_events'),
     path('transcription/<int:file_id>/', views.transcription_detail_view, name='transcription_detail'),
     path('transcription/<int:file_id>/status/', views.transcription_status_view, name='transcription_status'),
+    path('transcription/<int:file_id>/export/<str:export_format>/', views.transcription_export_view, name='transcription_export'),
     path('transcription/<int:file_id>/share/', views.toggle_share_view, name='toggle_share'),
     path('shared/<str:shared_url>/', views.shared_transcription_view, name='shared_transcription'),
 ]
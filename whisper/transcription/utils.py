@@ -1,6 +1,7 @@
 import os
 import hashlib
 import base62
+import numpy as np
 from django.conf import settings
 from django.utils import timezone
 
@@ -60,9 +61,6 @@ def md5_to_base62(file_path, num_bits=34):
     Returns:
         str: Рядок у форматі Base62.
     """
-
-    ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    BASE = len(ALPHABET)
     md5_hash = hashlib.md5()
     try:
         with open(file_path, "rb") as f:
@@ -70,6 +68,28 @@ def md5_to_base62(file_path, num_bits=34):
                 md5_hash.update(chunk)
     except FileNotFoundError:
         return None
+    return hash_to_base62(md5_hash, num_bits)
+
+
+def pcm_md5_to_base62(samples, num_bits=128, block_size=1 << 20):
+    """
+    Обчислює MD5-хеш декодованого PCM (NumPy-масиву) і кодує його у Base62.
+    Хеш не залежить від контейнера й кодека, тому збігається для перекодованих копій
+    з однаковим звуком. Масив хешується блоками, без копії всього буфера.
+    """
+    md5_hash = hashlib.md5()
+    data = memoryview(np.ascontiguousarray(samples)).cast('B')
+    for offset in range(0, len(data), block_size):
+        md5_hash.update(data[offset:offset + block_size])
+    return hash_to_base62(md5_hash, num_bits)
+
+
+def hash_to_base62(md5_hash, num_bits=34):
+    """
+    Бере перші `num_bits` біт хешу і кодує їх у формат Base62.
+    """
+    ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    BASE = len(ALPHABET)
     md5_integer = int(md5_hash.hexdigest(), 16)
 
     mask = (1 << num_bits) - 1
@@ -82,3 +102,35 @@ def md5_to_base62(file_path, num_bits=34):
         base62_string = ALPHABET[remainder] + base62_string
         shortened_hash //= BASE
     return base62_string
+
+
+def format_timestamp(seconds, decimal_marker=','):
+    """Форматує час у секундах як HH:MM:SS,mmm (SRT) або HH:MM:SS.mmm (VTT)"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def segments_to_srt(segments):
+    """Формує субтитри SRT із сегментів (start, end, text)"""
+    blocks = []
+    for i, segment in enumerate(segments, start=1):
+        blocks.append(
+            f"{i}\n"
+            f"{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}\n"
+            f"{segment.text.strip()}\n"
+        )
+    return "\n".join(blocks)
+
+
+def segments_to_vtt(segments):
+    """Формує субтитри WebVTT із сегментів (start, end, text)"""
+    blocks = ["WEBVTT\n"]
+    for segment in segments:
+        blocks.append(
+            f"{format_timestamp(segment.start, '.')} --> {format_timestamp(segment.end, '.')}\n"
+            f"{segment.text.strip()}\n"
+        )
+    return "\n".join(blocks)
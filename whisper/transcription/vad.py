@@ -0,0 +1,128 @@
+import numpy as np
+
+
+def frame_features(samples, sample_rate, frame_ms=32, block_frames=4096, scale=32768.0):
+    """
+    Ознаки кадрів для VAD (кадри по frame_ms без перекриття), рахуються блоками:
+    - energy_db: енергія кадру в dB;
+    - band_ratio: частка енергії у мовній смузі 300–3400 Гц;
+    - flatness: спектральна пласкість (близько 1 — шум, близько 0 — тональний сигнал);
+    - flux: зміна форми спектра відносно попереднього кадру (0 для стійких тонів: гудки, сигнал очікування).
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(samples) // frame_len
+    freqs = np.fft.rfftfreq(frame_len, 1 / sample_rate)
+    speech_band = (freqs >= 300) & (freqs <= 3400)
+    flat_band = (freqs >= 100) & (freqs <= 4000)
+    window = np.hanning(frame_len).astype(np.float32)
+
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    band_ratio = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+    flux = np.empty(n_frames, dtype=np.float32)
+    previous = None
+    for first in range(0, n_frames, block_frames):
+        last = min(first + block_frames, n_frames)
+        frames = samples[first * frame_len:last * frame_len].reshape(-1, frame_len)
+        power = np.abs(np.fft.rfft(frames * (window / scale), axis=1)) ** 2 + 1e-12
+        total = power.sum(axis=1)
+        energy_db[first:last] = 10 * np.log10(total / frame_len)
+        band_ratio[first:last] = power[:, speech_band].sum(axis=1) / total
+        band = power[:, flat_band]
+        flatness[first:last] = np.exp(np.mean(np.log(band), axis=1)) / np.mean(band, axis=1)
+        magnitude = np.sqrt(power)
+        magnitude /= magnitude.sum(axis=1, keepdims=True)
+        if previous is None:
+            previous = magnitude[:1]
+        flux[first:last] = np.abs(np.diff(np.concatenate((previous, magnitude)), axis=0)).sum(axis=1)
+        previous = magnitude[-1:]
+    return frame_len, energy_db, band_ratio, flatness, flux
+
+
+def _runs(mask):
+    """
+    Діапазони (start, end) послідовних True у булевому масиві.
+    """
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return edges.reshape(-1, 2)
+
+
+def detect_speech(samples, sample_rate, frame_ms=32, energy_margin_db=12.0, min_band_ratio=0.25,
+                  max_flatness=0.45, min_flux=0.1, flux_window_ms=320, min_speech_ms=250, min_silence_ms=400,
+                  pad_ms=200, scale=32768.0):
+    """
+    Легкий VAD на енергії та спектральних ознаках. Кадр вважається мовним, якщо:
+    - енергія вища за рівень фону (10-й перцентиль енергії файлу) на energy_margin_db;
+    - помітна частина енергії у мовній смузі (відсікає гул і низькочастотний шум);
+    - спектр не шумоподібний (flatness);
+    - форма спектра змінюється в часі (медіана flux за flux_window_ms), тобто це не стійкий тон.
+    Після цього короткі паузи заповнюються, короткі сплески відкидаються, межі розширюються на pad_ms.
+    Returns:
+        list[(start_sample, end_sample)]: мовні ділянки.
+    """
+    frame_len, energy_db, band_ratio, flatness, flux = frame_features(
+        samples, sample_rate, frame_ms=frame_ms, scale=scale,
+    )
+    if len(energy_db) == 0:
+        return []
+
+    flux_window = max(1, flux_window_ms // frame_ms)
+    # Медіана, а не середнє: одиночний стрибок на межі двох звуків не робить тон «мовою»
+    padded = np.pad(flux, (flux_window // 2, flux_window - 1 - flux_window // 2), mode='edge')
+    flux = np.median(np.lib.stride_tricks.sliding_window_view(padded, flux_window), axis=1)
+    noise_floor = np.percentile(energy_db, 10)
+    speech = (
+        (energy_db > noise_floor + energy_margin_db)
+        & (band_ratio >= min_band_ratio)
+        & (flatness <= max_flatness)
+        & (flux >= min_flux)
+    )
+
+    # Заповнюємо короткі паузи всередині мовлення
+    min_silence_frames = max(1, min_silence_ms // frame_ms)
+    for start, end in _runs(~speech):
+        if 0 < start and end < len(speech) and end - start < min_silence_frames:
+            speech[start:end] = True
+
+    min_speech_frames = max(1, min_speech_ms // frame_ms)
+    pad = int(pad_ms * sample_rate / 1000)
+    ranges = []
+    for start, end in _runs(speech):
+        if end - start < min_speech_frames:
+            continue
+        start_sample = max(0, start * frame_len - pad)
+        end_sample = min(len(samples), end * frame_len + pad)
+        if ranges and start_sample <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], end_sample)
+        else:
+            ranges.append((start_sample, end_sample))
+    return ranges
+
+
+def gate_ranges(chunk_ranges, speech_ranges, max_gap):
+    """
+    Залишає в частинах лише мовні ділянки. Ділянки всередині частини, розділені паузою
+    коротшою за max_gap семплів, лишаються однією частиною; довші немовні відрізки
+    (музика, тиша, гудки) вирізаються. Зсуви семплів зберігаються.
+    """
+    gated = []
+    j = 0
+    for chunk_start, chunk_end in chunk_ranges:
+        while j < len(speech_ranges) and speech_ranges[j][1] <= chunk_start:
+            j += 1
+        k = j
+        current = None
+        while k < len(speech_ranges) and speech_ranges[k][0] < chunk_end:
+            start = max(speech_ranges[k][0], chunk_start)
+            end = min(speech_ranges[k][1], chunk_end)
+            if current is not None and start - current[1] <= max_gap:
+                current = (current[0], end)
+            else:
+                if current is not None:
+                    gated.append(current)
+                current = (start, end)
+            k += 1
+        if current is not None:
+            gated.append(current)
+    return gated
@@ -1,15 +1,27 @@
 # Create your views here.
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse, Http404
-from django.views.decorators.http import require_http_methods
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import condition, require_http_methods
+from django.views.decorators.vary import vary_on_headers
 from django.utils import timezone
-from .models import MediaFile
-from .forms import MediaFileUploadForm
-from .tasks import process_media_file_task
+from django.utils.http import content_disposition_header
+from django.conf import settings
+import datetime
+import hashlib
+import re
+from .events import event_stream, events_available
+from .audio import SAMPLE_RATE
+from .models import ChunkedUpload, MediaFile
+from . import scheduling, status_cache, uploads
+from .forms import ChunkedUploadStartForm, MediaFileUploadForm
+from .tasks import predecode_upload_task
+from .utils import segments_to_srt, segments_to_vtt
 import logging
 
 def register_view(request):
@@ -41,10 +53,12 @@ def upload_view(request):
                 media_file.file_type = 'audio'
             
             media_file.save()
+            # Тривалість і аудіопотік з ffprobe: для черги, оцінки очікування і декодування без відео
+            uploads.probe_media_file(media_file)
+            status_cache.set_status(media_file.id, request.user.id, media_file.status)
             
-            # Запускаємо фонову обробку
-            logging.info('process_media_file_task.delay(media_file.id)')
-            process_media_file_task.delay(media_file.id)
+            # Запускаємо фонову обробку: черга за тривалістю, пріоритет за fair-share
+            scheduling.enqueue_media_file(media_file)
             logging.info('Файл завантажено і відправлено на обробку!')
 
             messages.success(request, 'Файл завантажено і відправлено на обробку!')
@@ -64,30 +78,183 @@ def upload_view(request):
 
 
 @login_required
+@require_http_methods(["POST"])
+def chunked_upload_start_view(request):
+    """
+    Починає завантаження частинами. Для потокових форматів одразу запускається декодування,
+    яке читає файл у міру надходження частин.
+    """
+    form = ChunkedUploadStartForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    options = {field: form.cleaned_data[field] for field in ChunkedUploadStartForm.Meta.fields}
+    upload = uploads.create_upload(request.user, form.cleaned_data['filename'], form.cleaned_data['size'], options)
+    if uploads.can_decode_early(upload.filename):
+        upload.decode_status = 'queued'
+        upload.save(update_fields=['decode_status'])
+        predecode_upload_task.delay(upload.upload_id)
+    return JsonResponse({
+        'upload_id': upload.upload_id,
+        'url': reverse('chunked_upload', args=[upload.upload_id]),
+        'offset': 0,
+        'chunk_size': getattr(settings, 'TRANSCRIPTION_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024),
+    })
+
+
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+@login_required
+@require_http_methods(["GET", "PUT"])
+def chunked_upload_view(request, upload_id):
+    """
+    GET — поточний зсув (для відновлення після обриву), PUT — чергова частина з заголовком
+    Content-Range. Тіло читається потоком, без буферизації всього запиту в пам'яті.
+    """
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, user=request.user)
+    if request.method == 'PUT' and upload.status == 'uploading':
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        match = CONTENT_RANGE_RE.fullmatch(request.headers.get('Content-Range', ''))
+        offset = int(match.group(1)) if match else upload.offset
+        if uploads.append_chunk(upload, offset, request, length) is None:
+            upload.refresh_from_db(fields=['offset'])
+            return JsonResponse({'offset': upload.offset, 'size': upload.size}, status=409)
+
+        if upload.offset == upload.size:
+            upload.refresh_from_db()
+            media_file = uploads.complete_upload(upload)
+            uploads.probe_media_file(media_file)
+            status_cache.set_status(media_file.id, request.user.id, media_file.status)
+            duration = upload.decoded_samples / SAMPLE_RATE if upload.decode_status == 'done' else None
+            scheduling.enqueue_media_file(media_file, duration)
+            messages.success(request, 'Файл завантажено і відправлено на обробку!')
+            return JsonResponse({
+                'success': True,
+                'offset': upload.offset,
+                'message': 'Файл завантажено успішно!',
+                'redirect': '/my-transcriptions/',
+            })
+
+    return JsonResponse({'offset': upload.offset, 'size': upload.size, 'status': upload.status})
+
+
+# Колонки, потрібні таблиці файлів (без recognized_text)
+LIST_FIELDS = (
+    'id', 'original_filename', 'original_filesize', 'upload_date', 'file_type', 'status',
+    'need_split_audio', 'noise_cancellation', 'language', 'diarisation', 'is_shared', 'shared_url',
+)
+
+
+def encode_cursor(media_file):
+    delta = media_file.upload_date - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    return f"{delta // datetime.timedelta(microseconds=1)}.{media_file.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Курсор сторінки: (upload_date, id) останнього показаного файлу, або None.
+    """
+    try:
+        micros, file_id = (int(part) for part in cursor.split('.'))
+    except (AttributeError, ValueError):
+        return None
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    return epoch + datetime.timedelta(microseconds=micros), file_id
+
+
+def my_transcriptions_etag(request):
+    # Версія списку змінюється при завантаженні, зміні статусу і спільного доступу
+    version = status_cache.listing_version(request.user.id)
+    if version is None:
+        # Без кешу зміни списку не відстежуються — відповідь завжди повна, без 304
+        return None
+    source = ':'.join([
+        str(version),
+        request.GET.get('before', ''),
+        request.headers.get('HX-Request', ''),
+        request.META.get('CSRF_COOKIE', ''),
+    ])
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+@login_required
+@vary_on_headers('HX-Request')
+@condition(etag_func=my_transcriptions_etag)
 def my_transcriptions_view(request):
-    media_files = MediaFile.objects.filter(user=request.user)
+    page_size = getattr(settings, 'TRANSCRIPTION_LIST_PAGE_SIZE', 50)
+    media_files = (MediaFile.objects.filter(user=request.user)
+                   .only(*LIST_FIELDS)
+                   .order_by('-upload_date', '-id'))
+    cursor = decode_cursor(request.GET.get('before'))
+    if cursor is not None:
+        upload_date, file_id = cursor
+        media_files = media_files.filter(
+            Q(upload_date__lt=upload_date) | Q(upload_date=upload_date, id__lt=file_id)
+        )
+    media_files = list(media_files[:page_size + 1])
+    next_cursor = encode_cursor(media_files[page_size - 1]) if len(media_files) > page_size else None
+    context = {
+        'media_files': media_files[:page_size],
+        'cursor': request.GET.get('before') if cursor is not None else None,
+        'next_cursor': next_cursor,
+    }
     
     if request.headers.get('HX-Request'):
-        return render(request, 'transcription/partials/transcription_table.html', {
-            'media_files': media_files
-        })
+        return render(request, 'transcription/partials/transcription_table.html', context)
     
-    return render(request, 'transcription/my_transcriptions.html', {
-        'media_files': media_files
-    })
+    return render(request, 'transcription/my_transcriptions.html', context)
 
 
 @login_required
 @require_http_methods(["GET"])
 def transcription_status_view(request, file_id):
-    media_file = get_object_or_404(MediaFile, id=file_id, user=request.user)
+    # Статус і прогрес читаються з кешу, який пише воркер; БД — лише запасний варіант
+    cached = status_cache.get_status(file_id)
+    if cached is None or cached.pop('user_id') != request.user.id:
+        status = (MediaFile.objects.filter(id=file_id, user=request.user)
+                  .values_list('status', flat=True).first())
+        if status is None:
+            raise Http404
+        # Лише відсутній запис: статус, записаний воркером тим часом, і прогрес не перезаписуються
+        status_cache.restore_status(file_id, request.user.id, status)
+        cached = status_cache.get_status(file_id)
+        if cached is None or cached.pop('user_id') != request.user.id:
+            cached = {'status': status, 'chunks_done': None, 'chunks_total': None, 'eta_sec': None}
     
     return JsonResponse({
-        'status': media_file.status,
-        'status_display': media_file.get_status_display(),
+        **cached,
+        'status_display': dict(MediaFile.STATUS_CHOICES).get(cached['status'], cached['status']),
     })
 
 
+@login_required
+@require_http_methods(["GET"])
+async def transcription_events_view(request):
+    """
+    SSE-потік подій (зміни статусу і нові частини тексту) для всіх файлів користувача.
+    Асинхронне представлення: під ASGI (whisper_project.asgi) очікування подій не займає воркер.
+    Під WSGI потік не віддається (404) — браузер переходить на опитування статусу.
+    """
+    if not events_available(request):
+        raise Http404
+    user = await request.auser()
+
+    async def snapshot():
+        active = MediaFile.objects.filter(user=user, status__in=['pending', 'processing']).values('id', 'status')
+        return [('status', {'file_id': item['id'], 'status': item['status']}) async for item in active]
+
+    response = StreamingHttpResponse(event_stream(user.id, snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+def queue_status_view(request):
+    return JsonResponse({'queues': scheduling.queue_stats()})
+
+
 @login_required
 def transcription_detail_view(request, file_id):
     media_file = get_object_or_404(MediaFile, id=file_id, user=request.user)
@@ -102,12 +269,34 @@ def transcription_detail_view(request, file_id):
     })
 
 
+EXPORT_FORMATS = {
+    'srt': (segments_to_srt, 'application/x-subrip'),
+    'vtt': (segments_to_vtt, 'text/vtt'),
+}
+
+
+@login_required
+@require_http_methods(["GET"])
+def transcription_export_view(request, file_id, export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise Http404
+    media_file = get_object_or_404(MediaFile.objects.only('id', 'original_filename'), id=file_id, user=request.user)
+    segments = media_file.segments.only('start', 'end', 'text')
+    render_segments, content_type = EXPORT_FORMATS[export_format]
+    
+    response = HttpResponse(render_segments(segments), content_type=f'{content_type}; charset=utf-8')
+    filename = f"{media_file.original_filename.rsplit('.', 1)[0]}.{export_format}"
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
 @login_required
 @require_http_methods(["POST"])
 def toggle_share_view(request, file_id):
     media_file = get_object_or_404(MediaFile, id=file_id, user=request.user)
     media_file.is_shared = not media_file.is_shared
     media_file.save()
+    status_cache.touch_listing(request.user.id)
     
     return JsonResponse({
         'is_shared': media_file.is_shared,
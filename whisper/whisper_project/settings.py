@@ -12,21 +12,25 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Змінні оточення з .env у корені репозиторію (див. .env-example); вже задані змінні не перезаписуються
+load_dotenv(BASE_DIR.parent / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-h(8$2!3(0e$2e^pmnc#wdu#&h6h5n=wo!43__j#vu#i)+lkxzc'
+SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-h(8$2!3(0e$2e^pmnc#wdu#&h6h5n=wo!43__j#vu#i)+lkxzc')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'whisper.aku.com']
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '127.0.0.1,localhost,whisper.aku.com').split(',')
 
 
 # Application definition
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'transcription.context_processors.transcription_events',
             ],
         },
     },
@@ -75,10 +80,51 @@ WSGI_APPLICATION = 'whisper_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Якщо задано DB_NAME — PostgreSQL (воркери пишуть прогрес паралельно з веб-запитами, SQLite має
+# одного письменника на всю базу), інакше — SQLite для локальної розробки.
+# DB_POOL: 'persistent' — постійні з'єднання на потік/процес (CONN_MAX_AGE),
+# 'native' — пул psycopg 3 всередині процесу (Django 5.1+, потрібен psycopg[pool]),
+# 'pgbouncer' — зовнішній пул у режимі transaction: з'єднання не тримаються, серверні курсори вимкнені
+if os.environ.get('DB_NAME'):
+    DB_POOL = os.environ.get('DB_POOL', 'persistent')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['DB_NAME'],
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)) if DB_POOL == 'persistent' else 0,
+            'CONN_HEALTH_CHECKS': DB_POOL == 'persistent',
+            'DISABLE_SERVER_SIDE_CURSORS': DB_POOL == 'pgbouncer',
+            'OPTIONS': {
+                'application_name': os.environ.get('DB_APPLICATION_NAME', 'whisper'),
+            },
+        }
+    }
+    if DB_POOL == 'native':
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+
+# Спільний кеш (статус і прогрес задач пише воркер, читає веб), у тестах підійде locmem або файловий кеш
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/1'),
+        # Недоступний кеш не ламає обробку: статус читається з БД
+        'OPTIONS': {'IGNORE_EXCEPTIONS': True},
     }
 }
 
@@ -118,11 +164,13 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 500MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 524288000  # 500MB
+# Більші файли звичайної форми пишуться у тимчасовий файл, а не тримаються в пам'яті воркера;
+# великі файли завантажуються частинами (upload/chunked/) прямо у сховище медіа
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 
-CELERY_BROKER_URL = 'redis://localhost:6379'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379'
+CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -130,3 +178,149 @@ CELERY_RESULT_SERIALIZER = 'json'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'upload'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Аудіо довше за цей поріг декодується у memmap на анонімному тимчасовому файлі, а не в RAM
+TRANSCRIPTION_DECODE_MMAP_THRESHOLD_SEC = 3 * 60 * 60
+
+# Моделі Whisper: модель за замовчуванням, моделі для прогріву при старті воркера
+# і бюджет пам'яті реєстру моделей (найдавніше використані витісняються)
+WHISPER_DEFAULT_MODEL = 'base'
+WHISPER_PRELOAD_MODELS = ['base']
+WHISPER_PRELOAD_BEFORE_FORK = True
+WHISPER_MODEL_MEMORY_BUDGET_MB = 3072
+# Бекенд інференсу за замовчуванням (MediaFile.inference_backend перекриває його для окремого файлу):
+# 'fp32' або 'int8' (динамічна квантизація лінійних шарів, швидше і менше пам'яті на CPU).
+# Додаткові бекенди: {'назва': 'dotted.path.loader'}, loader(name, device) повертає модель з API whisper
+WHISPER_DEFAULT_BACKEND = os.environ.get('WHISPER_BACKEND', 'fp32')
+WHISPER_INFERENCE_BACKENDS = {}
+
+# Пакетний інференс: 30-секундні сегменти кількох частин (і задач, якщо воркер
+# запущено з --pool threads) проганяються через енкодер/декодер одним пакетом
+WHISPER_BATCHING_ENABLED = False
+WHISPER_BATCH_MAX_SIZE = 8
+WHISPER_BATCH_MAX_WAIT_MS = 50
+
+# Паралельна транскрипція частин одного файлу у пулі процесів (0 — вимкнено).
+# Ядра ділиться між процесами пулу порівну. Потрібен воркер Celery з -P threads або -P solo:
+# дочірні процеси prefork демонічні і не можуть запускати пул (тоді частини йдуть послідовно)
+WHISPER_PARALLEL_WORKERS = 0
+WHISPER_PARALLEL_MP_CONTEXT = 'spawn'
+
+# Розподілена обробка: файли довші за поріг діляться на частини, які обробляються
+# окремими задачами Celery на всіх воркерах (None — вимкнено)
+TRANSCRIPTION_DISTRIBUTED_MIN_DURATION_SEC = None
+TRANSCRIPTION_CHUNK_STORE = 'transcription.chunk_store.LocalChunkStore'
+TRANSCRIPTION_CHUNK_STORE_OPTIONS = {'root': MEDIA_ROOT / 'chunks'}
+
+# Проміжний текст транскрипції зберігається не частіше ніж раз на інтервал
+# (або коли накопичилось стільки символів)
+TRANSCRIPTION_PROGRESS_SAVE_INTERVAL_SEC = 5
+TRANSCRIPTION_PROGRESS_SAVE_MIN_CHARS = 16384
+
+# Кеш транскрипцій за хешем декодованого PCM (повторні завантаження того ж запису)
+TRANSCRIPT_CACHE_ENABLED = True
+TRANSCRIPT_CACHE_MAX_AGE_DAYS = 90
+TRANSCRIPT_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 ГБ
+
+CELERY_BEAT_SCHEDULE = {
+    'prune-transcript-cache': {
+        'task': 'transcription.tasks.prune_transcript_cache_task',
+        'schedule': 24 * 60 * 60,
+    },
+    'requeue-stuck-transcriptions': {
+        'task': 'transcription.tasks.requeue_stuck_transcriptions_task',
+        'schedule': 5 * 60,
+    },
+    'prune-chunked-uploads': {
+        'task': 'transcription.tasks.prune_chunked_uploads_task',
+        'schedule': 60 * 60,
+    },
+}
+
+# Цільова довжина частини (с): частини пакуються по тиші до одного 30-секундного вікна енкодера Whisper,
+# довші мовні ділянки ріжуться в найтихшому місці біля межі вікна
+TRANSCRIPTION_CHUNK_TARGET_SEC = 30
+# Лог-мел спектрограма рахується один раз на файл (поблочно), частини декодуються прямо з неї
+TRANSCRIPTION_SHARED_MEL = True
+
+# Зменшення шуму блоками з перекриттям: пам'ять обмежена розміром блоку,
+# блоки можна обробляти паралельно
+TRANSCRIPTION_DENOISE_BLOCK_SEC = 60
+TRANSCRIPTION_DENOISE_JOBS = 1
+
+# VAD: у модель ідуть лише мовні ділянки (тиша, музика, гудки відкидаються)
+TRANSCRIPTION_VAD_ENABLED = True
+# Паузи між мовними ділянками, коротші за це значення (с), лишаються всередині однієї частини
+TRANSCRIPTION_VAD_MAX_GAP_SEC = 2
+
+# Push-канал прогресу (SSE): воркер публікує події в Redis pub/sub, асинхронне представлення їх транслює.
+# Потік потребує ASGI-сервера:
+#   gunicorn whisper_project.asgi:application -k uvicorn.workers.UvicornWorker
+# Під WSGI потік не віддається і сторінки опитують статус, тому за замовчуванням канал вимкнено
+TRANSCRIPTION_EVENTS_ENABLED = os.environ.get('TRANSCRIPTION_EVENTS_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+TRANSCRIPTION_EVENTS_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+TRANSCRIPTION_EVENTS_KEEPALIVE_SEC = 15
+# Потік закривається через стільки секунд, браузер перепідключається
+TRANSCRIPTION_EVENTS_MAX_STREAM_SEC = 300
+
+# Час життя запису статусу/прогресу файлу в кеші (с)
+TRANSCRIPTION_STATUS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Кількість файлів на сторінці списку "Мої розшифрування"
+TRANSCRIPTION_LIST_PAGE_SIZE = 50
+
+# Планування: короткі й довгі файли в окремих чергах; підзадачі розподіленої обробки йдуть у чергу файлу.
+# Службові задачі (декодування під час завантаження, періодичні задачі beat) — в окремій легкій черзі.
+# Воркери:
+#   celery -A whisper_project worker -Q transcription_short
+#   celery -A whisper_project worker -Q transcription_long
+#   celery -A whisper_project worker -Q transcription_service -P threads -c 4
+#   celery -A whisper_project beat
+TRANSCRIPTION_SHORT_QUEUE = 'transcription_short'
+TRANSCRIPTION_LONG_QUEUE = 'transcription_long'
+TRANSCRIPTION_SERVICE_QUEUE = 'transcription_service'
+CELERY_TASK_ROUTES = {
+    'transcription.tasks.predecode_upload_task': {'queue': TRANSCRIPTION_SERVICE_QUEUE},
+    'transcription.tasks.prune_chunked_uploads_task': {'queue': TRANSCRIPTION_SERVICE_QUEUE},
+    'transcription.tasks.prune_transcript_cache_task': {'queue': TRANSCRIPTION_SERVICE_QUEUE},
+    'transcription.tasks.requeue_stuck_transcriptions_task': {'queue': TRANSCRIPTION_SERVICE_QUEUE},
+}
+TRANSCRIPTION_SHORT_MAX_DURATION_SEC = 600
+# Бітрейт (біт/с) для оцінки тривалості за розміром файлу до декодування
+TRANSCRIPTION_ASSUMED_BITRATE = {'audio': 128_000, 'video': 2_000_000}
+# Оцінка очікування: секунд обробки на секунду аудіо і кількість воркерів кожної черги
+TRANSCRIPTION_SECONDS_PER_AUDIO_SECOND = 0.5
+TRANSCRIPTION_QUEUE_CONCURRENCY = {'transcription_short': 1, 'transcription_long': 1}
+# Пріоритети в черзі (fair-share між користувачами); воркер не забирає задачі наперед
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+    # acks_late: непідтверджена задача повертається в чергу через visibility_timeout (с);
+    # має бути більшим за найдовшу обробку файлу, інакше задачу отримає другий воркер
+    'visibility_timeout': 12 * 60 * 60,
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Reaper: файл у processing без heartbeat довше за цей час (с) повертається в чергу
+TRANSCRIPTION_STUCK_AFTER_SEC = 30 * 60
+# Воркер оновлює heartbeat файлу з фонового потоку раз на стільки секунд (незалежно від тривалості частини)
+TRANSCRIPTION_HEARTBEAT_SEC = 60
+# Розподілений файл, частини якого ще чекають у черзі, reaper не чіпає до цього часу (як visibility_timeout)
+TRANSCRIPTION_DISTRIBUTED_STUCK_AFTER_SEC = 12 * 60 * 60
+# Після стількох запусків обробки файл позначається як failed (перевіряється і на початку задачі,
+# тож повторні доставки acks_late після падіння воркера не тривають нескінченно)
+TRANSCRIPTION_MAX_ATTEMPTS = 3
+# Повтор після помилки обробки відкладається на 30 с, 60 с, 120 с, ... (не більше максимуму)
+TRANSCRIPTION_RETRY_BACKOFF_SEC = 30
+TRANSCRIPTION_RETRY_BACKOFF_MAX_SEC = 10 * 60
+
+# Завантаження частинами: розмір частини (байт), декодування під час завантаження (для потокових форматів),
+# скільки обробка чекає на його завершення, тайм-аут бездіяльності і час життя незавершених завантажень (с)
+TRANSCRIPTION_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+TRANSCRIPTION_EARLY_DECODE = True
+TRANSCRIPTION_PREDECODE_WAIT_SEC = 30
+TRANSCRIPTION_UPLOAD_IDLE_TIMEOUT_SEC = 10 * 60
+# Найдовший час декодування під час завантаження (с); далі файл декодується після завершення завантаження
+TRANSCRIPTION_PREDECODE_MAX_SEC = 60 * 60
+TRANSCRIPTION_UPLOAD_EXPIRE_SEC = 24 * 60 * 60